@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import Depends, FastAPI, Request
 from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.responses import HTMLResponse, JSONResponse
@@ -12,9 +13,77 @@ from app.backend.routers import *
 from app.logger import logger
 from app.const import HTTP_ERROR_MESSAGES, get_swagger_page
 from app.config import ENABLE_PUBLIC_API_DOCS
+from app.db import async_session_maker
+from app.services.ride_book import ride_book
+from app.services.driver_location_buffer import driver_location_buffer
+from app.services.pubsub import pubsub
+from app.services.driver_state_storage import driver_state_storage
+from app.services.deadline_scheduler import deadline_scheduler
+from app.services.ride_trace import ride_trace
+from app.services.heatmap import heatmap
+from app.services.fcm_service import fcm_service
+from app.services.outbox import outbox
+from app.services.driver_sweeper import driver_sweeper
+from app.services.dispatcher import dispatcher
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await pubsub.start()
+    try:
+        async with async_session_maker() as session:
+            await ride_book.load(session)
+        heatmap.load_rides(ride_book.all())
+    except Exception as exc:
+        logger.error(f"Failed to load ride book on startup: {exc}")
+
+    try:
+        async with async_session_maker() as session:
+            await driver_state_storage.hydrate(session)
+    except Exception as exc:
+        logger.error(f"Failed to hydrate driver state on startup: {exc}")
+
+    try:
+        async with async_session_maker() as session:
+            await ride_trace.load(session)
+    except Exception as exc:
+        logger.error(f"Failed to load started rides for tracing on startup: {exc}")
+
+    try:
+        await deadline_scheduler.start()
+    except Exception as exc:
+        logger.error(f"Failed to start deadline scheduler: {exc}")
+
+    driver_sweeper.start()
+    dispatcher.start()
+    outbox.start()
+
+    yield
+
+    await outbox.stop()
+    await dispatcher.stop()
+    await driver_sweeper.stop()
+    await deadline_scheduler.stop()
+
+    try:
+        await driver_location_buffer.close()
+    except Exception as exc:
+        logger.error(f"Failed to flush driver locations on shutdown: {exc}")
+
+    try:
+        await ride_trace.close()
+    except Exception as exc:
+        logger.error(f"Failed to flush ride traces on shutdown: {exc}")
+
+    try:
+        await fcm_service.close()
+    except Exception as exc:
+        logger.error(f"Failed to close FCM client on shutdown: {exc}")
+    await pubsub.stop()
 
 
 app = FastAPI(
+    lifespan=lifespan,
     docs_url='/docs' if ENABLE_PUBLIC_API_DOCS else None,
     redoc_url='/redoc' if ENABLE_PUBLIC_API_DOCS else None,
     openapi_url='/openapi.json' if ENABLE_PUBLIC_API_DOCS else None,
@@ -59,6 +128,7 @@ app.include_router(commission_router, tags=['Commissions'], prefix=API_PREFIX)
 app.include_router(matching_ws_router, tags=['Matching(WebSocket)'], prefix=API_PREFIX)
 app.include_router(documents_router, tags=['Documents'], prefix=API_PREFIX)
 app.include_router(matching_http_router, tags=['Matching(HTTP)'], prefix=API_PREFIX)
+app.include_router(heatmap_ws_router, tags=['Heatmap(WebSocket)'], prefix=API_PREFIX)
 app.include_router(chat_http_router, tags=['Chat(HTTP)'], prefix=API_PREFIX)
 app.include_router(chat_ws_router, tags=['Chat(WebSocket)'], prefix=API_PREFIX)
 app.include_router(driver_rating_router, tags=['DriverRatings'], prefix=API_PREFIX)
@@ -113,4 +183,4 @@ async def validation_exception_handler(request: Request, exc: ResponseValidation
 
 @app.get(f"{API_PREFIX}/health", tags=["General"]) 
 async def health():
-    return {"status": "ok"}
+    return {"status": "ok", "driver_state_ready": driver_state_storage.ready}
@@ -7,6 +7,7 @@ from .commission import commission_router
 from .commission_payment import commission_payment_router
 from .device_token import device_token_router
 from .driver_document import driver_document_router
+from .heatmap_ws import heatmap_ws_router
 from .driver_profile import driver_profile_router
 from .driver_rating import driver_rating_router
 from .documents import documents_router
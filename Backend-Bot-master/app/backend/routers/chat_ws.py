@@ -7,7 +7,7 @@ from app.db import async_session_maker
 from app.logger import logger
 from app.services.chat_service import chat_service
 from app.enum import RoleCode, MessageType
-from app.crud import ride_crud, user_crud
+from app.crud import user_crud
 from app.models import User
 from app.services.websocket_manager import manager
 from app.backend.deps import get_current_user_id_ws
@@ -49,10 +49,6 @@ class ChatWebsocketRouter(BaseWebsocketRouter):
             raise WebSocketException(code=WS_1008_POLICY_VIOLATION, reason=f"Not a participant of ride {ride_id}")
 
         await manager.connect(websocket, user_id)
-        ride = await ride_crud.get_by_id_with_driver_profile(session, ride_id)
-        driver_profile = ride.driver_profile
-        manager.join_ride(ride_id, getattr(ride, 'client_id', 0))
-        manager.join_ride(ride_id, getattr(driver_profile, 'user_id', 0))
 
         await manager.send_to_ride(session, ride_id, {"type": "user_joined", "ride_id": ride_id, "user_id": user_id, "timestamp": datetime.now(timezone.utc).isoformat()}, exclude_user_id=user_id)
         await websocket.send_json({"type": "connected", "ride_id": ride_id, "user_id": user_id, "message": "Connected to chat"})
@@ -63,7 +59,6 @@ class ChatWebsocketRouter(BaseWebsocketRouter):
         session: AsyncSession = context["session"]
 
         manager.disconnect(websocket, user_id)
-        manager.leave_ride(ride_id, user_id)
 
         await manager.send_to_ride(session, ride_id, {"type": "user_left", "ride_id": ride_id, "user_id": user_id, "timestamp": datetime.now(timezone.utc).isoformat()}, exclude_user_id=user_id)
         logger.info(f"User {user_id} disconnected from chat {ride_id}")
@@ -0,0 +1,75 @@
+import asyncio, app.config
+from asyncio import Task
+from typing import Any, Dict, Optional, Set
+from fastapi import WebSocket, Depends, WebSocketException
+from app.backend.routers.websocket_base import BaseWebsocketRouter
+from app.backend.deps import get_current_user_id_ws
+from app.crud import user_crud
+from app.db import async_session_maker
+from app.enum import RoleCode
+from app.logger import logger
+from app.services.heatmap import heatmap
+from starlette.status import WS_1008_POLICY_VIOLATION
+
+MAX_SNAPSHOT_LIMIT = 10_000
+
+
+class HeatmapWebsocketRouter(BaseWebsocketRouter):
+    """Admin stream of the supply/demand heatmap: one snapshot per HEATMAP_STREAM_INTERVAL_SECONDS, shared by all subscribers."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._subscribers: Set[WebSocket] = set()
+        self._task: Optional[Task[None]] = None
+        self.register_handler("ping", self.handle_ping)
+        self.register_handler("snapshot", self.handle_snapshot)
+
+    def setup_routes(self) -> None:
+        self.router.add_api_websocket_route("/matching/heatmap/ws", self.websocket_endpoint)
+
+    async def websocket_endpoint(self, websocket: WebSocket, user_id: int = Depends(get_current_user_id_ws)) -> None:
+        async with async_session_maker() as session:
+            user = await user_crud.get_by_id_with_role(session, user_id)
+        if not user or not user.role or user.role.code != RoleCode.ADMIN:
+            raise WebSocketException(code=WS_1008_POLICY_VIOLATION, reason="Forbidden")
+        await self.run(websocket, user_id=user_id)
+
+    async def on_connect(self, websocket: WebSocket, **context: Any) -> None:
+        await websocket.accept()
+        await websocket.send_json({"type": "heatmap", "data": heatmap.snapshot()})
+        self._subscribers.add(websocket)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._stream())
+
+    async def on_disconnect(self, websocket: WebSocket, **context: Any) -> None:
+        self._subscribers.discard(websocket)
+
+    async def _stream(self) -> None:
+        while self._subscribers:
+            await asyncio.sleep(app.config.HEATMAP_STREAM_INTERVAL_SECONDS)
+            message = {"type": "heatmap", "data": heatmap.snapshot()}
+            for websocket in list(self._subscribers):
+                try:
+                    await websocket.send_json(message)
+                except Exception as exc:
+                    logger.warning(f"Heatmap stream send failed: {exc}")
+                    self._subscribers.discard(websocket)
+
+    async def handle_ping(self, websocket: WebSocket, data: Dict[str, Any], context: Dict[str, Any]) -> None:
+        await websocket.send_json({"type": "pong"})
+
+    async def handle_snapshot(self, websocket: WebSocket, data: Dict[str, Any], context: Dict[str, Any]) -> None:
+        limit = data.get("limit")
+        if limit is not None:
+            try:
+                limit = int(limit)
+            except (TypeError, ValueError):
+                limit = 0
+            if isinstance(data["limit"], bool) or not 1 <= limit <= MAX_SNAPSHOT_LIMIT:
+                await websocket.send_json({"type": "error", "code": "invalid_payload", "message": f"limit must be an integer between 1 and {MAX_SNAPSHOT_LIMIT}"})
+                return
+
+        await websocket.send_json({"type": "heatmap", "data": heatmap.snapshot(limit=limit)})
+
+
+heatmap_ws_router = HeatmapWebsocketRouter().router
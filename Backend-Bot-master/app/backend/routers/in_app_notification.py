@@ -1,8 +1,8 @@
-from typing import List
+from typing import List, Optional
 from fastapi import Request, Depends
 from app.backend.routers.base import BaseRouter
 from app.crud.in_app_notification import in_app_notification_crud, InAppNotificationCrud
-from app.schemas.in_app_notification import InAppNotificationSchema, InAppNotificationCreate, InAppNotificationUpdate
+from app.schemas.in_app_notification import InAppNotificationSchema, InAppNotificationCreate, InAppNotificationUpdate, InAppNotificationUnreadCount
 from app.backend.deps import require_role, get_current_user_id
 from app.enum import RoleCode
 
@@ -14,6 +14,7 @@ class InAppNotificationRouter(BaseRouter[InAppNotificationCrud]):
     def setup_routes(self) -> None:
         self.router.add_api_route(f"{self.prefix}/me", self.get_my_notifications, methods=["GET"], status_code=200)
         self.router.add_api_route(f"{self.prefix}/me/unread", self.get_my_unread_notifications, methods=["GET"], status_code=200)
+        self.router.add_api_route(f"{self.prefix}/me/unread/count", self.get_my_unread_count, methods=["GET"], status_code=200)
         self.router.add_api_route(f"{self.prefix}/me/read-all", self.mark_all_as_read, methods=["PUT"], status_code=200)
         self.router.add_api_route(f"{self.prefix}/me/read/{{id}}", self.mark_one_as_read, methods=["PUT"], status_code=200)
         self.router.add_api_route(f"{self.prefix}", self.get_paginated, methods=["GET"], status_code=200, dependencies=[Depends(require_role([RoleCode.ADMIN]))])
@@ -37,11 +38,14 @@ class InAppNotificationRouter(BaseRouter[InAppNotificationCrud]):
     async def delete(self, request: Request, id: int):
         return await self.model_crud.delete(request.state.session, id)
 
-    async def get_my_notifications(self, request: Request, page: int = 1, page_size: int = 10, user_id = Depends(get_current_user_id)) -> List[InAppNotificationSchema]:
-        return await self.model_crud.get_by_user_id(request.state.session, user_id, page, page_size)
+    async def get_my_notifications(self, request: Request, page: int = 1, page_size: int = 10, cursor: Optional[int] = None, user_id = Depends(get_current_user_id)) -> List[InAppNotificationSchema]:
+        return await self.model_crud.get_by_user_id(request.state.session, user_id, page, page_size, cursor)
 
-    async def get_my_unread_notifications(self, request: Request, page: int = 1, page_size: int = 10, user_id = Depends(get_current_user_id)) -> List[InAppNotificationSchema]:
-        return await self.model_crud.get_unread_by_user_id(request.state.session, user_id, page, page_size)
+    async def get_my_unread_notifications(self, request: Request, page: int = 1, page_size: int = 10, cursor: Optional[int] = None, user_id = Depends(get_current_user_id)) -> List[InAppNotificationSchema]:
+        return await self.model_crud.get_unread_by_user_id(request.state.session, user_id, page, page_size, cursor)
+
+    async def get_my_unread_count(self, request: Request, user_id = Depends(get_current_user_id)) -> InAppNotificationUnreadCount:
+        return InAppNotificationUnreadCount(unread=await self.model_crud.get_unread_count(request.state.session, user_id))
 
     async def mark_all_as_read(self, request: Request, user_id = Depends(get_current_user_id)) -> List[InAppNotificationSchema]:
         return await self.model_crud.mark_all_as_read(request.state.session, user_id)
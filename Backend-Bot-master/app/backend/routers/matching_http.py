@@ -4,8 +4,13 @@ from fastapi import HTTPException, Query, Request, Depends
 from app.backend.routers.base import BaseRouter
 from app.crud.driver_location import driver_location_crud, DriverLocationCrud
 from app.crud import driver_profile_crud, driver_feed, driver_tracker
+from app.services.driver_sweeper import driver_sweeper
+from app.services.dispatcher import dispatcher
 from app.services import manager_driver_feed
 from app.services.driver_state_storage import driver_state_storage
+from app.services.driver_location_buffer import driver_location_buffer
+from app.services.ride_trace import ride_trace
+from app.services.heatmap import heatmap
 from app.backend.deps import get_current_driver_profile_id, require_role
 from app.schemas.driver_location import DriverLocationSchema, DriverLocationCreate, DriverLocationUpdate, DriverLocationUpdateMe, MatchingConfig
 from app.enum import RoleCode
@@ -19,6 +24,7 @@ class MatchingHttpRouter(BaseRouter[DriverLocationCrud]):
         self.router.add_api_route(f"{self.prefix}/driver/register", self.register_driver, methods=["POST"], status_code=200)
         self.router.add_api_route(f"{self.prefix}/feed", self.get_ride_feed, methods=["GET"], status_code=200)
         self.router.add_api_route(f"{self.prefix}/config", self.configure_matching_consts, methods=["PUT"], dependencies=[Depends(require_role(RoleCode.ADMIN))])
+        self.router.add_api_route(f"{self.prefix}/rides/nearby", self.get_nearby_rides, methods=["GET"], dependencies=[Depends(require_role(RoleCode.ADMIN))])
 
         self.router.add_api_route(f"{self.prefix}/notify/{{user_id}}", self.send_notification, methods=["POST"], dependencies=[Depends(require_role(RoleCode.ADMIN))])
         self.router.add_api_route(f"{self.prefix}/broadcast", self.broadcast_message, methods=["POST"], dependencies=[Depends(require_role(RoleCode.ADMIN))])
@@ -28,6 +34,7 @@ class MatchingHttpRouter(BaseRouter[DriverLocationCrud]):
         self.router.add_api_route(f"{self.prefix}/driver-location", self.update_me, methods=["PUT"])
         self.router.add_api_route(f"{self.prefix}/driver-location", self.get_paginated, methods=["GET"], dependencies=[Depends(require_role([RoleCode.USER, RoleCode.DRIVER, RoleCode.ADMIN]))])
         self.router.add_api_route(f"{self.prefix}/driver-location/{{id}}", self.get_by_id, methods=["GET"], dependencies=[Depends(require_role([RoleCode.USER, RoleCode.DRIVER, RoleCode.ADMIN]))])
+        self.router.add_api_route(f"{self.prefix}/heatmap", self.get_heatmap, methods=["GET"], dependencies=[Depends(require_role(RoleCode.ADMIN))])
         self.router.add_api_route(f"{self.prefix}/drivers/stats", self.get_drivers_stats, methods=["GET"], dependencies=[Depends(require_role([RoleCode.USER, RoleCode.DRIVER, RoleCode.ADMIN]))])
 
     async def register_driver(self, request: Request, driver_profile_id: int = Depends(get_current_driver_profile_id)) -> Dict[str, Any]:
@@ -36,6 +43,8 @@ class MatchingHttpRouter(BaseRouter[DriverLocationCrud]):
             raise HTTPException(status_code=404, detail="Driver profile not found")
 
         state = await driver_state_storage.register_driver(request.state.session, profile)
+        if state is None:
+            raise HTTPException(status_code=403, detail="DRIVER_PROFILE_NOT_APPROVED")
 
         return {"status": "registered", "driver_profile_id": state.driver_profile_id, "classes_allowed": list(state.classes_allowed)}
 
@@ -47,6 +56,11 @@ class MatchingHttpRouter(BaseRouter[DriverLocationCrud]):
         feed = await driver_feed.get_driver_feed(request.state.session, driver_profile_id, limit)
         return {"driver_profile_id": driver_profile_id, "driver_status": driver.status.value, "count": len(feed), "rides": feed}
 
+    async def get_nearby_rides(self, request: Request, lat: float = Query(..., ge=-90, le=90), lng: float = Query(..., ge=-180, le=180), radius_km: float | None = Query(None, gt=0), limit: int = Query(20, ge=1, le=100)) -> Dict[str, Any]:
+        nearest = await driver_feed.get_requested_rides(request.state.session, lat, lng, radius_km or app.config.MAX_DISTANCE_KM, limit)
+        rides = driver_feed.serialize(nearest)
+        return {"count": len(rides), "rides": rides}
+
     async def send_notification(self, user_id: int, message: Dict[str, Any]) -> Dict[str, Any]:
         if not manager_driver_feed.is_connected(user_id):
             raise HTTPException(status_code=404, detail="User not connected")
@@ -83,8 +97,14 @@ class MatchingHttpRouter(BaseRouter[DriverLocationCrud]):
         return driver_location
 
     async def get_drivers_stats(self) -> Dict[str, Any]:
-        return {**driver_state_storage.get_stats(), "ws_connections": manager_driver_feed.get_connection_count()}
-
+        return {**driver_state_storage.get_stats(), "ws_connections": manager_driver_feed.get_connection_count(), "location_filter": driver_tracker.get_stats(), "location_buffer": driver_location_buffer.get_stats(), "sweeper": driver_sweeper.get_stats(), "dispatch": dispatcher.get_stats(), "ride_trace": ride_trace.get_stats(), "heatmap": heatmap.get_stats()}
+
+    async def get_heatmap(self, min_lat: float | None = Query(None, ge=-90, le=90), max_lat: float | None = Query(None, ge=-90, le=90), min_lng: float | None = Query(None, ge=-180, le=180), max_lng: float | None = Query(None, ge=-180, le=180), limit: int | None = Query(None, ge=1, le=10000)) -> Dict[str, Any]:
+        bbox = (min_lat, max_lat, min_lng, max_lng)
+        if any(value is None for value in bbox):
+            bbox = None
+        return {"cell_size_deg": heatmap.cell_size_deg, "cells": heatmap.snapshot(bbox=bbox, limit=limit)}
+
     async def configure_matching_consts(self, request: Request, body: MatchingConfig):
         app.config.MAX_DISTANCE_KM = body.max_distance_km
         return {"ok": True}
@@ -1,8 +1,10 @@
-from typing import Any, Dict
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
 from fastapi import WebSocket, Depends, WebSocketException
 from app.backend.routers.websocket_base import BaseWebsocketRouter
 from app.services import manager_driver_feed
 from app.services.driver_state_storage import driver_state_storage
+from app.services.ride_trace import ride_trace
 from app.crud.driver_tracker import driver_tracker, DriverStatus
 from app.crud import driver_feed
 from app.logger import logger
@@ -11,6 +13,8 @@ from app.db import async_session_maker
 from app.crud import driver_profile_crud, ride_drivers_request_crud, ride_crud
 from starlette.status import WS_1008_POLICY_VIOLATION
 
+LOCATION_BATCH_MAX_FIXES = 500
+
 
 class MatchingWebsocketRouter(BaseWebsocketRouter):
 
@@ -18,6 +22,7 @@ class MatchingWebsocketRouter(BaseWebsocketRouter):
         super().__init__()
         self.register_handler("ping", self.handle_ping)
         self.register_handler("location_update", self.handle_location_update)
+        self.register_handler("location_batch", self.handle_location_batch)
         self.register_handler("go_online", self.handle_go_online)
         self.register_handler("go_offline", self.handle_go_offline)
 
@@ -71,6 +76,7 @@ class MatchingWebsocketRouter(BaseWebsocketRouter):
         logger.error(f"WebSocket error for user {user_id}: {exc}")
 
     async def handle_ping(self, websocket: WebSocket, data: Dict[str, Any], context: Dict[str, Any]) -> None:
+        driver_state_storage.touch(int(context["user_id"]))
         await websocket.send_json({"type": "pong"})
 
     async def handle_location_update(self, websocket: WebSocket, data: Dict[str, Any], context: Dict[str, Any]) -> None:
@@ -84,6 +90,47 @@ class MatchingWebsocketRouter(BaseWebsocketRouter):
             if state:
                 await websocket.send_json({"type": "location_ack", "status": state.status})
 
+    @staticmethod
+    def _parse_fix(fix: Dict[str, Any]) -> Optional[Tuple[float, float, float]]:
+        lat = fix.get("lat") or fix.get("latitude")
+        lng = fix.get("lng") or fix.get("longitude")
+        ts = fix.get("ts") or fix.get("timestamp")
+        if not lat or not lng:
+            return None
+
+        try:
+            if isinstance(ts, str):
+                ts = datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp()
+            ts = float(ts or 0)
+            return (float(lat), float(lng), ts / 1000 if ts > 1e12 else ts)
+        except (TypeError, ValueError):
+            return None
+
+    async def handle_location_batch(self, websocket: WebSocket, data: Dict[str, Any], context: Dict[str, Any]) -> None:
+        session = context["session"]
+        user_id = context["user_id"]
+        raw_fixes = data.get("fixes")
+        if not isinstance(raw_fixes, list):
+            await websocket.send_json({"type": "error", "message": "fixes must be a list"})
+            return
+
+        fixes = [fix for fix in (self._parse_fix(raw) for raw in raw_fixes[-LOCATION_BATCH_MAX_FIXES:] if isinstance(raw, dict)) if fix]
+        if not fixes:
+            await websocket.send_json({"type": "location_ack", "received": len(raw_fixes), "applied": 0})
+            return
+
+        latitude, longitude, ts = max(reversed(fixes), key=lambda fix: fix[2])
+        driver = driver_state_storage.get_driver_by_user(int(user_id))
+        if driver and driver_tracker.is_stale(driver.driver_profile_id, ts):
+            await websocket.send_json({"type": "location_ack", "status": driver.status, "received": len(raw_fixes), "applied": 0, "ts": ts})
+            return
+
+        if driver and ride_trace.is_recording(driver.current_ride_id):
+            await ride_trace.record(driver.current_ride_id, driver.driver_profile_id, sorted((fix for fix in fixes if fix[2] < ts), key=lambda fix: fix[2]))
+        state = await driver_tracker.update_location_by_user_id(session, user_id=user_id, latitude=latitude, longitude=longitude, fix_ts=ts)
+        if state:
+            await websocket.send_json({"type": "location_ack", "status": state.status, "received": len(raw_fixes), "applied": 1, "ts": ts})
+
     async def handle_go_online(self, websocket: WebSocket, data: Dict[str, Any], context: Dict[str, Any]) -> None:
         session = context["session"]
         user_id = int(context["user_id"])
@@ -18,11 +18,11 @@ class NotificationWebsocketRouter(BaseWebsocketRouter):
         super().__init__()
         self.register_handler("ping", self.handle_ping)
 
-    async def _stop_location_task_if_last_connection(self, user_id: int) -> None:
+    async def _unsubscribe_location_if_last_connection(self, user_id: int) -> None:
         if manager_notifications.is_connected(user_id):
             return
 
-        await driver_location_sender.stop_task(user_id)
+        await driver_location_sender.unsubscribe(user_id)
 
     async def websocket_endpoint(self, websocket: WebSocket, user_id: int = Depends(get_current_user_id_ws)) -> None:
         async with async_session_maker() as session:
@@ -39,13 +39,13 @@ class NotificationWebsocketRouter(BaseWebsocketRouter):
             await websocket.send_json({"type": "last_ride", "data": ride.model_dump(mode="json")})
 
         if driver_profile and ride.status in ("accepted", "on_the_way", "arrived"):
-            await driver_location_sender.start_task(user_id, driver_profile.id)
+            await driver_location_sender.subscribe(user_id, driver_profile.id)
 
     async def on_disconnect(self, websocket: WebSocket, **context: Any) -> None:
         user_id = context["user_id"]
         manager_notifications.disconnect(websocket, user_id)
         logger.info(f"User {user_id} disconnected")
-        await self._stop_location_task_if_last_connection(user_id)
+        await self._unsubscribe_location_if_last_connection(user_id)
 
     async def on_error(self, websocket: WebSocket, exc: Exception, **context: Any) -> None:
         user_id = context.get("user_id")
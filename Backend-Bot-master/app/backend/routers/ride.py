@@ -1,4 +1,3 @@
-import asyncio
 from typing import Any
 from fastapi import BackgroundTasks, Request, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -13,10 +12,14 @@ from app.backend.deps import require_role, get_current_user_id, get_current_driv
 from app.models import Ride
 from app.crud import in_app_notification_crud, ride_drivers_request_crud, driver_profile_crud
 from app.services.chat_service import chat_service
-from app.services import fcm_service, manager_driver_feed
+from app.services import manager_driver_feed
 from app.services.new_ride_notifications import notify_about_new_ride
 from app.crud.driver_tracker import driver_tracker
 from app.enum import RoleCode
+from app.config import RIDE_SECONDS_LIMIT, TRACE_ANOMALY_DISTANCE_RATIO
+from app.services.deadline_scheduler import deadline_scheduler, RIDE_TIMEOUT
+from app.services.ride_trace import ride_trace
+from app.services.outbox import outbox
 
 UPDATE_MESSAGE = {
     'on_the_way': 'Водитель в пути',
@@ -64,7 +67,7 @@ class RideRouter(BaseRouter[RideCrud]):
         ride = await self.model_crud.create(request.state.session, create_obj)
         if ride and ride.status == "requested":
             background_tasks.add_task(notify_about_new_ride, ride.id)
-        asyncio.create_task(ride_crud.cancel_ride_if_timeout(ride.id, user_id))
+        await deadline_scheduler.schedule(request.state.session, RIDE_TIMEOUT, ride.id, user_id, RIDE_SECONDS_LIMIT)
         return ride
 
     async def update(self, request: Request, id: int, update_obj: RideSchema, user_id: int = Depends(get_current_user_id)) -> RideSchema:
@@ -86,12 +89,12 @@ class RideRouter(BaseRouter[RideCrud]):
 
         driver_profile = await driver_profile_crud.get_by_id(session, ride.driver_profile_id)
         if driver_profile and update_obj.status != 'canceled':
-            await manager_driver_feed.send_personal_message(driver_profile.user_id, {"type": "ride_changed", "message": "Клиент обновил данные поездки", "data": ride.model_dump(mode="json")})
+            outbox.send_ws(session, manager_driver_feed, driver_profile.user_id, {"type": "ride_changed", "message": "Клиент обновил данные поездки", "data": ride.model_dump(mode="json")})
 
         if update_obj.status == 'canceled':
             await ride_drivers_request_crud.reject_by_ride_id(session, id)
             await chat_service.save_message_and_send_to_ride(session=session, ride_id=ride.id, text="Поездка отменена клиентом", message_type="system")
-            await manager_driver_feed.send_personal_message(getattr(driver_profile, 'user_id', None), {"type": "ride_canceled", "message": "Поездка отменена клиентом", "data": ride.model_dump(mode="json")})
+            outbox.send_ws(session, manager_driver_feed, getattr(driver_profile, 'user_id', None), {"type": "ride_canceled", "message": "Поездка отменена клиентом", "data": ride.model_dump(mode="json")})
             await self.send_notifications(session, ride.client_id, "ride_canceled", "Поездка отменена", "Проверьте информацию о поездке", ride.model_dump(mode="json"), f"{ride.id}_{old_ride.status}_{ride.status}")
             await driver_tracker.release_ride(session, ride.driver_profile_id)
         return ride
@@ -103,7 +106,7 @@ class RideRouter(BaseRouter[RideCrud]):
             raise HTTPException(status_code=404, detail="Driver profile not found")
         request = await ride_drivers_request_crud.create(session, RideDriversRequestCreate(ride_id=id, driver_profile_id=driver_profile_id, car_id=driver_profile.current_car_id, eta=update_obj.eta, offer_fare=update_obj.offer_fare, status="requested"))
         ride = await ride_crud.get_by_id(session, id)
-        await manager_driver_feed.send_personal_message(user_id, {"type": "ride_request_sent", "data": ride.model_dump(mode="json")})
+        outbox.send_ws(session, manager_driver_feed, user_id, {"type": "ride_request_sent", "data": ride.model_dump(mode="json")})
         return request
 
     async def cancel_ride_request(self, request: Request, id: int, driver_profile_id: int = Depends(get_current_driver_profile_id)) -> RideDriversRequestSchema:
@@ -121,7 +124,7 @@ class RideRouter(BaseRouter[RideCrud]):
             raise HTTPException(status_code=404, detail="Ride not found")
         ride = await self.model_crud.update(session, id, update_obj, user_id)
         await self.send_notifications(session, ride.client_id, "ride_status_changed", UPDATE_MESSAGE.get(ride.status, 'Поездка обновлена'), "Проверьте информацию о поездке", ride.model_dump(mode="json"), f"{ride.id}_{old_ride.status}_{ride.status}")
-        await manager_driver_feed.send_personal_message(user_id, {"type": "ride_changed", "message": "Поездка изменена вами", "data": ride.model_dump(mode="json")})
+        outbox.send_ws(session, manager_driver_feed, user_id, {"type": "ride_changed", "message": "Поездка изменена вами", "data": ride.model_dump(mode="json")})
 
         if update_obj.status == 'canceled':
             await chat_service.save_message_and_send_to_ride(session=session, ride_id=ride.id, text="Поездка отменена водителем", message_type="system")
@@ -130,9 +133,17 @@ class RideRouter(BaseRouter[RideCrud]):
 
     async def finish_ride_by_driver(self, request: Request, id: int, update_obj: RideSchemaFinishByDriver, ride: Ride = Depends(require_driver_profile(Ride)), user_id: int = Depends(get_current_user_id)) -> RideSchema:
         session = request.state.session
-        update_obj = RideSchemaFinishWithAnomaly(is_anomaly=str(ride.expected_fare) != str(update_obj.actual_fare), **update_obj.model_dump())
+        trace = await ride_trace.finish(session, ride.id)
+        anomalies = []
+        if ride.expected_fare is not None and float(ride.expected_fare) != float(update_obj.actual_fare):
+            anomalies.append(f"fare: expected {ride.expected_fare}, actual {update_obj.actual_fare}")
+        if trace and ride.distance_meters and abs(trace.distance_meters - ride.distance_meters) > ride.distance_meters * TRACE_ANOMALY_DISTANCE_RATIO:
+            anomalies.append(f"distance: planned {ride.distance_meters} m, driven {trace.distance_meters} m")
+
+        measured = {"distance_meters": trace.distance_meters, "duration_seconds": trace.duration_seconds} if trace else {}
+        update_obj = RideSchemaFinishWithAnomaly(is_anomaly=bool(anomalies), anomaly_reason="; ".join(anomalies)[:255] or None, **update_obj.model_dump(), **measured)
         ride = await self.model_crud.update(session, id, update_obj, user_id)
-        await manager_driver_feed.send_personal_message(user_id, {"type": "ride_finished", "message": "Поездка завершена", "data": ride.model_dump(mode="json")})
+        outbox.send_ws(session, manager_driver_feed, user_id, {"type": "ride_finished", "message": "Поездка завершена", "data": ride.model_dump(mode="json")})
         await self.send_notifications(session, ride.client_id, "ride_finished", "Поездка завершена", "Не забудьте оценить поездку", ride.model_dump(mode="json"), ride.id)
         await driver_tracker.release_ride(session, ride.driver_profile_id)
 
@@ -140,7 +151,7 @@ class RideRouter(BaseRouter[RideCrud]):
 
     async def send_notifications(self, session: AsyncSession, client_id: int, type: str, title: str, message: str, data: dict, dedup_key: Any):
         await in_app_notification_crud.create(session, InAppNotificationCreate(user_id=client_id, type=type, title=title, message=message, data=data, dedup_key=str(dedup_key) if dedup_key else None))
-        await fcm_service.send_to_user(session, client_id, PushNotificationData(title=title, body=message))
+        outbox.send_push(session, [client_id], PushNotificationData(title=title, body=message))
     
 
 ride_router = RideRouter(ride_crud, "/rides").router
@@ -30,11 +30,39 @@ OTP_MAX_ATTEMPTS = int(os.environ.get('OTP_MAX_ATTEMPTS', 3))
 OTP_NEXT_SENDING_SECONDS = int(os.environ.get('OTP_NEXT_SENDING_SECONDS', 300))
 
 MAX_DISTANCE_KM = float(os.environ.get('MAX_DISTANCE_KM', 30.0))
-FEED_PUSH_INTERVAL_SECONDS = int(os.getenv("MATCHING_FEED_PUSH_INTERVAL_SECONDS", "5"))
+FEED_PUSH_INTERVAL_SECONDS = int(os.getenv("MATCHING_FEED_PUSH_INTERVAL_SECONDS", "30"))
 DRIVER_LOCATION_PUSH_INTERVAL_SECONDS = int(os.getenv("DRIVER_LOCATION_PUSH_INTERVAL_SECONDS", "5"))
+DRIVER_LOCATION_FLUSH_INTERVAL_SECONDS = float(os.getenv("DRIVER_LOCATION_FLUSH_INTERVAL_SECONDS", "10"))
+DRIVER_LOCATION_MIN_DISTANCE_METERS = float(os.getenv("DRIVER_LOCATION_MIN_DISTANCE_METERS", "15"))
+DRIVER_LOCATION_MIN_INTERVAL_SECONDS = float(os.getenv("DRIVER_LOCATION_MIN_INTERVAL_SECONDS", "2"))
 FEED_LIMIT = int(os.getenv("MATCHING_FEED_LIMIT", "20"))
+FEED_DEBOUNCE_SECONDS = float(os.getenv("MATCHING_FEED_DEBOUNCE_SECONDS", "1"))
+MATCHING_GRID_CELL_DEG = float(os.getenv("MATCHING_GRID_CELL_DEG", "0.05"))
+HEATMAP_CELL_DEG = float(os.getenv("HEATMAP_CELL_DEG", "0.01"))
+HEATMAP_STREAM_INTERVAL_SECONDS = float(os.getenv("HEATMAP_STREAM_INTERVAL_SECONDS", "5"))
+DRIVER_STALE_SECONDS = float(os.getenv("DRIVER_STALE_SECONDS", "120"))
+DRIVER_EVICT_SECONDS = float(os.getenv("DRIVER_EVICT_SECONDS", "3600"))
+DRIVER_SWEEP_INTERVAL_SECONDS = float(os.getenv("DRIVER_SWEEP_INTERVAL_SECONDS", "30"))
+TRACE_FLUSH_INTERVAL_SECONDS = float(os.getenv("TRACE_FLUSH_INTERVAL_SECONDS", "15"))
+TRACE_MIN_SEGMENT_METERS = float(os.getenv("TRACE_MIN_SEGMENT_METERS", "15"))
+TRACE_MAX_SPEED_KMH = float(os.getenv("TRACE_MAX_SPEED_KMH", "200"))
+TRACE_ANOMALY_DISTANCE_RATIO = float(os.getenv("TRACE_ANOMALY_DISTANCE_RATIO", "0.5"))
+DISPATCH_ENABLED = os.getenv("DISPATCH_ENABLED", "false").lower() in ("1", "true", "yes")
+DISPATCH_INTERVAL_SECONDS = float(os.getenv("DISPATCH_INTERVAL_SECONDS", "5"))
+DISPATCH_CANDIDATES = int(os.getenv("DISPATCH_CANDIDATES", "8"))
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory")
+STATE_SYNC_INTERVAL_SECONDS = float(os.getenv("STATE_SYNC_INTERVAL_SECONDS", "0.2"))
 COMMISSION_PAY_SECONDS_LIMIT = int(os.getenv("COMMISSION_PAY_SECONDS_LIMIT", "300"))
 RIDE_SECONDS_LIMIT = int(os.getenv("RIDE_SECONDS_LIMIT", "3600"))
+DEADLINE_POLL_SECONDS = float(os.getenv("DEADLINE_POLL_SECONDS", "30"))
+DEADLINE_RETRY_SECONDS = float(os.getenv("DEADLINE_RETRY_SECONDS", "30"))
+DEADLINE_MAX_ATTEMPTS = int(os.getenv("DEADLINE_MAX_ATTEMPTS", "5"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "1"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "500"))
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "60"))
+OUTBOX_RETRY_BASE_SECONDS = float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "2"))
+OUTBOX_RETRY_MAX_SECONDS = float(os.getenv("OUTBOX_RETRY_MAX_SECONDS", "300"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
 RATING_AVG_COUNT = int(os.getenv("RATING_AVG_COUNT", "5"))
 DRIVER_PROFILE_INITIAL_RATING_AVG = float(os.getenv("DRIVER_PROFILE_INITIAL_RATING_AVG", "5.0"))
 DRIVER_PROFILE_INITIAL_RATING_COUNT = int(os.getenv("DRIVER_PROFILE_INITIAL_RATING_COUNT", "10"))
@@ -53,6 +81,12 @@ AWS_ACCESS_KEY_ID=os.environ.get('AWS_ACCESS_KEY_ID') or 'test-aws-access-key-id
 AWS_SECRET_KEY=os.environ.get('AWS_SECRET_KEY') or 'test-aws-secret-access-key'
 
 FIREBASE_SERVICE_ACCOUNT_PATH=os.environ.get('FIREBASE_SERVICE_ACCOUNT_PATH') or 'firebase-service-account.json'
+FCM_API_BASE_URL = os.getenv("FCM_API_BASE_URL", "https://fcm.googleapis.com")
+FCM_TOKEN_URL = os.getenv("FCM_TOKEN_URL") or None
+FCM_MAX_CONCURRENT_REQUESTS = int(os.getenv("FCM_MAX_CONCURRENT_REQUESTS", "100"))
+FCM_REQUEST_TIMEOUT_SECONDS = float(os.getenv("FCM_REQUEST_TIMEOUT_SECONDS", "10"))
+DEVICE_TOKEN_CACHE_TTL_SECONDS = float(os.getenv("DEVICE_TOKEN_CACHE_TTL_SECONDS", "300"))
+DEVICE_TOKEN_CACHE_MAX_USERS = int(os.getenv("DEVICE_TOKEN_CACHE_MAX_USERS", "100000"))
 MODERATION_INTERNAL_TOKEN = (os.getenv('MODERATION_INTERNAL_TOKEN') or '').strip() or None
 
 TBANK_USE_SANDBOX = (os.getenv("TBANK_USE_SANDBOX", os.getenv("TOCHKA_USE_SANDBOX", "false")).lower() in ("1", "true", "yes"))
@@ -1,4 +1,4 @@
-import asyncio
+import logging
 from sqlalchemy import insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.crud.base import CrudBase
@@ -7,16 +7,18 @@ from app.schemas.commission_payment import CommissionPaymentSchema
 from app.schemas.ride import RideSchemaUpdateByClient
 from app.schemas.in_app_notification import InAppNotificationCreate
 from app.schemas.push import PushNotificationData
-from app.config import COMMISSION_PAY_SECONDS_LIMIT
 from .ride import ride_crud
 from app.services import manager_driver_feed
 from app.services.chat_service import chat_service
-from app.services.fcm_service import fcm_service
+from app.services.outbox import outbox
 from .driver_tracker import driver_tracker
-from app.db import async_session_maker
+from app.services.deadline_scheduler import deadline_scheduler, COMMISSION_TIMEOUT
+from app.schemas.deadline import DeadlineSchema
 from .driver_profile import driver_profile_crud
 from .in_app_notification import in_app_notification_crud
 
+logger = logging.getLogger(__name__)
+
 
 class CommissionPaymentCrud(CrudBase[CommissionPayment, CommissionPaymentSchema]):
     def __init__(self) -> None:
@@ -51,20 +53,27 @@ class CommissionPaymentCrud(CrudBase[CommissionPayment, CommissionPaymentSchema]
         result = await self.execute_get_one(session, stmt)
         return self.schema.model_validate(result)
 
-    async def cancel_commission_payment_if_timeout(self, ride_id: int, user_id: int) -> None:
-        await asyncio.sleep(COMMISSION_PAY_SECONDS_LIMIT)
-        async with async_session_maker() as session:
-            payment = await self.get_by_ride_and_user(session, ride_id, user_id)
-            if payment and (payment.status == 'CONFIRMED' or payment.status == 'AUTHORIZED'):
-                return
+    async def cancel_unpaid_rides(self, session: AsyncSession, deadlines: list[DeadlineSchema]) -> None:
+        result = await session.execute(select(self.model.ride_id, self.model.user_id).where(self.model.ride_id.in_([deadline.ride_id for deadline in deadlines]), self.model.is_refund.is_(False), self.model.status.in_(['CONFIRMED', 'AUTHORIZED'])))
+        paid = set(result.all())
+        for deadline in deadlines:
+            if (deadline.ride_id, deadline.user_id) in paid:
+                continue
+
+            try:
+                async with session.begin_nested():
+                    await self._cancel_unpaid_ride(session, deadline.ride_id, deadline.user_id)
+            except Exception as exc:
+                logger.error(f"Commission timeout for ride {deadline.ride_id} failed: {exc}")
 
-            updated_ride = await ride_crud.update(session, ride_id, RideSchemaUpdateByClient(status='canceled'), user_id)
-            driver_profile = await driver_profile_crud.get_by_id(session, updated_ride.driver_profile_id)
-            await chat_service.save_message_and_send_to_ride(session=session, ride_id=ride_id, text="Клиент не оплатил комиссию вовремя", message_type="system")
-            await manager_driver_feed.send_personal_message(driver_profile.user_id, {"type": "ride_canceled", "message": "Клиент не оплатил комиссию вовремя"})
-            await in_app_notification_crud.create(session, InAppNotificationCreate(user_id=user_id, type="ride_canceled", title="Поездка отменена", message="Поездка отменена из-за истечения срока оплаты комиссии", data=updated_ride.model_dump(mode='json'), dedup_key=f"{updated_ride.id}_canceled"))
-            await fcm_service.send_to_user(session, user_id, PushNotificationData(title='Поездка отменена', body='Поездка отменена из-за истечения срока оплаты комиссии'))
-            await driver_tracker.release_ride(session, updated_ride.driver_profile_id)
-            await session.commit()
+    async def _cancel_unpaid_ride(self, session: AsyncSession, ride_id: int, user_id: int) -> None:
+        updated_ride = await ride_crud.update(session, ride_id, RideSchemaUpdateByClient(status='canceled'), user_id)
+        driver_profile = await driver_profile_crud.get_by_id(session, updated_ride.driver_profile_id)
+        await chat_service.save_message_and_send_to_ride(session=session, ride_id=ride_id, text="Клиент не оплатил комиссию вовремя", message_type="system")
+        outbox.send_ws(session, manager_driver_feed, driver_profile.user_id, {"type": "ride_canceled", "message": "Клиент не оплатил комиссию вовремя"})
+        await in_app_notification_crud.create(session, InAppNotificationCreate(user_id=user_id, type="ride_canceled", title="Поездка отменена", message="Поездка отменена из-за истечения срока оплаты комиссии", data=updated_ride.model_dump(mode='json'), dedup_key=f"{updated_ride.id}_canceled"))
+        outbox.send_push(session, [user_id], PushNotificationData(title='Поездка отменена', body='Поездка отменена из-за истечения срока оплаты комиссии'))
+        await driver_tracker.release_ride(session, updated_ride.driver_profile_id)
 
 commission_payment_crud = CommissionPaymentCrud()
+deadline_scheduler.register(COMMISSION_TIMEOUT, commission_payment_crud.cancel_unpaid_rides)
@@ -1,18 +1,97 @@
-from sqlalchemy import delete, insert, select
+import logging, time
+from collections import OrderedDict
+from typing import Iterable
+from sqlalchemy import delete, event, insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.config import DEVICE_TOKEN_CACHE_MAX_USERS, DEVICE_TOKEN_CACHE_TTL_SECONDS
 from app.crud.base import CrudBase
 from app.models.device_token import DeviceToken
 from app.schemas.device_token import DeviceTokenCreate, DeviceTokenSchema, DeviceTokenUpdate
+from app.services.pubsub import pubsub
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = "device_token_invalidations"
 
 
 class DeviceTokenCrud(CrudBase[DeviceToken, DeviceTokenSchema]):
+    """Device tokens with an in-process cache of each user's tokens (users without tokens are cached too).
+
+    Writes through this crud drop the affected users right away and again after the commit, and other workers are told
+    over pubsub; DEVICE_TOKEN_CACHE_TTL_SECONDS bounds staleness from writes made elsewhere."""
+
     def __init__(self) -> None:
         super().__init__(DeviceToken, DeviceTokenSchema)
+        self._cache: "OrderedDict[int, tuple[float, list[DeviceTokenSchema]]]" = OrderedDict()
+        self._generation = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        pubsub.subscribe("device_tokens", self.on_remote_invalidation)
 
     async def get_by_user_id(self, session: AsyncSession, user_id: int) -> list[DeviceTokenSchema]:
-        result = await session.execute(select(self.model).where(self.model.user_id == user_id))
-        items = result.scalars().all()
-        return [self.schema.model_validate(item) for item in items]
+        return await self.get_by_user_ids(session, [user_id])
+
+    async def get_by_user_ids(self, session: AsyncSession, user_ids: list[int]) -> list[DeviceTokenSchema]:
+        now = time.monotonic()
+        tokens: list[DeviceTokenSchema] = []
+        misses: list[int] = []
+        for user_id in dict.fromkeys(user_ids):
+            entry = self._cache.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._cache.move_to_end(user_id)
+                tokens.extend(entry[1])
+            else:
+                misses.append(user_id)
+
+        self.cache_hits += len(user_ids) - len(misses)
+        self.cache_misses += len(misses)
+        if not misses:
+            return tokens
+
+        generation = self._generation
+        result = await session.execute(select(self.model).where(self.model.user_id.in_(misses)))
+        loaded: dict[int, list[DeviceTokenSchema]] = {user_id: [] for user_id in misses}
+        for item in result.scalars().all():
+            loaded[item.user_id].append(self.schema.model_validate(item))
+
+        if generation == self._generation:
+            expires_at = now + DEVICE_TOKEN_CACHE_TTL_SECONDS
+            for user_id, user_tokens in loaded.items():
+                self._cache[user_id] = (expires_at, user_tokens)
+                self._cache.move_to_end(user_id)
+            while len(self._cache) > DEVICE_TOKEN_CACHE_MAX_USERS:
+                self._cache.popitem(last=False)
+
+        for user_tokens in loaded.values():
+            tokens.extend(user_tokens)
+        return tokens
+
+    def invalidate(self, user_ids: Iterable[int]) -> None:
+        self._generation += 1
+        for user_id in user_ids:
+            self._cache.pop(user_id, None)
+
+    def _invalidate_on_commit(self, session: AsyncSession, user_ids: Iterable[int]) -> None:
+        user_ids = set(user_ids)
+        self.invalidate(user_ids)
+        session.sync_session.info.setdefault(_PENDING_KEY, set()).update(user_ids)
+
+    def _on_commit(self, session: Session) -> None:
+        user_ids = session.info.pop(_PENDING_KEY, None)
+        if not user_ids:
+            return
+
+        self.invalidate(user_ids)
+        if pubsub.distributed:
+            pubsub.publish_nowait("device_tokens", {"user_ids": sorted(user_ids)})
+
+    @staticmethod
+    def _on_rollback(session: Session) -> None:
+        session.info.pop(_PENDING_KEY, None)
+
+    async def on_remote_invalidation(self, payload: dict) -> None:
+        self.invalidate(payload["user_ids"])
 
     async def get_by_user_id_and_token(self, session: AsyncSession, user_id: int, token: str) -> DeviceTokenSchema | None:
         result = await session.execute(
@@ -22,9 +101,10 @@ class DeviceTokenCrud(CrudBase[DeviceToken, DeviceTokenSchema]):
         return self.schema.model_validate(item) if item else None
 
     async def create(self, session: AsyncSession, create_obj: DeviceTokenCreate) -> DeviceTokenSchema:
-        existing = await self.get_by_user_id(session, create_obj.user_id)
-        if len(existing):
-            first_token = existing[0]
+        existing = await session.execute(select(self.model).where(self.model.user_id == create_obj.user_id).limit(1))
+        first_token = existing.scalar_one_or_none()
+        self._invalidate_on_commit(session, [create_obj.user_id])
+        if first_token is not None:
             return await self.update(session, first_token.id, create_obj)
 
         stmt = insert(self.model).values(create_obj.model_dump()).returning(self.model)
@@ -34,7 +114,20 @@ class DeviceTokenCrud(CrudBase[DeviceToken, DeviceTokenSchema]):
     async def delete_by_user_id_and_token(self, session: AsyncSession, user_id: int, token: str) -> DeviceTokenSchema | None:
         stmt = delete(self.model).where(self.model.user_id == user_id, self.model.token == token).returning(self.model)
         result = await self.execute_get_one(session, stmt)
+        self._invalidate_on_commit(session, [user_id])
         return self.schema.model_validate(result) if result else None
 
+    async def delete_tokens(self, session: AsyncSession, tokens: list[str]) -> int:
+        """Batched delete of tokens FCM reported as dead; returns how many rows went."""
+        if not tokens:
+            return 0
+
+        result = await session.execute(delete(self.model).where(self.model.token.in_(tokens)).returning(self.model.user_id))
+        user_ids = result.scalars().all()
+        self._invalidate_on_commit(session, user_ids)
+        return len(user_ids)
+
 
 device_token_crud = DeviceTokenCrud()
+event.listen(Session, "after_commit", device_token_crud._on_commit)
+event.listen(Session, "after_rollback", device_token_crud._on_rollback)
@@ -1,12 +1,17 @@
-from typing import Dict, List
+from typing import Dict, List, Optional, Set, Tuple
 from asyncio import Task
 import math, asyncio, logging, app.config
+import numpy as np
+from app.dataclass import DriverState
 from app.services.websocket_manager import manager_driver_feed
 from app.services.driver_state_storage import driver_state_storage
+from app.services.ride_book import ride_book
+from app.services.ride_events import ride_events
+from app.services.geo import bounding_box, haversine_km_many
 from app.db import async_session_maker
 from app.models import Ride
 from app.schemas.ride import RideSchema
-from sqlalchemy import and_, select
+from sqlalchemy import and_, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 logger = logging.getLogger(__name__)
@@ -14,80 +19,135 @@ logger = logging.getLogger(__name__)
 
 class DriverFeed:
     def __init__(self):
-        self._tasks: Dict[int, Task[None]] = {}
-    
-    @staticmethod
-    def _haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-        R = 6371
-        lat1_rad = math.radians(lat1)
-        lat2_rad = math.radians(lat2)
-        delta_lat = math.radians(lat2 - lat1)
-        delta_lon = math.radians(lon2 - lon1)
-
-        a = (math.sin(delta_lat / 2) ** 2 +
-             math.cos(lat1_rad) * math.cos(lat2_rad) *
-             math.sin(delta_lon / 2) ** 2)
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        return R * c
+        self._subscribers: Dict[int, int] = {}
+        self._scheduler: Optional[Task[None]] = None
+        self._dirty: Set[int] = set()
+        self._debouncer: Optional[Task[None]] = None
+        ride_events.subscribe(self.on_ride_event)
 
     async def start_feed_task(self, user_id: int, driver_profile_id: int) -> None:
-        existing = self._tasks.get(user_id)
-        if existing is not None and not existing.done():
-            existing.cancel()
+        self._subscribers[user_id] = driver_profile_id
+        if self._scheduler is None or self._scheduler.done():
+            self._scheduler = asyncio.create_task(self._loop())
+            return
 
-        self._tasks[user_id] = asyncio.create_task(self._loop(user_id=user_id, driver_profile_id=driver_profile_id))
+        self.signal(user_id)
 
     async def stop_feed(self, user_id: int) -> None:
-        task = self._tasks.pop(user_id, None)
-        if task is None:
+        self._subscribers.pop(user_id, None)
+        self._dirty.discard(user_id)
+
+    def is_subscribed(self, user_id: int) -> bool:
+        return user_id in self._subscribers
+
+    def signal(self, user_id: int) -> None:
+        """Mark a subscriber's feed stale; stale feeds are recomputed together once the debounce window closes."""
+        if user_id not in self._subscribers:
             return
 
-        if not task.done():
-            task.cancel()
+        self._dirty.add(user_id)
+        if self._debouncer is None or self._debouncer.done():
+            self._debouncer = asyncio.create_task(self._flush_dirty())
+
+    async def _flush_dirty(self) -> None:
+        # signal() does not re-arm while this task is alive, so anything marked during a push is picked up by the next round
+        while self._dirty:
+            await asyncio.sleep(app.config.FEED_DEBOUNCE_SECONDS)
+            dirty, self._dirty = self._dirty, set()
+            subscribers = [(user_id, self._subscribers[user_id]) for user_id in dirty if user_id in self._subscribers]
+            try:
+                await self._push_feeds(subscribers)
+            except Exception as exc:
+                logger.error(f"Ride feed debounce error: {exc}")
+
+    async def _loop(self) -> None:
+        while self._subscribers:
+            try:
+                await self._tick()
+            except asyncio.CancelledError:
+                return
+            except Exception as exc:
+                logger.error(f"Ride feed tick error: {exc}")
+
+            await asyncio.sleep(app.config.FEED_PUSH_INTERVAL_SECONDS)
+
+    async def _tick(self) -> None:
+        for user_id in [user_id for user_id in self._subscribers if not manager_driver_feed.is_connected(user_id)]:
+            self._subscribers.pop(user_id, None)
+
+        self._dirty.clear()
+        await self._push_feeds(list(self._subscribers.items()))
+
+    async def _push_feeds(self, subscribers: List[Tuple[int, int]]) -> None:
+        if not subscribers:
+            return
+
+        if not ride_book.loaded:
+            async with async_session_maker() as session:
+                await ride_book.load(session)
 
-    async def _loop(self, user_id: int, driver_profile_id: int) -> None:
-        try:
-            while manager_driver_feed.is_connected(user_id):
-                async with async_session_maker() as session:
-                    feed = await self.get_driver_feed(session, driver_profile_id, app.config.FEED_LIMIT)
-                    await manager_driver_feed.send_personal_message(user_id, {"type": "ride_feed", "driver_profile_id": driver_profile_id, "count": len(feed), "rides": feed})
+        drivers = [driver for driver in (driver_state_storage.get_driver(driver_profile_id) for _, driver_profile_id in subscribers) if driver and driver.is_available()]
+        feeds = ride_book.get_nearby_for_drivers(drivers, app.config.MAX_DISTANCE_KM, app.config.FEED_LIMIT)
+        for user_id, driver_profile_id in subscribers:
+            await self._send_feed(user_id, driver_profile_id, feeds.get(driver_profile_id, []))
 
-                await asyncio.sleep(app.config.FEED_PUSH_INTERVAL_SECONDS)
-        except asyncio.CancelledError:
+    async def on_ride_event(self, kind: str, ride: RideSchema) -> None:
+        if not self._subscribers:
             return
-        except Exception as exc:
-            logger.error(f"Ride feed loop error for user {user_id}: {exc}")
+
+        nearby = driver_state_storage.get_available_drivers_near(float(ride.pickup_lat), float(ride.pickup_lng), app.config.MAX_DISTANCE_KM, ride.ride_class, ride.ride_type)
+        for driver, _ in nearby:
+            if self._subscribers.get(driver.user_id) == driver.driver_profile_id:
+                self.signal(driver.user_id)
+
+    async def _send_feed(self, user_id: int, driver_profile_id: int, nearest: List[Tuple[float, RideSchema]]) -> None:
+        feed = self.serialize(nearest)
+        await manager_driver_feed.send_personal_message(user_id, {"type": "ride_feed", "driver_profile_id": driver_profile_id, "count": len(feed), "rides": feed})
+
+    @staticmethod
+    def serialize(nearest: List[Tuple[float, RideSchema]]) -> List[dict]:
+        return [{**ride.model_dump(), 'distance_to_pickup_km': round(distance, 2)} for distance, ride in nearest]
+
+    def build_feed(self, driver: Optional[DriverState], limit: int = 20) -> List[dict]:
+        if not driver or not driver.is_available():
+            return []
+
+        return self.serialize(ride_book.get_nearby_for_driver(driver, app.config.MAX_DISTANCE_KM, limit))
 
     async def get_driver_feed(self, session: AsyncSession, driver_profile_id: int, limit: int = 20) -> List[dict]:
         driver = driver_state_storage.get_driver(driver_profile_id)
-        if not driver or not driver.is_available() or driver.latitude is None or driver.longitude is None :
+        if not driver or not driver.is_available():
+            return []
+
+        if not ride_book.loaded:
+            return self.serialize(await self.get_requested_rides(session, float(driver.latitude), float(driver.longitude), app.config.MAX_DISTANCE_KM, limit, driver))
+        return self.build_feed(driver, limit)
+
+    async def get_requested_rides(self, session: AsyncSession, latitude: float, longitude: float, radius_km: float, limit: int = 20, driver: Optional[DriverState] = None) -> List[Tuple[float, RideSchema]]:
+        """DB path for open rides near a point, nearest first; served by the ix_rides_open_pickup partial index."""
+        min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, longitude, radius_km)
+        conditions = [
+            Ride.status == "requested",
+            Ride.driver_profile_id.is_(None),
+            Ride.pickup_lat.between(min_lat, max_lat),
+            Ride.pickup_lng.between(min_lng, max_lng),
+        ]
+        if driver is not None:
+            classes = [ride_class.lower() for ride_class in driver.classes_allowed]
+            conditions.append(func.lower(Ride.ride_class).in_(classes))
+            if driver.car_id is None:
+                conditions.append(Ride.ride_type != "with_car")
+
+        cos_lat = math.cos(math.radians(latitude))
+        approx_distance = func.power(Ride.pickup_lat - latitude, 2) + func.power((Ride.pickup_lng - longitude) * cos_lat, 2)
+        result = await session.execute(select(Ride).where(and_(*conditions)).order_by(approx_distance).limit(limit))
+        rides = [RideSchema.model_validate(ride) for ride in result.scalars().all()]
+        if not rides:
             return []
 
-        rides = await self.get_requested_rides(session, limit=limit * 2)
-        relevant_rides = []
-        for ride in rides:
-            if not driver.has_permit(ride.ride_class, ride.ride_type):
-                continue
-
-            pickup_lat = ride.pickup_lat
-            pickup_lng = ride.pickup_lng
-            distance = self._haversine_distance(
-                driver.latitude, driver.longitude,
-                float(pickup_lat), float(pickup_lng)
-            )
-            if distance > app.config.MAX_DISTANCE_KM:
-                continue
-
-            ride_with_distance = {**ride.model_dump(), 'distance_to_pickup_km': round(distance, 2)}
-            relevant_rides.append((distance, ride_with_distance))
-
-        relevant_rides.sort(key=lambda x: x[0])
-        return [r[1] for r in relevant_rides[:limit]]
-
-    async def get_requested_rides(self, session: AsyncSession, limit: int = 1) -> list[RideSchema]:
-        stmt = select(Ride).where(and_(Ride.status == "requested", Ride.driver_profile_id.is_(None))).limit(limit)
-        result = await session.execute(stmt)
-        rides = result.scalars().all()
-        return [RideSchema.model_validate(ride) for ride in rides]
+        latitudes = np.fromiter((float(ride.pickup_lat) for ride in rides), dtype=float, count=len(rides))
+        longitudes = np.fromiter((float(ride.pickup_lng) for ride in rides), dtype=float, count=len(rides))
+        distances = haversine_km_many(latitude, longitude, latitudes, longitudes)
+        return sorted(((float(distance), ride) for distance, ride in zip(distances, rides) if distance <= radius_km), key=lambda item: item[0])
 
 driver_feed = DriverFeed()
\ No newline at end of file
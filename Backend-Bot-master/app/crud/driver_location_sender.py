@@ -1,44 +1,104 @@
-from typing import Dict
+from typing import Dict, Set
 from asyncio import Task
-import asyncio, logging
+import asyncio, logging, time
+from app.dataclass import DriverState
 from app.services.websocket_manager import manager_notifications
-from app.db import async_session_maker
-from .driver_location import driver_location_crud
+from app.services.driver_state_storage import driver_state_storage
+from app.services.pubsub import pubsub
 from app.config import DRIVER_LOCATION_PUSH_INTERVAL_SECONDS
 
 logger = logging.getLogger(__name__)
 
 
 class DriverLocationSender:
+    """Pushes in-memory driver positions to the clients tracking them, at most once per DRIVER_LOCATION_PUSH_INTERVAL_SECONDS per driver."""
+
     def __init__(self):
-        self._tasks: Dict[int, Task[None]] = {}
+        self._subscribers: Dict[int, Set[int]] = {}
+        self._subscriptions: Dict[int, int] = {}
+        self._last_sent: Dict[int, float] = {}
+        self._trailing: Dict[int, Task[None]] = {}
+        driver_state_storage.add_remote_listener(self.publish)
+        pubsub.subscribe("driver_location", self.on_remote_unsubscribe)
+
+    async def subscribe(self, user_id: int, driver_profile_id: int) -> None:
+        await self.unsubscribe(user_id)
+        self._subscriptions[user_id] = driver_profile_id
+        self._subscribers.setdefault(driver_profile_id, set()).add(user_id)
+
+        state = driver_state_storage.get_driver(driver_profile_id)
+        if state and state.latitude is not None:
+            await manager_notifications.send_personal_message(user_id, self._message(state))
 
-    async def start_task(self, user_id: int, driver_profile_id: int) -> None:
-        existing = self._tasks.get(user_id)
-        if existing is not None and not existing.done():
-            existing.cancel()
+    async def unsubscribe(self, user_id: int) -> None:
+        if pubsub.distributed:
+            await pubsub.publish("driver_location", {"user_id": user_id})
+        self._unsubscribe_local(user_id)
 
-        self._tasks[user_id] = asyncio.create_task(self._loop(user_id=user_id, driver_profile_id=driver_profile_id))
+    async def on_remote_unsubscribe(self, payload: dict) -> None:
+        self._unsubscribe_local(int(payload["user_id"]))
 
-    async def stop_task(self, user_id: int) -> None:
-        task = self._tasks.pop(user_id, None)
-        if task is None:
+    def _unsubscribe_local(self, user_id: int) -> None:
+        driver_profile_id = self._subscriptions.pop(user_id, None)
+        if driver_profile_id is None:
             return
 
-        if not task.done():
+        subscribers = self._subscribers.get(driver_profile_id)
+        if subscribers is not None:
+            subscribers.discard(user_id)
+            if not subscribers:
+                self._drop_driver(driver_profile_id)
+
+    def _drop_driver(self, driver_profile_id: int) -> None:
+        self._subscribers.pop(driver_profile_id, None)
+        self._last_sent.pop(driver_profile_id, None)
+        task = self._trailing.pop(driver_profile_id, None)
+        if task is not None and not task.done():
             task.cancel()
 
-    async def _loop(self, user_id: int, driver_profile_id: int) -> None:
-        try:
-            while manager_notifications.is_connected(user_id):
-                async with async_session_maker() as session:
-                    location = await driver_location_crud.get_by_driver_profile_id(session, driver_profile_id)
-                    await manager_notifications.send_personal_message(user_id, {"type": "driver_location", "location": location.model_dump(mode='json')})
+    async def publish(self, state: DriverState) -> None:
+        driver_profile_id = state.driver_profile_id
+        if driver_profile_id not in self._subscribers:
+            return
 
-                await asyncio.sleep(DRIVER_LOCATION_PUSH_INTERVAL_SECONDS)
+        wait = self._last_sent.get(driver_profile_id, 0.0) + DRIVER_LOCATION_PUSH_INTERVAL_SECONDS - time.monotonic()
+        if wait <= 0:
+            await self._send(driver_profile_id)
+        elif driver_profile_id not in self._trailing:
+            self._trailing[driver_profile_id] = asyncio.create_task(self._send_later(driver_profile_id, wait))
+
+    async def _send_later(self, driver_profile_id: int, delay: float) -> None:
+        try:
+            await asyncio.sleep(delay)
+            self._trailing.pop(driver_profile_id, None)
+            await self._send(driver_profile_id)
         except asyncio.CancelledError:
             return
         except Exception as exc:
-            logger.error(f"Driver location loop error for user {user_id}: {exc}")
+            logger.error(f"Driver location push error for driver {driver_profile_id}: {exc}")
+
+    async def _send(self, driver_profile_id: int) -> None:
+        state = driver_state_storage.get_driver(driver_profile_id)
+        subscribers = self._subscribers.get(driver_profile_id)
+        if state is None or not subscribers:
+            return
+
+        self._last_sent[driver_profile_id] = time.monotonic()
+        message = self._message(state)
+        for user_id in list(subscribers):
+            await manager_notifications.send_personal_message(user_id, message)
+
+    @staticmethod
+    def _message(state: DriverState) -> dict:
+        return {
+            "type": "driver_location",
+            "location": {
+                "driver_profile_id": state.driver_profile_id,
+                "latitude": state.latitude,
+                "longitude": state.longitude,
+                "status": state.status,
+                "last_seen_at": state.updated_at.isoformat(),
+            },
+        }
 
-driver_location_sender = DriverLocationSender()
\ No newline at end of file
+driver_location_sender = DriverLocationSender()
@@ -10,13 +10,7 @@ from .driver_location import driver_location_crud
 from app.models import Car, DriverProfileModeration
 from app.config import DRIVER_PROFILE_INITIAL_RATING_AVG, DRIVER_PROFILE_INITIAL_RATING_COUNT
 from datetime import datetime, timezone
-
-CLASS_VALUE = {
-    'light': 1,
-    'pro': 2,
-    'vip': 3,
-    'elite': 4
-}
+from app.enum import CLASS_VALUE
 
 
 class DriverProfileCrud(CrudBase[DriverProfile, DriverProfileSchema]):
@@ -1,19 +1,47 @@
 from datetime import datetime, timezone
 from app.enum import DriverStatus
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from app.dataclass import DriverState
-import logging
+import logging, time, app.config
 from sqlalchemy.ext.asyncio import AsyncSession
 from .driver_location import driver_location_crud
 from .driver_feed import driver_feed
+from .driver_location_sender import driver_location_sender
 from .driver_profile import driver_profile_crud
 from app.services.driver_state_storage import driver_state_storage
-from app.schemas.driver_location import DriverLocationUpdateMe, DriverLocationUpdate
+from app.services.driver_location_buffer import driver_location_buffer
+from app.services.ride_trace import ride_trace
+from app.services.geo import haversine_km
+from app.schemas.driver_location import DriverLocationUpdate
 
 logger = logging.getLogger(__name__)
 
 
 class DriverTracker:
+    def __init__(self):
+        self._last_fix: Dict[int, Tuple[float, DriverStatus]] = {}
+        self._last_fix_ts: Dict[int, float] = {}
+        self.fixes_accepted = 0
+        self.fixes_dropped = 0
+
+    def _accept_fix(self, state: DriverState, latitude: float, longitude: float) -> bool:
+        """Ingestion filter: drop fixes that barely moved or arrive too fast, unless the status changed since the last accepted one."""
+        last = self._last_fix.get(state.driver_profile_id)
+        if last is None or state.latitude is None or last[1] != state.status:
+            return True
+
+        if time.monotonic() - last[0] < app.config.DRIVER_LOCATION_MIN_INTERVAL_SECONDS:
+            return False
+
+        return haversine_km(float(state.latitude), float(state.longitude), latitude, longitude) * 1000 >= app.config.DRIVER_LOCATION_MIN_DISTANCE_METERS
+
+    def is_stale(self, driver_profile_id: int, fix_ts: Optional[float]) -> bool:
+        """Whether a device timestamp is older than the newest fix already applied, e.g. a batch replayed after a reconnect."""
+        return bool(fix_ts) and fix_ts < self._last_fix_ts.get(driver_profile_id, 0.0)
+
+    def forget_fix(self, driver_profile_id: int) -> None:
+        self._last_fix.pop(driver_profile_id, None)
+        self._last_fix_ts.pop(driver_profile_id, None)
 
     async def update_location(self, driver_profile_id: int, latitude: float, longitude: float) -> Optional[DriverState]:
         if driver_profile_id not in driver_state_storage._drivers:
@@ -21,21 +49,42 @@ class DriverTracker:
             return None
 
         state = driver_state_storage._drivers[driver_profile_id]
+        moved = state.latitude != latitude or state.longitude != longitude
         state.latitude = latitude
         state.longitude = longitude
         state.updated_at = datetime.now(timezone.utc)
+        driver_state_storage.reindex(state)
+        await driver_location_sender.publish(state)
 
-        if state.is_available():
-            await driver_feed.start_feed_task(state.user_id, driver_profile_id)
-        else:
+        if not state.is_available():
             await driver_feed.stop_feed(state.user_id)
+        elif moved or not driver_feed.is_subscribed(state.user_id):
+            await driver_feed.start_feed_task(state.user_id, driver_profile_id)
 
         return state
 
-    async def update_location_by_user_id(self, session: AsyncSession, user_id: int, latitude: float, longitude: float, **kwargs) -> Optional[DriverState]:
+    async def update_location_by_user_id(self, session: AsyncSession, user_id: int, latitude: float, longitude: float, fix_ts: Optional[float] = None, **kwargs) -> Optional[DriverState]:
         driver_id = driver_state_storage._user_to_driver.get(user_id, 0)
-        await driver_location_crud.update_by_driver_profile_id(session, driver_id, DriverLocationUpdateMe(latitude=latitude, longitude=longitude))
-        return await self.update_location(driver_id, latitude, longitude, **kwargs)
+        state = driver_state_storage.get_driver(driver_id)
+        if state and ride_trace.is_recording(state.current_ride_id):
+            await ride_trace.record(state.current_ride_id, driver_id, [(latitude, longitude, fix_ts)])
+        if state and fix_ts:
+            self._last_fix_ts[driver_id] = fix_ts
+        if state and not self._accept_fix(state, latitude, longitude):
+            self.fixes_dropped += 1
+            # still a heartbeat: touch replicates it so other workers do not sweep the driver as silent
+            driver_state_storage.touch(state.user_id)
+            return state
+
+        state = await self.update_location(driver_id, latitude, longitude, **kwargs)
+        if state:
+            self.fixes_accepted += 1
+            self._last_fix[driver_id] = (time.monotonic(), state.status)
+            driver_location_buffer.record(driver_id, latitude, longitude)
+        return state
+
+    def get_stats(self) -> dict:
+        return {"fixes_accepted": self.fixes_accepted, "fixes_dropped": self.fixes_dropped}
 
     async def _set_status(self, driver_profile_id: int, status: DriverStatus) -> Optional[DriverState]:
         if driver_profile_id not in driver_state_storage._drivers:
@@ -46,6 +95,7 @@ class DriverTracker:
         old_status = state.status
         state.status = status
         state.updated_at = datetime.now(timezone.utc)
+        driver_state_storage.reindex(state)
         logger.info(f"Driver {driver_profile_id} status: {old_status} -> {status}")
 
         if state.is_available():
@@ -75,6 +125,7 @@ class DriverTracker:
         state.current_ride_id = ride_id
         state.status = DriverStatus.BUSY
         state.updated_at = datetime.now(timezone.utc)
+        driver_state_storage.reindex(state)
         logger.info(f"Driver {driver_profile_id} assigned to ride {ride_id}")
 
         await driver_feed.stop_feed(state.user_id)
@@ -94,6 +145,7 @@ class DriverTracker:
         state.current_ride_id = None
         state.status = DriverStatus.ONLINE
         state.updated_at = datetime.now(timezone.utc)
+        driver_state_storage.reindex(state)
         logger.info(f"Driver {driver_profile_id} released from ride {old_ride}")
 
         await driver_feed.start_feed_task(state.user_id, driver_profile_id)
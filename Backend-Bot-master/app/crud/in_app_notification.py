@@ -1,50 +1,126 @@
+from collections import Counter
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.crud.base import CrudBase
-from app.models.in_app_notification import InAppNotification
-from app.schemas.in_app_notification import InAppNotificationSchema, InAppNotificationCreate
-from sqlalchemy import select, and_, insert
+from app.models.in_app_notification import InAppNotification, InAppNotificationCounter
+from app.schemas.in_app_notification import InAppNotificationSchema, InAppNotificationCreate, InAppNotificationUpdate
+from typing import List, Optional
+from sqlalchemy import select, and_, func, tuple_, update
+from sqlalchemy.orm import aliased
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from datetime import datetime, timezone
 from fastapi import HTTPException
 from app.services.websocket_manager import manager_notifications
+from app.services.outbox import outbox
+
+INSERT_CHUNK_ROWS = 1000
 
 
 class InAppNotificationCrud(CrudBase[InAppNotification, InAppNotificationSchema]):
+    """In-app notifications plus a per-user unread counter (in_app_notification_counters) kept in step by every write
+    here within the same transaction, so the badge is a primary key read."""
+
     def __init__(self) -> None:
         super().__init__(InAppNotification, InAppNotificationSchema)
     
+    def _insert_ignoring_duplicates(self, rows: List[dict]):
+        """Rows with a (user_id, type, dedup_key) already stored are skipped; RETURNING yields only the inserted ones."""
+        return (
+            pg_insert(self.model)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=[self.model.user_id, self.model.type, self.model.dedup_key])
+            .returning(self.model)
+        )
+
     async def create(self, session: AsyncSession, create_obj: InAppNotificationCreate) -> InAppNotificationSchema | None:
-        if create_obj.dedup_key:
-            existing = await session.execute(select(self.model).where(and_(self.model.dedup_key == create_obj.dedup_key, self.model.user_id == create_obj.user_id, self.model.type == create_obj.type)))
-            if existing.scalar_one_or_none():
-                return None
-        
-        stmt = insert(self.model).values(create_obj.model_dump()).returning(self.model)
-        result = await self.execute_get_one(session, stmt)
+        result = await self.execute_get_one(session, self._insert_ignoring_duplicates([create_obj.model_dump()]))
         if not result:
             return None
 
         result_model = self.schema.model_validate(result)
-        await manager_notifications.send_personal_message(create_obj.user_id, result_model.model_dump())
+        if result_model.read_at is None:
+            await self._add_unread(session, [result_model.user_id])
+        outbox.send_ws(session, manager_notifications, create_obj.user_id, result_model.model_dump())
         return result_model
 
-    async def get_by_user_id(self, session: AsyncSession, user_id: int, page: int = 1, page_size: int = 10):
-        offset = (page - 1) * page_size
-        result = await session.execute(select(self.model).where(self.model.user_id == user_id).offset(offset).limit(page_size))
-        items = result.scalars().all()
-        return [self.schema.model_validate(item) for item in items]
+    async def create_many(self, session: AsyncSession, create_objs: List[InAppNotificationCreate]) -> List[InAppNotificationSchema]:
+        """Insert in INSERT_CHUNK_ROWS-row statements and return the rows actually inserted; their WS deliveries go to the
+        outbox like create's."""
+        created: List[InAppNotificationSchema] = []
+        rows = [create_obj.model_dump() for create_obj in create_objs]
+        for start in range(0, len(rows), INSERT_CHUNK_ROWS):
+            result = await session.execute(self._insert_ignoring_duplicates(rows[start:start + INSERT_CHUNK_ROWS]))
+            created.extend(self.schema.model_validate(item) for item in result.scalars().all())
+        await self._add_unread(session, [item.user_id for item in created if item.read_at is None])
+        for item in created:
+            outbox.send_ws(session, manager_notifications, item.user_id, item.model_dump())
+        return created
+
+    async def update(self, session: AsyncSession, id: int, update_obj: InAppNotificationUpdate) -> InAppNotificationSchema | None:
+        existing = await self.get_by_id(session, id)
+        result = await super().update(session, id, update_obj)
+        if existing and result and existing.read_at is None and result.read_at is not None:
+            await self._remove_unread(session, result.user_id, 1)
+        return result
+
+    async def delete(self, session: AsyncSession, id: int) -> InAppNotificationSchema | None:
+        result = await super().delete(session, id)
+        if result and result.read_at is None:
+            await self._remove_unread(session, result.user_id, 1)
+        return result
+
+    async def _add_unread(self, session: AsyncSession, user_ids: List[int]) -> None:
+        rows = [{"user_id": user_id, "unread": count} for user_id, count in sorted(Counter(user_ids).items())]
+        for start in range(0, len(rows), INSERT_CHUNK_ROWS):
+            stmt = pg_insert(InAppNotificationCounter).values(rows[start:start + INSERT_CHUNK_ROWS])
+            await session.execute(stmt.on_conflict_do_update(
+                index_elements=[InAppNotificationCounter.user_id],
+                set_={"unread": InAppNotificationCounter.unread + stmt.excluded.unread},
+            ))
 
-    async def get_unread_by_user_id(self, session: AsyncSession, user_id: int, page: int = 1, page_size: int = 10):
-        offset = (page - 1) * page_size
-        result = await session.execute(select(self.model).where(and_(self.model.user_id == user_id, self.model.read_at.is_(None))).offset(offset).limit(page_size))
+    async def _remove_unread(self, session: AsyncSession, user_id: int, count: int) -> None:
+        await session.execute(
+            update(InAppNotificationCounter)
+            .where(InAppNotificationCounter.user_id == user_id)
+            .values(unread=func.greatest(InAppNotificationCounter.unread - count, 0))
+        )
+
+    async def get_unread_count(self, session: AsyncSession, user_id: int) -> int:
+        result = await session.execute(select(InAppNotificationCounter.unread).where(InAppNotificationCounter.user_id == user_id))
+        return result.scalar_one_or_none() or 0
+
+    async def _get_page(self, session: AsyncSession, conditions: list, cursor: Optional[int], page: int, page_size: int) -> List[InAppNotificationSchema]:
+        """Newest first by (created_at, id). cursor is the id of the last notification already seen; without it the
+        page/page_size offset still works for older clients."""
+        stmt = select(self.model).where(and_(*conditions))
+        if cursor is not None:
+            anchor = aliased(self.model)
+            cursor_created_at = select(anchor.created_at).where(anchor.id == cursor).scalar_subquery()
+            stmt = stmt.where(tuple_(self.model.created_at, self.model.id) < tuple_(cursor_created_at, cursor))
+        else:
+            stmt = stmt.offset((page - 1) * page_size)
+        result = await session.execute(stmt.order_by(self.model.created_at.desc(), self.model.id.desc()).limit(page_size))
         items = result.scalars().all()
         return [self.schema.model_validate(item) for item in items]
 
+    async def get_by_user_id(self, session: AsyncSession, user_id: int, page: int = 1, page_size: int = 10, cursor: Optional[int] = None):
+        return await self._get_page(session, [self.model.user_id == user_id], cursor, page, page_size)
+
+    async def get_unread_by_user_id(self, session: AsyncSession, user_id: int, page: int = 1, page_size: int = 10, cursor: Optional[int] = None):
+        return await self._get_page(session, [self.model.user_id == user_id, self.model.read_at.is_(None)], cursor, page, page_size)
+
     async def mark_all_as_read(self, session: AsyncSession, user_id: int):
-        result = await session.execute(select(self.model).where(and_(self.model.user_id == user_id, self.model.read_at.is_(None))))
-        notifications = result.scalars().all()
         today = datetime.now(timezone.utc)
-        for notification in notifications:
-            notification.read_at = today
+        stmt = (
+            update(self.model)
+            .where(and_(self.model.user_id == user_id, self.model.read_at.is_(None)))
+            .values(read_at=today)
+            .returning(self.model)
+            .execution_options(synchronize_session=False)
+        )
+        result = await session.execute(stmt)
+        notifications = result.scalars().all()
+        if notifications:
+            await self._remove_unread(session, user_id, len(notifications))
         return [self.schema.model_validate(notification) for notification in notifications]
 
     async def mark_one_as_read(self, session: AsyncSession, notification_id: int, user_id: int):
@@ -54,8 +130,20 @@ class InAppNotificationCrud(CrudBase[InAppNotification, InAppNotificationSchema]
             raise HTTPException(status_code=404, detail="Notification not found")
         if notification.user_id != user_id:
             raise HTTPException(status_code=403, detail="Not authorized to read this notification")
-        today = datetime.now(timezone.utc)
-        notification.read_at = today
-        return self.schema.model_validate(notification)
+        # only the request that actually flips read_at decrements the counter, so concurrent reads count once
+        stmt = (
+            update(self.model)
+            .where(and_(self.model.id == notification_id, self.model.read_at.is_(None)))
+            .values(read_at=datetime.now(timezone.utc))
+            .returning(self.model)
+            .execution_options(synchronize_session=False, populate_existing=True)
+        )
+        result = await session.execute(stmt)
+        updated = result.scalar_one_or_none()
+        if updated is None:
+            await session.refresh(notification)
+            return self.schema.model_validate(notification)
+        await self._remove_unread(session, user_id, 1)
+        return self.schema.model_validate(updated)
 
 in_app_notification_crud = InAppNotificationCrud()
@@ -1,4 +1,3 @@
-import asyncio
 from datetime import datetime, timezone
 from sqlalchemy import and_, func, or_
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -13,16 +12,18 @@ from .driver_location import driver_location_crud
 from .in_app_notification import in_app_notification_crud
 from .driver_location_sender import driver_location_sender
 from .driver_tracker import driver_tracker, DriverStatus
-from app.models import Ride, Commission, RideDriversRequest, ChatMessage
-from app.schemas.ride import RideSchema, RideSchemaHistory, RideSchemaWithRating, RideSchemaWithDriverProfile, RideSchemaUpdateByClient, RideSchemaWithChatMessage
+from app.models import Ride, Commission, RideDriversRequest, ChatMessage, RideStatusHistory
+from app.schemas.ride import RideSchema, RideSchemaHistory, RideSchemaWithRating, RideSchemaWithDriverProfile, RideSchemaWithChatMessage
 from app.schemas.chat_message import ChatMessageSchema
 from app.schemas.ride_status_history import RideStatusHistoryCreate
 from app.schemas.in_app_notification import InAppNotificationCreate
 from app.schemas.push import PushNotificationData
 from fastapi import HTTPException
-from app.config import RIDE_SECONDS_LIMIT
-from app.db import async_session_maker
-from app.services.fcm_service import fcm_service
+from app.services.outbox import outbox
+from app.services.ride_events import ride_events
+from app.services.deadline_scheduler import deadline_scheduler, RIDE_TIMEOUT, COMMISSION_TIMEOUT
+from app.services.ride_trace import ride_trace
+from app.schemas.deadline import DeadlineSchema
 
 
 STATUSES = {
@@ -45,6 +46,11 @@ ALLOWED_TRANSITIONS = {
     "started": {"completed", "canceled"},
 }
 
+DEADLINE_BY_STATUS = {
+    "requested": RIDE_TIMEOUT,
+    "waiting_commission": COMMISSION_TIMEOUT,
+}
+
 
 class RideCrud(CrudBase[Ride, RideSchema]):
 
@@ -71,7 +77,10 @@ class RideCrud(CrudBase[Ride, RideSchema]):
         if not ride:
             raise HTTPException(status_code=400, detail="Ride wasn't created")
         await ride_status_history_crud.create(session, RideStatusHistoryCreate(ride_id=ride.id, from_status=None, to_status='requested', changed_by=create_obj.client_id, created_at=datetime.now(timezone.utc)))
-        return self.schema.model_validate(ride)
+        ride = self.schema.model_validate(ride)
+        if self._is_open(ride):
+            ride_events.publish_added(session, ride)
+        return ride
 
     async def update(self, session: AsyncSession, id: int, update_obj, user_id: int) -> RideSchema | None:
         existing_result = await session.execute(select(self.model).where(self.model.id == id))
@@ -88,11 +97,13 @@ class RideCrud(CrudBase[Ride, RideSchema]):
             return await self.get_by_id(session, id)
         
         if update_obj.status == 'started' or update_obj.status == 'canceled':
-            await driver_location_sender.stop_task(existing.client_id)
+            await driver_location_sender.unsubscribe(existing.client_id)
 
         if update_obj.status and existing.status != update_obj.status:
             if not self._is_status_transition_allowed(existing.status, update_obj.status):
                 raise HTTPException(status_code=400, detail=f"Incorrect ride status transition from {existing.status} to {update_obj.status}")
+            if existing.status in DEADLINE_BY_STATUS:
+                await deadline_scheduler.cancel(session, [existing.id], DEADLINE_BY_STATUS[existing.status])
             await ride_status_history_crud.create(session, RideStatusHistoryCreate(ride_id=existing.id, from_status=existing.status, to_status=update_obj.status, changed_by=int(user_id), created_at=datetime.now(timezone.utc)))
 
         stmt = (
@@ -104,7 +115,21 @@ class RideCrud(CrudBase[Ride, RideSchema]):
         result = await self.execute_get_one(session, stmt)
         if not result:
             return None
-        return self.schema.model_validate(result)
+        ride = self.schema.model_validate(result)
+        if self._is_open(ride):
+            ride_events.publish_added(session, ride)
+        elif existing.status == 'requested':
+            ride_events.publish_removed(session, ride)
+
+        if ride.status == 'started':
+            ride_trace.start(session, ride.id)
+        elif ride.status == 'canceled':
+            ride_trace.stop(session, ride.id)
+        return ride
+
+    @staticmethod
+    def _is_open(ride) -> bool:
+        return ride.status == 'requested' and ride.driver_profile_id is None
 
     @staticmethod
     def _is_status_transition_allowed(from_status: str, to_status: str) -> bool:
@@ -139,8 +164,11 @@ class RideCrud(CrudBase[Ride, RideSchema]):
         if not result:
             return None
         await ride_status_history_crud.create(session, RideStatusHistoryCreate(ride_id=result.id, from_status='requested', to_status=update_obj.status, changed_by=user_id, created_at=datetime.now(timezone.utc)))
+        await deadline_scheduler.cancel(session, [result.id], RIDE_TIMEOUT)
         await driver_profile_crud.ride_count_increment(session, update_obj.driver_profile_id)
-        return self.schema.model_validate(result)
+        ride = self.schema.model_validate(result)
+        ride_events.publish_removed(session, ride)
+        return ride
 
     async def delete(self, session: AsyncSession, id: int):
         stmt = delete(self.model).where(self.model.id == id).returning(self.model)
@@ -148,7 +176,9 @@ class RideCrud(CrudBase[Ride, RideSchema]):
         if not result:
             return None
         await driver_profile_crud.ride_count_decrement(session, result.driver_profile_id)
-        return self.schema.model_validate(result)
+        ride = self.schema.model_validate(result)
+        ride_events.publish_removed(session, ride)
+        return ride
     
     async def cancel_rides_by_user_id(self, session: AsyncSession, user_id: int):
         stmt = select(self.model).where(and_(self.model.status.in_(["requested", "waiting_commission", "accepted", "on_the_way", "arrived", "started"]), self.model.client_id == user_id))
@@ -160,14 +190,21 @@ class RideCrud(CrudBase[Ride, RideSchema]):
         driver_profile_ids = [ride.driver_profile_id for ride in existing_rides]
         client_ids = [ride.client_id for ride in existing_rides]
 
+        open_rides = [self.schema.model_validate(ride) for ride in existing_rides if self._is_open(ride)]
+
         update_stmt_rides = update(self.model).where(self.model.id.in_(ids)).values(status="canceled")
         await session.execute(update_stmt_rides)
+        await deadline_scheduler.cancel(session, ids)
+        for open_ride in open_rides:
+            ride_events.publish_removed(session, open_ride)
+        for id in ids:
+            ride_trace.stop(session, id)
 
         for id in driver_profile_ids:
             await driver_tracker.release_ride(session, id)
         
         for id in client_ids:
-            await driver_location_sender.stop_task(id)
+            await driver_location_sender.unsubscribe(id)
         
         requests = await session.execute(update(RideDriversRequest).where(RideDriversRequest.ride_id.in_(ids)).values(status="rejected").returning(RideDriversRequest))
         for request in requests.scalars().all():
@@ -348,17 +385,26 @@ class RideCrud(CrudBase[Ride, RideSchema]):
         ride = result.scalar_one_or_none()
         return self.schema.model_validate(ride) if ride else None
 
-    async def cancel_ride_if_timeout(self, id: int, client_id: int) -> None:
-        await asyncio.sleep(RIDE_SECONDS_LIMIT)
-        async with async_session_maker() as session:
-            ride = await self.get_by_id(session, id)
-            if ride and ride.status == 'requested':
-                updated_ride = await self.update(session, id, RideSchemaUpdateByClient(status='canceled'), client_id)
-                requests = await session.execute(update(RideDriversRequest).where(RideDriversRequest.ride_id == updated_ride.id).values(status="rejected").returning(RideDriversRequest))
-                for request in requests.scalars().all():
-                    await driver_tracker.set_status_by_driver(session, request.driver_profile_id, DriverStatus.ONLINE)
-                await in_app_notification_crud.create(session, InAppNotificationCreate(user_id=client_id, type="ride_canceled", title="Поездка отменена", message="Поездка отменена из-за таймаута", data=updated_ride.model_dump(mode='json'), dedup_key=f"{updated_ride.id}_canceled"))
-                await fcm_service.send_to_user(session, client_id, PushNotificationData(title='Поездка отменена', body='Поездка отменена из-за таймаута'))
-            await session.commit()
+    async def cancel_timed_out_rides(self, session: AsyncSession, deadlines: list[DeadlineSchema]) -> None:
+        stmt = update(self.model).where(and_(self.model.id.in_([deadline.ride_id for deadline in deadlines]), self.model.status == 'requested')).values(status='canceled', canceled_at=func.now()).returning(self.model)
+        result = await session.execute(stmt)
+        rides = [self.schema.model_validate(ride) for ride in result.scalars().all()]
+        if not rides:
+            return
+
+        now = datetime.now(timezone.utc)
+        await session.execute(insert(RideStatusHistory).values([{"ride_id": ride.id, "from_status": 'requested', "to_status": 'canceled', "changed_by": ride.client_id, "created_at": now} for ride in rides]))
+        for ride in rides:
+            ride_events.publish_removed(session, ride)
+            await driver_location_sender.unsubscribe(ride.client_id)
+
+        requests = await session.execute(update(RideDriversRequest).where(and_(RideDriversRequest.ride_id.in_([ride.id for ride in rides]), RideDriversRequest.status == 'requested')).values(status="rejected").returning(RideDriversRequest))
+        for request in requests.scalars().all():
+            await driver_tracker.set_status_by_driver(session, request.driver_profile_id, DriverStatus.ONLINE)
+
+        for ride in rides:
+            await in_app_notification_crud.create(session, InAppNotificationCreate(user_id=ride.client_id, type="ride_canceled", title="Поездка отменена", message="Поездка отменена из-за таймаута", data=ride.model_dump(mode='json'), dedup_key=f"{ride.id}_canceled"))
+        outbox.send_push(session, [ride.client_id for ride in rides], PushNotificationData(title='Поездка отменена', body='Поездка отменена из-за таймаута'))
 
 ride_crud = RideCrud(Ride, RideSchema)
+deadline_scheduler.register(RIDE_TIMEOUT, ride_crud.cancel_timed_out_rides)
@@ -1,4 +1,3 @@
-import asyncio
 from app.crud.base import CrudBase
 from app.models import RideDriversRequest
 from app.schemas.ride_drivers_request import RideDriversRequestSchema, RideDriversRequestUpdate, RideDriversRequestCreate, RideDriversRequestSchemaDetailed
@@ -9,13 +8,14 @@ from .in_app_notification import in_app_notification_crud
 from .driver_profile import driver_profile_crud
 from .ride import ride_crud
 from .in_app_notification import in_app_notification_crud
-from .commission_payment import commission_payment_crud
 from .commission import commission_crud
 from .driver_tracker import driver_tracker, DriverStatus
 from app.services.websocket_manager import manager_driver_feed
 from app.schemas.in_app_notification import InAppNotificationCreate
-from app.services import fcm_service
+from app.services.outbox import outbox
 from app.services.driver_state_storage import driver_state_storage
+from app.services.deadline_scheduler import deadline_scheduler, COMMISSION_TIMEOUT
+from app.config import COMMISSION_PAY_SECONDS_LIMIT
 from app.schemas.push import PushNotificationData
 from app.schemas.ride import RideSchemaAcceptByDriver, RideSchema
 from app.schemas.driver_profile import DriverProfileSchema
@@ -61,6 +61,12 @@ class RideDriversRequestCrud(CrudBase[RideDriversRequest, RideDriversRequestSche
         ride_drivers_request = result.scalar_one_or_none()
         return self.schema.model_validate(ride_drivers_request) if ride_drivers_request else None
 
+    async def get_ride_ids_with_open_requests(self, session: AsyncSession, ride_ids: list[int]) -> set[int]:
+        if not ride_ids:
+            return set()
+        result = await session.execute(select(self.model.ride_id).where(and_(self.model.ride_id.in_(ride_ids), self.model.status == "requested")).distinct())
+        return set(result.scalars().all())
+
     async def create(self, session: AsyncSession, create_obj: RideDriversRequestCreate) -> RideDriversRequestSchema | None:
         existing_ride_drivers_requests = await self.get_requested_by_driver_profile_id(session, create_obj.driver_profile_id)
         if existing_ride_drivers_requests and len(existing_ride_drivers_requests) > 0:
@@ -89,10 +95,9 @@ class RideDriversRequestCrud(CrudBase[RideDriversRequest, RideDriversRequestSche
         
         result_validated = self.schema.model_validate(result)
         await driver_tracker.set_status_by_driver(session, result.driver_profile_id, DriverStatus.WAITING_RIDE)
-        await session.commit()
-
         await in_app_notification_crud.create(session, InAppNotificationCreate(user_id=ride.client_id, type="ride_offer", title="Новый отклик", message="На поездку откликнулся ещё один водитель", data={"offer_id": result.id, "ride_id": result.ride_id, "driver_profile_id": result.driver_profile_id}, dedup_key=str(result.id)))
-        await fcm_service.send_to_user(session, ride.client_id, PushNotificationData(title="Новый отклик", body="На поездку откликнулся ещё один водитель"))
+        outbox.send_push(session, [ride.client_id], PushNotificationData(title="Новый отклик", body="На поездку откликнулся ещё один водитель"))
+        await session.commit()
         return result_validated
 
     async def update(self, session: AsyncSession, id: int, update_obj: RideDriversRequestUpdate) -> RideDriversRequestSchema | None:
@@ -124,7 +129,7 @@ class RideDriversRequestCrud(CrudBase[RideDriversRequest, RideDriversRequestSche
             await driver_tracker.set_status_by_driver(session, request.driver_profile_id, DriverStatus.ONLINE)
             state = driver_state_storage.get_driver(request.driver_profile_id)
             if state:
-                await manager_driver_feed.send_personal_message(state.user_id, {"type": "ride_offer_rejected", "message": "Отклик на поездку отклонен", "data": self.schema.model_validate(request).model_dump(mode='json')})
+                outbox.send_ws(session, manager_driver_feed, state.user_id, {"type": "ride_offer_rejected", "message": "Отклик на поездку отклонен", "data": self.schema.model_validate(request).model_dump(mode='json')})
 
     async def cancel_by_driver_profile_id(self, session: AsyncSession, driver_profile_id: int):
         requests = await self.get_requested_by_driver_profile_id(session, driver_profile_id)
@@ -140,18 +145,18 @@ class RideDriversRequestCrud(CrudBase[RideDriversRequest, RideDriversRequestSche
             raise HTTPException(status_code=400, detail="Ride request is not accepted. Perhaps, ride is already accepted")
         await driver_tracker.assign_ride(session, driver_profile.id, accepted.id)
 
-        await manager_driver_feed.send_personal_message(driver_profile.user_id, {"type": "ride_offer_accepted", "message": "Ваш отклик принят, ждите, пока клиент оплатит комиссию за поездку", "data": accepted.model_dump(mode='json')})
+        outbox.send_ws(session, manager_driver_feed, driver_profile.user_id, {"type": "ride_offer_accepted", "message": "Ваш отклик принят, ждите, пока клиент оплатит комиссию за поездку", "data": accepted.model_dump(mode='json')})
 
         other_requests = await self.get_by_ride_id(session, result.ride_id)
         for request in other_requests:
             if request.id != id and request.status == 'requested':
                 await self.update(session, request.id, RideDriversRequestUpdate(status='rejected'))
         
-        asyncio.create_task(commission_payment_crud.cancel_commission_payment_if_timeout(result.ride_id, ride.client_id))
+        await deadline_scheduler.schedule(session, COMMISSION_TIMEOUT, result.ride_id, ride.client_id, COMMISSION_PAY_SECONDS_LIMIT)
 
     async def _dispatch_rejected(self, session: AsyncSession, result: RideDriversRequestSchema, driver_profile: DriverProfileSchema, **kwargs):
             await driver_tracker.set_status_by_driver(session, result.driver_profile_id, DriverStatus.ONLINE)
-            await manager_driver_feed.send_personal_message(driver_profile.user_id, {"type": "ride_offer_rejected", "message": "Отклик на поездку отклонен", "data": result.model_dump(mode='json')})
+            outbox.send_ws(session, manager_driver_feed, driver_profile.user_id, {"type": "ride_offer_rejected", "message": "Отклик на поездку отклонен", "data": result.model_dump(mode='json')})
 
     async def _dispatch_canceled(self, session: AsyncSession, result: RideDriversRequestSchema, ride: RideSchema, **kwargs):
             await driver_tracker.set_status_by_driver(session, result.driver_profile_id, DriverStatus.ONLINE)
@@ -1,30 +1,83 @@
-from dataclasses import dataclass, field
-from typing import Optional, Set
-from app.enum import DriverStatus
+from typing import Iterable, Optional, Set
+from app.enum import CLASS_VALUE, DriverStatus
 from datetime import datetime, timezone
 
+CLASS_BITS = {ride_class: 1 << (value - 1) for ride_class, value in CLASS_VALUE.items()}
+STATUSES = tuple(DriverStatus)
+STATUS_CODE = {status: code for code, status in enumerate(STATUSES)}
+ONLINE = STATUS_CODE[DriverStatus.ONLINE]
+
+
+def class_mask(ride_classes: Iterable[str]) -> int:
+    mask = 0
+    for ride_class in ride_classes:
+        mask |= CLASS_BITS.get(ride_class) or CLASS_BITS.get(ride_class.lower(), 0)
+    return mask
+
 
-@dataclass
 class DriverState:
-    driver_profile_id: int
-    user_id: int
-    status: DriverStatus = DriverStatus.OFFLINE
-    latitude: Optional[float] = None
-    longitude: Optional[float] = None
-    classes_allowed: Set[str] = field(default_factory=set)
-    current_ride_id: Optional[int] = None
-    car_id: Optional[int] = None
-    updated_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    """In-memory driver state, one per registered driver.
+
+    Kept compact because matching scans it in its innermost loop: slots instead of a __dict__, ride classes as a
+    CLASS_BITS mask and the status as an index into STATUSES. `status` and `classes_allowed` still read and write
+    DriverStatus values and class names."""
+
+    __slots__ = ("driver_profile_id", "user_id", "latitude", "longitude", "class_mask", "status_code", "current_ride_id", "car_id", "updated_at")
+
+    def __init__(
+        self,
+        driver_profile_id: int,
+        user_id: int,
+        status: DriverStatus = DriverStatus.OFFLINE,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+        classes_allowed: Iterable[str] = (),
+        current_ride_id: Optional[int] = None,
+        car_id: Optional[int] = None,
+        updated_at: Optional[datetime] = None,
+    ):
+        self.driver_profile_id = driver_profile_id
+        self.user_id = user_id
+        self.status = status
+        self.latitude = latitude
+        self.longitude = longitude
+        self.classes_allowed = classes_allowed
+        self.current_ride_id = current_ride_id
+        self.car_id = car_id
+        self.updated_at = updated_at or datetime.now(timezone.utc)
+
+    @property
+    def status(self) -> DriverStatus:
+        return STATUSES[self.status_code]
+
+    @status.setter
+    def status(self, status: DriverStatus) -> None:
+        self.status_code = STATUS_CODE[DriverStatus(status)]
+
+    @property
+    def classes_allowed(self) -> Set[str]:
+        return {ride_class for ride_class, bit in CLASS_BITS.items() if self.class_mask & bit}
+
+    @classes_allowed.setter
+    def classes_allowed(self, classes_allowed: Iterable[str]) -> None:
+        self.class_mask = class_mask(classes_allowed or ())
+
+    def __repr__(self) -> str:
+        return (
+            f"DriverState(driver_profile_id={self.driver_profile_id}, user_id={self.user_id}, status={self.status.value}, "
+            f"latitude={self.latitude}, longitude={self.longitude}, classes_allowed={sorted(self.classes_allowed)}, "
+            f"current_ride_id={self.current_ride_id}, car_id={self.car_id}, updated_at={self.updated_at})"
+        )
 
     def is_available(self) -> bool:
         return (
-            self.status == DriverStatus.ONLINE
+            self.status_code == ONLINE
             and self.current_ride_id is None
             and self.latitude is not None
         )
 
-    def has_permit(self, ride_class: str, ride_type: str) -> bool:
-        if ride_type == "with_car":
-            return ride_class.lower() in {c.lower() for c in self.classes_allowed} and self.car_id is not None
+    def permits(self, ride_mask: int, needs_car: bool) -> bool:
+        return bool(self.class_mask & ride_mask) and (not needs_car or self.car_id is not None)
 
-        return ride_class.lower() in {c.lower() for c in self.classes_allowed}
\ No newline at end of file
+    def has_permit(self, ride_class: str, ride_type: str) -> bool:
+        return self.permits(class_mask((ride_class,)), ride_type == "with_car")
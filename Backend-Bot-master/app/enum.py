@@ -35,6 +35,13 @@ class RideClass:
     VIP = "vip"
     ELITE = "elite"
 
+CLASS_VALUE = {
+    RideClass.LIGHT: 1,
+    RideClass.PRO: 2,
+    RideClass.VIP: 3,
+    RideClass.ELITE: 4
+}
+
 class DriverDocumentType(Enum):
     PASSPORT_FRONT = "PASSPORT_FRONT"
     PASSPORT_REGISTRATION = "PASSPORT_REGISTRATION"
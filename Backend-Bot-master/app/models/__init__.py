@@ -11,7 +11,7 @@ from .driver_location import DriverLocation
 from .chat_message import ChatMessage
 from .driver_rating import DriverRating
 from .refresh_token import RefreshToken
-from .in_app_notification import InAppNotification
+from .in_app_notification import InAppNotification, InAppNotificationCounter
 from .device_token import DeviceToken
 from .commission_payment import CommissionPayment
 from .ride_drivers_request import RideDriversRequest
@@ -20,3 +20,6 @@ from .car_photo import CarPhoto
 from .driver_moderation_info import DriverModerationInfo
 from .driver_profile_moderation import DriverProfileModeration
 from .support import SupportConversation, SupportMessage
+from .deadline import Deadline
+from .ride_trace import RideTrace
+from .outbox import OutboxMessage
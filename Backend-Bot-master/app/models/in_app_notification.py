@@ -1,4 +1,4 @@
-from sqlalchemy import BigInteger, Integer, String, TIMESTAMP, func, ForeignKey
+from sqlalchemy import BigInteger, Index, Integer, String, TIMESTAMP, func, ForeignKey, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db import Base
@@ -6,6 +6,11 @@ from app.db import Base
 
 class InAppNotification(Base):
     __tablename__ = 'in_app_notifications'
+    __table_args__ = (
+        Index('uq_in_app_notifications_user_type_dedup', 'user_id', 'type', 'dedup_key', unique=True),
+        Index('ix_in_app_notifications_user_created', 'user_id', 'created_at', 'id'),
+        Index('ix_in_app_notifications_user_unread', 'user_id', 'created_at', 'id', postgresql_where=text('read_at IS NULL')),
+    )
 
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey('users.id'), nullable=False)
@@ -15,6 +20,13 @@ class InAppNotification(Base):
     data = mapped_column(JSONB, nullable=True)
     read_at = mapped_column(TIMESTAMP(timezone=True), nullable=True)
     dedup_key = mapped_column(String, nullable=True)
-    created_at = mapped_column(TIMESTAMP(timezone=True), nullable=True, default=func.now())
+    created_at = mapped_column(TIMESTAMP(timezone=True), nullable=False, default=func.now(), server_default=func.now())
 
     user = relationship('User')
+
+
+class InAppNotificationCounter(Base):
+    __tablename__ = 'in_app_notification_counters'
+
+    user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    unread: Mapped[int] = mapped_column(Integer, nullable=False, server_default='0')
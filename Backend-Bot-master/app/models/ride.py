@@ -1,4 +1,4 @@
-from sqlalchemy import BigInteger, Integer, String, TIMESTAMP, func, DECIMAL, Boolean, ForeignKey, Text
+from sqlalchemy import BigInteger, Integer, String, TIMESTAMP, func, DECIMAL, Boolean, ForeignKey, Index, Text, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db import Base, metadata
@@ -6,6 +6,9 @@ from app.db import Base, metadata
 
 class Ride(Base):
     __tablename__ = 'rides'
+    __table_args__ = (
+        Index('ix_rides_open_pickup', 'pickup_lat', 'pickup_lng', postgresql_where=text("status = 'requested' AND driver_profile_id IS NULL")),
+    )
 
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
     client_id: Mapped[int | None] = mapped_column(BigInteger, ForeignKey('users.id'), nullable=True)
@@ -0,0 +1,15 @@
+from sqlalchemy import BigInteger, ForeignKey, Integer, LargeBinary, TIMESTAMP, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db import Base
+
+
+class RideTrace(Base):
+    __tablename__ = "ride_traces"
+
+    ride_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("rides.id", ondelete="CASCADE"), primary_key=True)
+    driver_profile_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    points: Mapped[bytes] = mapped_column(LargeBinary, nullable=False, default=b"")
+    fix_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[object] = mapped_column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+    updated_at: Mapped[object] = mapped_column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
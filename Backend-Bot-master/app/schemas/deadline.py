@@ -0,0 +1,11 @@
+from datetime import datetime
+from .base import BaseSchema
+
+
+class DeadlineSchema(BaseSchema):
+    id: int
+    kind: str
+    ride_id: int
+    user_id: int | None = None
+    due_at: datetime
+    attempts: int = 0
@@ -24,3 +24,7 @@ class InAppNotificationUpdate(BaseSchema):
 class InAppNotificationSchema(InAppNotificationCreate):
     id: int = Field(..., gt=0)
     read_at: Optional[datetime] = Field(None)
+
+
+class InAppNotificationUnreadCount(BaseSchema):
+    unread: int = Field(..., ge=0)
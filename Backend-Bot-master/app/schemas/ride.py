@@ -148,6 +148,8 @@ class RideSchemaFinishByDriver(BaseSchema):
 class RideSchemaFinishWithAnomaly(RideSchemaFinishByDriver):
     is_anomaly: bool | None = Field(False)
     anomaly_reason: str | None = Field(None, max_length=255)
+    distance_meters: int | None = Field(None, ge=0)
+    duration_seconds: int | None = Field(None, ge=0)
 
 
 class RideSchemaHistory(BaseSchema):
@@ -0,0 +1,72 @@
+import logging
+import numpy as np
+from typing import Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_ROUNDS = 10_000
+
+
+def solve_assignment(candidates: np.ndarray, costs: np.ndarray, unmatched_cost: float, epsilon: float = 0.01) -> Tuple[np.ndarray, np.ndarray]:
+    """Min-cost driver -> ride assignment on a sparse candidate list.
+
+    candidates[i] holds up to K ride indices for driver i (-1 pads), costs[i] the matching costs (inf pads). A driver
+    may stay unassigned at unmatched_cost. Returns (driver_indices, ride_indices) of the chosen pairs; every ride is
+    used at most once."""
+    if candidates.size == 0 or candidates.max() < 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return _solve_auction(candidates, costs, unmatched_cost, epsilon)
+
+
+def _solve_auction(candidates: np.ndarray, costs: np.ndarray, unmatched_cost: float, epsilon: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Forward Jacobi auction: every unassigned driver bids at once on its best ride, the highest bid per ride wins.
+
+    Prices start at zero and a ride that received a bid stays assigned, so rides left over keep price zero and the
+    result is within drivers * epsilon of the optimum even with more rides than drivers. No epsilon scaling: carried
+    prices would break that property for rectangular problems."""
+    drivers, k = candidates.shape
+    ride_count = int(candidates.max()) + 1
+    prices = np.zeros(ride_count + 1)
+    padded = np.where(candidates >= 0, candidates, ride_count)
+    values_base = np.hstack([-costs, np.full((drivers, 1), -unmatched_cost)])
+    owner = np.full(ride_count, -1, dtype=np.int64)
+    assigned = np.full(drivers, -1, dtype=np.int64)
+    rounds = 0
+
+    while rounds < MAX_ROUNDS:
+        bidders = np.flatnonzero(assigned == -1)
+        if not len(bidders):
+            break
+        rounds += 1
+
+        values = values_base[bidders].copy()
+        values[:, :k] -= prices[padded[bidders]]
+        best = np.argmax(values, axis=1)
+        rows = np.arange(len(bidders))
+        best_values = values[rows, best]
+        values[rows, best] = -np.inf
+        second_values = values.max(axis=1)
+
+        unmatched = best == k
+        assigned[bidders[unmatched]] = -2
+        bidders, best, best_values, second_values = bidders[~unmatched], best[~unmatched], best_values[~unmatched], second_values[~unmatched]
+        if not len(bidders):
+            continue
+
+        rides = candidates[bidders, best]
+        bids = prices[rides] + best_values - second_values + epsilon
+        order = np.lexsort((-bids, rides))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = rides[order][1:] != rides[order][:-1]
+        winners, won_rides, won_bids = bidders[order][first], rides[order][first], bids[order][first]
+
+        outbid = owner[won_rides]
+        assigned[outbid[outbid >= 0]] = -1
+        owner[won_rides] = winners
+        assigned[winners] = won_rides
+        prices[won_rides] = won_bids
+
+    if rounds >= MAX_ROUNDS:
+        logger.warning(f"Auction stopped after {rounds} rounds; returning the current partial assignment")
+    matched = np.flatnonzero(assigned >= 0)
+    return matched, assigned[matched]
@@ -9,13 +9,15 @@ from app.models.chat_message import ChatMessage
 from app.schemas.chat_message import ChatMessageSchema, ChatMessageHistory
 from app.logger import logger
 from .websocket_manager import manager
+from .pubsub import PubSub, pubsub
 from app.crud.ride import ride_crud
 from app.crud.user import user_crud
 from app.enum import MessageType, RoleCode
 
 
 class ChatService:
-    def __init__(self):
+    def __init__(self, bus: Optional[PubSub] = None):
+        self._pubsub = bus or pubsub
         self._message_timestamps: Dict[int, List[datetime]] = defaultdict(list)
         self.rate_limit_messages = 60
         self.rate_limit_period = 60
@@ -23,22 +25,33 @@ class ChatService:
         self.min_message_length = 1
 
         profanity.load_censor_words()
+        self._pubsub.subscribe("chat_rate_limit", self.on_remote_message_sent)
 
     def check_rate_limit(self, user_id: int) -> tuple[bool, Optional[str]]:
+        """Sliding-window limit; accepted messages are replayed to the other workers so they all count the same window."""
         now = datetime.now(timezone.utc)
-        cutoff = now - timedelta(seconds=self.rate_limit_period)
-
-        self._message_timestamps[user_id] = [
-            ts for ts in self._message_timestamps[user_id]
-            if ts > cutoff
-        ]
+        self._prune(user_id, now)
 
         if len(self._message_timestamps[user_id]) >= self.rate_limit_messages:
             return False, f"Rate limit exceeded. Max {self.rate_limit_messages} messages per {self.rate_limit_period}s"
 
         self._message_timestamps[user_id].append(now)
+        if self._pubsub.distributed:
+            self._pubsub.publish_nowait("chat_rate_limit", {"user_id": user_id, "sent_at": now.isoformat()})
         return True, None
 
+    def _prune(self, user_id: int, now: datetime) -> None:
+        cutoff = now - timedelta(seconds=self.rate_limit_period)
+        self._message_timestamps[user_id] = [
+            ts for ts in self._message_timestamps[user_id]
+            if ts > cutoff
+        ]
+
+    async def on_remote_message_sent(self, payload: dict) -> None:
+        user_id = int(payload["user_id"])
+        self._prune(user_id, datetime.now(timezone.utc))
+        self._message_timestamps[user_id].append(datetime.fromisoformat(payload["sent_at"]))
+
     async def verify_ride_user(self, session: AsyncSession, ride_id: int, user_id: int) -> bool:
         ride = await ride_crud.get_by_id_with_driver_profile(session, ride_id)
 
@@ -0,0 +1,175 @@
+import asyncio, heapq, logging, app.config
+from asyncio import Task
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import and_, delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import async_session_maker
+from app.models.deadline import Deadline
+from app.schemas.deadline import DeadlineSchema
+
+logger = logging.getLogger(__name__)
+
+RIDE_TIMEOUT = "ride_timeout"
+COMMISSION_TIMEOUT = "commission_timeout"
+
+DeadlineHandler = Callable[[AsyncSession, List[DeadlineSchema]], Awaitable[None]]
+DeadlineKey = Tuple[str, int]
+
+
+class DeadlineScheduler:
+    """Durable ride timeouts: rows in `deadlines` are the source of truth, an in-memory heap only decides when to wake up.
+
+    Expired rows are claimed with DELETE ... RETURNING, so each deadline fires once even with several workers."""
+
+    def __init__(self):
+        self._handlers: Dict[str, DeadlineHandler] = {}
+        self._heap: List[Tuple[float, str, int]] = []
+        self._due: Dict[DeadlineKey, float] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[Task[None]] = None
+
+    def register(self, kind: str, handler: DeadlineHandler) -> None:
+        self._handlers[kind] = handler
+
+    async def start(self) -> None:
+        async with async_session_maker() as session:
+            result = await session.execute(select(Deadline.kind, Deadline.ride_id, Deadline.due_at))
+            rows = result.all()
+
+        for kind, ride_id, due_at in rows:
+            self._push(kind, ride_id, due_at.timestamp())
+        logger.info(f"Deadline scheduler rehydrated {len(rows)} deadlines")
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def schedule(self, session: AsyncSession, kind: str, ride_id: int, user_id: Optional[int], delay_seconds: float) -> None:
+        due_at = datetime.now(timezone.utc) + timedelta(seconds=delay_seconds)
+        stmt = insert(Deadline).values(kind=kind, ride_id=ride_id, user_id=user_id, due_at=due_at)
+        await session.execute(stmt.on_conflict_do_update(constraint="uq_deadlines_kind_ride", set_={"user_id": user_id, "due_at": due_at, "attempts": 0}))
+        self._push(kind, ride_id, due_at.timestamp())
+
+    async def cancel(self, session: AsyncSession, ride_ids: List[int], kind: Optional[str] = None) -> None:
+        if not ride_ids:
+            return
+
+        conditions = [Deadline.ride_id.in_(ride_ids)]
+        if kind is not None:
+            conditions.append(Deadline.kind == kind)
+        await session.execute(delete(Deadline).where(and_(*conditions)))
+        for key in [key for key in self._due if key[1] in ride_ids and (kind is None or key[0] == kind)]:
+            del self._due[key]
+
+    def _push(self, kind: str, ride_id: int, due: float) -> None:
+        self._due[(kind, ride_id)] = due
+        heapq.heappush(self._heap, (due, kind, ride_id))
+        if self._heap[0][0] == due:
+            self._wakeup.set()
+
+    def _next_delay(self) -> float:
+        while self._heap:
+            due, kind, ride_id = self._heap[0]
+            if self._due.get((kind, ride_id)) == due:
+                return max(0.0, min(due - datetime.now(timezone.utc).timestamp(), app.config.DEADLINE_POLL_SECONDS))
+            heapq.heappop(self._heap)
+        return app.config.DEADLINE_POLL_SECONDS
+
+    async def _loop(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._next_delay())
+                continue
+            except asyncio.TimeoutError:
+                pass
+
+            try:
+                await self.fire_due()
+            except Exception as exc:
+                logger.error(f"Deadline scheduler error: {exc}")
+
+    async def fire_due(self) -> int:
+        """Claim every expired deadline in one statement and hand them to their handlers in batches per kind."""
+        now = datetime.now(timezone.utc)
+        while self._heap and self._heap[0][0] <= now.timestamp():
+            due, kind, ride_id = heapq.heappop(self._heap)
+            if self._due.get((kind, ride_id)) == due:
+                del self._due[(kind, ride_id)]
+
+        async with async_session_maker() as session:
+            result = await session.execute(delete(Deadline).where(Deadline.due_at <= func.now()).returning(Deadline))
+            deadlines = [DeadlineSchema.model_validate(row) for row in result.scalars().all()]
+            by_kind: Dict[str, List[DeadlineSchema]] = {}
+            for deadline in deadlines:
+                by_kind.setdefault(deadline.kind, []).append(deadline)
+
+            failed: List[DeadlineSchema] = []
+            for kind, batch in by_kind.items():
+                handler = self._handlers.get(kind)
+                if handler is None:
+                    logger.warning(f"No handler for {len(batch)} expired deadlines of kind {kind}")
+                    continue
+                failed.extend(await self._run(session, handler, batch))
+            await self._retry_later(session, failed)
+            await session.commit()
+
+        if deadlines:
+            logger.info(f"Fired {len(deadlines)} deadlines ({len(failed)} failed)")
+        return len(deadlines)
+
+    async def _run(self, session: AsyncSession, handler: DeadlineHandler, batch: List[DeadlineSchema]) -> List[DeadlineSchema]:
+        """Run a kind's batch in a savepoint; if it fails, run its rows one by one so one bad row only fails itself.
+        Returns the rows that failed."""
+        if await self._run_savepoint(session, handler, batch):
+            return []
+        if len(batch) == 1:
+            return batch
+        return [deadline for deadline in batch if not await self._run_savepoint(session, handler, [deadline])]
+
+    @staticmethod
+    async def _run_savepoint(session: AsyncSession, handler: DeadlineHandler, batch: List[DeadlineSchema]) -> bool:
+        # events queued for after-commit (ride_events, outbox, ...) by a rolled back savepoint must not go out
+        info = session.sync_session.info
+        saved = {key: value.copy() if hasattr(value, "copy") else value for key, value in info.items()}
+        try:
+            async with session.begin_nested():
+                await handler(session, batch)
+            return True
+        except Exception as exc:
+            info.clear()
+            info.update(saved)
+            logger.error(f"Deadline handler {batch[0].kind} failed for rides {[deadline.ride_id for deadline in batch]}: {exc}")
+            return False
+
+    async def _retry_later(self, session: AsyncSession, failed: List[DeadlineSchema]) -> None:
+        """Put failed deadlines back with an exponential backoff, so a poison row neither blocks the others nor is
+        re-claimed on every poll; after DEADLINE_MAX_ATTEMPTS it is dropped."""
+        rows = []
+        now = datetime.now(timezone.utc)
+        for deadline in failed:
+            if deadline.attempts + 1 >= app.config.DEADLINE_MAX_ATTEMPTS:
+                logger.error(f"Deadline {deadline.kind} for ride {deadline.ride_id} dropped after {deadline.attempts + 1} attempts")
+                continue
+            due_at = now + timedelta(seconds=app.config.DEADLINE_RETRY_SECONDS * 2 ** deadline.attempts)
+            rows.append({"kind": deadline.kind, "ride_id": deadline.ride_id, "user_id": deadline.user_id, "due_at": due_at, "attempts": deadline.attempts + 1})
+
+        if not rows:
+            return
+        # a deadline scheduled again in the meantime wins over the retry
+        await session.execute(insert(Deadline).values(rows).on_conflict_do_nothing(constraint="uq_deadlines_kind_ride"))
+        for row in rows:
+            self._push(row["kind"], row["ride_id"], row["due_at"].timestamp())
+
+    def get_stats(self) -> dict:
+        return {"scheduled": len(self._due), "heap_size": len(self._heap)}
+
+
+deadline_scheduler = DeadlineScheduler()
@@ -0,0 +1,143 @@
+from asyncio import Task
+from typing import Optional
+import asyncio, logging, time, app.config
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.dataclass import DriverState
+from app.db import async_session_maker
+from app.schemas.ride import RideSchema
+from app.schemas.ride_drivers_request import RideDriversRequestCreate
+from app.services.assignment import solve_assignment
+from app.services.driver_state_storage import driver_state_storage
+from app.services.ride_book import ride_book
+from app.services.outbox import outbox
+from app.services.websocket_manager import manager_driver_feed
+from app.crud.ride_drivers_request import ride_drivers_request_crud
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_LOCK_KEY = 7_301_017
+
+
+class Dispatcher:
+    """Optional push matching on top of the pull feed (DISPATCH_ENABLED).
+
+    Every DISPATCH_INTERVAL_SECONDS the available drivers are matched against the open rides without a pending offer:
+    each driver gets its DISPATCH_CANDIDATES nearest permitted rides within MAX_DISTANCE_KM, the min-distance
+    assignment over those pairs is solved, and an offer is created for every chosen pair as if the driver had made it.
+    Only one worker dispatches at a time (transaction-level advisory lock)."""
+
+    def __init__(self):
+        self._task: Optional[Task[None]] = None
+        self.ticks = 0
+        self.offers_created = 0
+        self.offers_failed = 0
+        self.last_tick_ms = 0.0
+        self.last_solve_ms = 0.0
+        self.last_pairs = 0
+        self.last_avg_pickup_km: Optional[float] = None
+
+    def start(self) -> None:
+        if not app.config.DISPATCH_ENABLED:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(app.config.DISPATCH_INTERVAL_SECONDS)
+            try:
+                await self.tick()
+            except Exception as exc:
+                logger.error(f"Dispatch tick error: {exc}")
+
+    async def tick(self) -> int:
+        if not ride_book.loaded:
+            return 0
+
+        started = time.perf_counter()
+        async with async_session_maker() as lock_session:
+            locked = await lock_session.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": DISPATCH_LOCK_KEY})
+            if not locked.scalar():
+                return 0
+
+            drivers = await driver_state_storage.filter_approved(lock_session, driver_state_storage.get_available_drivers())
+            rides, candidates, distances = ride_book.get_candidates(drivers, app.config.MAX_DISTANCE_KM, app.config.DISPATCH_CANDIDATES)
+            offered = await ride_drivers_request_crud.get_ride_ids_with_open_requests(lock_session, [ride.id for ride in rides])
+            if offered:
+                taken = np.isin(candidates, [index for index, ride in enumerate(rides) if ride.id in offered])
+                candidates[taken] = -1
+                distances[taken] = np.inf
+
+            solve_started = time.perf_counter()
+            driver_indices, ride_indices = solve_assignment(candidates, distances, unmatched_cost=2 * app.config.MAX_DISTANCE_KM)
+            self.last_solve_ms = (time.perf_counter() - solve_started) * 1000
+
+            created = 0
+            pickup_km = []
+            async with async_session_maker() as session:
+                for driver_index, ride_index in zip(driver_indices.tolist(), ride_indices.tolist()):
+                    distance = float(distances[driver_index][candidates[driver_index] == ride_index][0])
+                    if await self._offer(session, drivers[driver_index], rides[ride_index], distance):
+                        created += 1
+                        pickup_km.append(distance)
+
+        self.ticks += 1
+        self.offers_created += created
+        self.offers_failed += len(driver_indices) - created
+        self.last_pairs = len(driver_indices)
+        self.last_avg_pickup_km = round(sum(pickup_km) / len(pickup_km), 3) if pickup_km else None
+        self.last_tick_ms = (time.perf_counter() - started) * 1000
+        if len(driver_indices):
+            logger.info(f"Dispatch: {created}/{len(driver_indices)} offers for {len(drivers)} drivers x {len(rides)} rides in {self.last_tick_ms:.1f}ms (solve {self.last_solve_ms:.1f}ms)")
+        return created
+
+    async def _offer(self, session: AsyncSession, driver: DriverState, ride: RideSchema, distance_km: float) -> bool:
+        create_obj = RideDriversRequestCreate(
+            ride_id=ride.id,
+            driver_profile_id=driver.driver_profile_id,
+            car_id=driver.car_id if ride.ride_type == "with_car" else None,
+            offer_fare=ride.expected_fare,
+            eta={"distance_km": round(distance_km, 3), "source": "dispatch"},
+        )
+        try:
+            offer = await ride_drivers_request_crud.create(session, create_obj)
+        except HTTPException as exc:
+            await session.rollback()
+            logger.info(f"Dispatch offer ride={ride.id} driver={driver.driver_profile_id} skipped: {exc.detail}")
+            return False
+        except Exception as exc:
+            await session.rollback()
+            logger.error(f"Dispatch offer ride={ride.id} driver={driver.driver_profile_id} failed: {exc}")
+            return False
+
+        if offer is None:
+            return False
+        outbox.send_ws(session, manager_driver_feed, driver.user_id, {"type": "waiting_ride", "data": offer.model_dump(mode="json")})
+        await session.commit()
+        return True
+
+    def get_stats(self) -> dict:
+        return {
+            "enabled": app.config.DISPATCH_ENABLED,
+            "ticks": self.ticks,
+            "offers_created": self.offers_created,
+            "offers_failed": self.offers_failed,
+            "last_pairs": self.last_pairs,
+            "last_avg_pickup_km": self.last_avg_pickup_km,
+            "last_tick_ms": round(self.last_tick_ms, 2),
+            "last_solve_ms": round(self.last_solve_ms, 2),
+        }
+
+
+dispatcher = Dispatcher()
@@ -0,0 +1,98 @@
+import asyncio, logging, app.config
+from asyncio import Task
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+from sqlalchemy import BigInteger, DECIMAL, TIMESTAMP, column, update, values
+from app.db import async_session_maker
+from app.models.driver_location import DriverLocation
+
+logger = logging.getLogger(__name__)
+
+Fix = Tuple[float, float, datetime]
+
+FLUSH_CHUNK_ROWS = 1000
+
+
+class DriverLocationBuffer:
+    """Write-behind buffer for GPS fixes: keeps the last fix per driver and flushes them to driver_locations in batches."""
+
+    def __init__(self):
+        self._pending: Dict[int, Fix] = {}
+        self._flusher: Optional[Task[None]] = None
+        self._lock = asyncio.Lock()
+        self.fixes_received = 0
+        self.rows_flushed = 0
+        self.flushes = 0
+
+    def record(self, driver_profile_id: int, latitude: float, longitude: float) -> None:
+        self._pending[driver_profile_id] = (latitude, longitude, datetime.now(timezone.utc))
+        self.fixes_received += 1
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._loop())
+
+    def get_pending(self, driver_profile_id: int) -> Optional[Fix]:
+        return self._pending.get(driver_profile_id)
+
+    async def _loop(self) -> None:
+        while self._pending:
+            await asyncio.sleep(app.config.DRIVER_LOCATION_FLUSH_INTERVAL_SECONDS)
+            try:
+                await self.flush()
+            except Exception as exc:
+                logger.error(f"Driver location flush error: {exc}")
+
+    async def flush(self) -> int:
+        async with self._lock:
+            if not self._pending:
+                return 0
+
+            batch, self._pending = self._pending, {}
+            try:
+                async with async_session_maker() as session:
+                    items = list(batch.items())
+                    for start in range(0, len(items), FLUSH_CHUNK_ROWS):
+                        await session.execute(self._update_stmt(items[start:start + FLUSH_CHUNK_ROWS]))
+                    await session.commit()
+            except BaseException:
+                for driver_profile_id, fix in batch.items():
+                    self._pending.setdefault(driver_profile_id, fix)
+                raise
+
+            self.rows_flushed += len(batch)
+            self.flushes += 1
+            return len(batch)
+
+    @staticmethod
+    def _update_stmt(items):
+        fixes = values(
+            column("driver_profile_id", BigInteger),
+            column("latitude", DECIMAL(12, 8)),
+            column("longitude", DECIMAL(12, 8)),
+            column("last_seen_at", TIMESTAMP(timezone=True)),
+            name="fixes",
+        ).data([(driver_profile_id, latitude, longitude, seen_at) for driver_profile_id, (latitude, longitude, seen_at) in items])
+        return (
+            update(DriverLocation)
+            .where(DriverLocation.driver_profile_id == fixes.c.driver_profile_id)
+            .values(latitude=fixes.c.latitude, longitude=fixes.c.longitude, last_seen_at=fixes.c.last_seen_at)
+        )
+
+    async def close(self) -> None:
+        if self._flusher is not None and not self._flusher.done():
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+    def get_stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "fixes_received": self.fixes_received,
+            "rows_flushed": self.rows_flushed,
+            "flushes": self.flushes,
+        }
+
+
+driver_location_buffer = DriverLocationBuffer()
@@ -1,21 +1,50 @@
 from app.enum import DriverStatus
-from typing import Dict, Optional
-from app.dataclass import DriverState
-import logging
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+from app.dataclass import STATUSES, DriverState, class_mask
+from asyncio import Task
+from datetime import datetime, timezone
+import asyncio, logging, time, app.config
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import distinct_on
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import MATCHING_GRID_CELL_DEG
 from app.crud.driver_location import driver_location_crud
+from app.models import DriverLocation, DriverProfile
 from app.schemas.driver_location import DriverLocationUpdateMe
 from app.schemas.driver_profile import DriverProfileSchema
+from app.services.driver_location_buffer import driver_location_buffer
+from app.services.geo import GridIndex, within_radius
+from app.services.heatmap import heatmap
+from app.services.pubsub import PubSub, pubsub
 
 logger = logging.getLogger(__name__)
 
+DriverStateListener = Callable[[DriverState], Awaitable[None]]
+
+SYNC_CHUNK_DRIVERS = 25
+
 
 class DriverStateStorage:
-    def __init__(self):
+    def __init__(self, bus: Optional[PubSub] = None):
+        self._pubsub = bus or pubsub
         self._drivers: Dict[int, DriverState] = {}
         self._user_to_driver: Dict[int, int] = {}
+        self._available_index = GridIndex(MATCHING_GRID_CELL_DEG)
+        self._unsynced: Dict[int, DriverState] = {}
+        self._sync_task: Optional[Task[None]] = None
+        self._remote_listeners: List[DriverStateListener] = []
+        self._indexed_status: Dict[int, int] = {}
+        self._status_counts = [0] * len(STATUSES)
+        self.ready = False
+        self._pubsub.subscribe("driver_state", self.on_remote_states)
+
+    async def register_driver(self, session: AsyncSession, driver_profile: DriverProfileSchema) -> Optional[DriverState]:
+        if not driver_profile.approved:
+            self.evict(driver_profile.id)
+            logger.warning(f"Driver {driver_profile.id} is not approved, not registered")
+            return None
 
-    async def register_driver(self, session: AsyncSession, driver_profile: DriverProfileSchema) -> DriverState:
         classes_set = driver_profile.classes_allowed
         driver_profile_id = driver_profile.id
         car_id = driver_profile.current_car_id
@@ -23,6 +52,10 @@ class DriverStateStorage:
         if not driver_location:
             driver_location = DriverLocationUpdateMe(status=DriverStatus.OFFLINE)
 
+        pending_fix = driver_location_buffer.get_pending(driver_profile_id)
+        if pending_fix:
+            driver_location = driver_location.model_copy(update={"latitude": pending_fix[0], "longitude": pending_fix[1]})
+
         if driver_profile_id in self._drivers:
             state = self._drivers[driver_profile_id]
             state.classes_allowed = classes_set
@@ -30,6 +63,7 @@ class DriverStateStorage:
             state.latitude=driver_location.latitude
             state.longitude=driver_location.longitude
             state.car_id=car_id
+            state.updated_at = datetime.now(timezone.utc)
         else:
             state = DriverState(
                 driver_profile_id=driver_profile_id,
@@ -43,9 +77,69 @@ class DriverStateStorage:
             self._drivers[driver_profile_id] = state
             self._user_to_driver[driver_profile.user_id] = driver_profile_id
 
+        self.reindex(state)
         logger.info(f"Driver {driver_profile_id} registered with classes: {classes_set}")
         return state
 
+    async def hydrate(self, session: AsyncSession) -> int:
+        """Bulk-load approved drivers with their latest location in one query, so matching works before drivers reconnect."""
+        started = time.perf_counter()
+        stmt = (
+            select(
+                DriverProfile.id,
+                DriverProfile.user_id,
+                DriverProfile.classes_allowed,
+                DriverProfile.current_car_id,
+                DriverLocation.status,
+                DriverLocation.latitude,
+                DriverLocation.longitude,
+                DriverLocation.last_seen_at,
+            )
+            .outerjoin(DriverLocation, DriverLocation.driver_profile_id == DriverProfile.id)
+            .where(DriverProfile.approved.is_(True), DriverProfile.user_id.is_not(None))
+            .ext(distinct_on(DriverProfile.id))
+            .order_by(DriverProfile.id, DriverLocation.last_seen_at.desc().nulls_last(), DriverLocation.id.desc())
+        )
+        result = await session.execute(stmt)
+        count = self.hydrate_rows(result.all())
+        self.ready = True
+        logger.info(f"Driver state hydrated with {count} drivers in {time.perf_counter() - started:.3f}s")
+        return count
+
+    async def filter_approved(self, session: AsyncSession, drivers: List[DriverState]) -> List[DriverState]:
+        """Keep only drivers whose profile is still approved; approval can be revoked on any worker after registration."""
+        if not drivers:
+            return drivers
+
+        result = await session.execute(select(DriverProfile.id).where(DriverProfile.id.in_([driver.driver_profile_id for driver in drivers]), DriverProfile.approved.is_(True)))
+        approved = set(result.scalars().all())
+        return [driver for driver in drivers if driver.driver_profile_id in approved]
+
+    def hydrate_rows(self, rows) -> int:
+        count = 0
+        for driver_profile_id, user_id, classes_allowed, car_id, status, latitude, longitude, last_seen_at in rows:
+            if driver_profile_id in self._drivers:
+                continue
+
+            state = DriverState(
+                driver_profile_id=driver_profile_id,
+                user_id=user_id,
+                classes_allowed=set(classes_allowed or []),
+                status=DriverStatus(status) if status else DriverStatus.OFFLINE,
+                latitude=float(latitude) if latitude is not None else None,
+                longitude=float(longitude) if longitude is not None else None,
+                car_id=car_id,
+                updated_at=last_seen_at or datetime.fromtimestamp(0, timezone.utc),
+            )
+            self._drivers[driver_profile_id] = state
+            self._user_to_driver[user_id] = driver_profile_id
+            self._index(state)
+            count += 1
+        return count
+
+    def iter_drivers(self) -> Iterator[DriverState]:
+        return iter(self._drivers.values())
+
     def get_driver(self, driver_profile_id: int) -> Optional[DriverState]:
         return self._drivers.get(driver_profile_id)
 
@@ -53,12 +147,131 @@ class DriverStateStorage:
         driver_id = self._user_to_driver.get(user_id)
         return self._drivers.get(driver_id)
 
+    def touch(self, user_id: int) -> Optional[DriverState]:
+        """Record a heartbeat without a new position, so the stale sweeper keeps the driver online."""
+        state = self.get_driver_by_user(user_id)
+        if state is not None:
+            state.updated_at = datetime.now(timezone.utc)
+            self.reindex(state)
+        return state
+
+    def evict(self, driver_profile_id: int) -> Optional[DriverState]:
+        state = self._drivers.pop(driver_profile_id, None)
+        if state is None:
+            return None
+
+        if self._user_to_driver.get(state.user_id) == driver_profile_id:
+            del self._user_to_driver[state.user_id]
+        self._available_index.remove(driver_profile_id)
+        self._unsynced.pop(driver_profile_id, None)
+        status_code = self._indexed_status.pop(driver_profile_id, None)
+        if status_code is not None:
+            self._status_counts[status_code] -= 1
+        heatmap.remove_driver(driver_profile_id)
+        return state
+
+    def reindex(self, state: DriverState) -> None:
+        """Keep the spatial index in sync with the state and queue the state for the other workers."""
+        self._index(state)
+        if self._pubsub.distributed:
+            self._unsynced[state.driver_profile_id] = state
+            if self._sync_task is None or self._sync_task.done():
+                self._sync_task = asyncio.create_task(self._sync_loop())
+
+    def _index(self, state: DriverState) -> None:
+        """Every state transition passes through here, so the status counts and the heatmap are kept in step in O(1)."""
+        if state.is_available() and state.longitude is not None:
+            self._available_index.upsert(state.driver_profile_id, float(state.latitude), float(state.longitude))
+        else:
+            self._available_index.remove(state.driver_profile_id)
+
+        old_code = self._indexed_status.get(state.driver_profile_id)
+        if old_code != state.status_code:
+            if old_code is not None:
+                self._status_counts[old_code] -= 1
+            self._status_counts[state.status_code] += 1
+            self._indexed_status[state.driver_profile_id] = state.status_code
+        heatmap.update_driver(state)
+
+    def add_remote_listener(self, listener: DriverStateListener) -> None:
+        self._remote_listeners.append(listener)
+
+    async def _sync_loop(self) -> None:
+        while self._unsynced:
+            await asyncio.sleep(app.config.STATE_SYNC_INTERVAL_SECONDS)
+            states, self._unsynced = list(self._unsynced.values()), {}
+            for start in range(0, len(states), SYNC_CHUNK_DRIVERS):
+                try:
+                    await self._pubsub.publish("driver_state", {"drivers": [self._dump(state) for state in states[start:start + SYNC_CHUNK_DRIVERS]]})
+                except Exception as exc:
+                    logger.error(f"Driver state sync error: {exc}")
+
+    @staticmethod
+    def _dump(state: DriverState) -> dict:
+        return {
+            "driver_profile_id": state.driver_profile_id,
+            "user_id": state.user_id,
+            "status": state.status.value,
+            "latitude": float(state.latitude) if state.latitude is not None else None,
+            "longitude": float(state.longitude) if state.longitude is not None else None,
+            "classes_allowed": sorted(state.classes_allowed),
+            "current_ride_id": state.current_ride_id,
+            "car_id": state.car_id,
+            "updated_at": state.updated_at.isoformat(),
+        }
+
+    async def on_remote_states(self, payload: dict) -> None:
+        for data in payload["drivers"]:
+            updated_at = datetime.fromisoformat(data["updated_at"])
+            state = self._drivers.get(data["driver_profile_id"])
+            if state is not None and state.updated_at > updated_at:
+                continue
+
+            if state is None:
+                state = DriverState(driver_profile_id=data["driver_profile_id"], user_id=data["user_id"])
+                self._drivers[state.driver_profile_id] = state
+                self._user_to_driver[state.user_id] = state.driver_profile_id
+
+            state.status = DriverStatus(data["status"])
+            state.latitude = data["latitude"]
+            state.longitude = data["longitude"]
+            state.classes_allowed = set(data["classes_allowed"])
+            state.current_ride_id = data["current_ride_id"]
+            state.car_id = data["car_id"]
+            state.updated_at = updated_at
+            self._index(state)
+            for listener in self._remote_listeners:
+                await listener(state)
+
+    def get_available_drivers(self) -> List[DriverState]:
+        states = (self._drivers.get(driver_profile_id) for driver_profile_id in self._available_index.keys())
+        return [state for state in states if state is not None and state.is_available()]
+
+    def get_available_drivers_near(self, latitude: float, longitude: float, radius_km: float, ride_class: str, ride_type: str) -> List[Tuple[DriverState, float]]:
+        """Available drivers permitted for the ride class/type within radius_km, nearest first."""
+        ride_mask, needs_car = class_mask((ride_class,)), ride_type == "with_car"
+        states: List[DriverState] = []
+        for driver_profile_id in list(self._available_index.keys_within(latitude, longitude, radius_km)):
+            state = self._drivers.get(driver_profile_id)
+            if state is not None and state.is_available() and state.permits(ride_mask, needs_car):
+                states.append(state)
+
+        if not states:
+            return []
+
+        latitudes = np.fromiter((float(state.latitude) for state in states), dtype=float, count=len(states))
+        longitudes = np.fromiter((float(state.longitude) for state in states), dtype=float, count=len(states))
+        indices, distances = within_radius(latitude, longitude, latitudes, longitudes, radius_km)
+        order = np.argsort(distances, kind="stable")
+        return [(states[indices[i]], float(distances[i])) for i in order]
+
     def get_stats(self) -> dict:
+        statuses = dict(zip(STATUSES, self._status_counts))
         return {
             "total_registered": len(self._drivers),
-            "online": sum(1 for d in self._drivers.values() if d.status == DriverStatus.ONLINE),
-            "busy": sum(1 for d in self._drivers.values() if d.status == DriverStatus.BUSY),
-            "offline": sum(1 for d in self._drivers.values() if d.status == DriverStatus.OFFLINE),
+            "online": statuses[DriverStatus.ONLINE],
+            "busy": statuses[DriverStatus.BUSY],
+            "offline": statuses[DriverStatus.OFFLINE],
         }
 
-driver_state_storage = DriverStateStorage()
\ No newline at end of file
+driver_state_storage = DriverStateStorage()
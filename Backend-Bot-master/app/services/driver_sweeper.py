@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta, timezone
+from asyncio import Task
+from typing import List, Optional
+import asyncio, logging, time, app.config
+from sqlalchemy import text, update
+from app.db import async_session_maker
+from app.dataclass import DriverState
+from app.enum import DriverStatus
+from app.models.driver_location import DriverLocation
+from app.services.driver_state_storage import driver_state_storage
+from app.crud.driver_feed import driver_feed
+from app.crud.driver_tracker import driver_tracker
+
+logger = logging.getLogger(__name__)
+
+SWEEP_LOCK_KEY = 7_301_015
+
+
+class DriverSweeper:
+    """Takes drivers whose app went silent out of matching and drops long-idle drivers from memory.
+
+    A driver is stale after DRIVER_STALE_SECONDS without a fix or ping: it is marked offline in memory and, in one
+    UPDATE, in driver_locations. Offline drivers idle for DRIVER_EVICT_SECONDS are evicted; they are registered again
+    when they reconnect. Drivers on a ride or waiting for a passenger are left to the ride deadlines.
+
+    Every worker holds a replica of the driver state, so marking offline runs under an advisory lock: one worker per
+    sweep interval writes the change and replicates it. Eviction only frees local memory and runs everywhere."""
+
+    def __init__(self):
+        self._task: Optional[Task[None]] = None
+        self.sweeps = 0
+        self.marked_offline = 0
+        self.evicted = 0
+        self.last_sweep_ms = 0.0
+        self.last_sweep_at: Optional[datetime] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(app.config.DRIVER_SWEEP_INTERVAL_SECONDS)
+            try:
+                await self.sweep()
+            except Exception as exc:
+                logger.error(f"Driver sweep error: {exc}")
+
+    async def sweep(self) -> dict:
+        started = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        stale_before = now - timedelta(seconds=app.config.DRIVER_STALE_SECONDS)
+        evict_before = now - timedelta(seconds=app.config.DRIVER_EVICT_SECONDS)
+
+        stale: List[DriverState] = []
+        idle: List[DriverState] = []
+        for state in list(driver_state_storage.iter_drivers()):
+            if state.current_ride_id is not None:
+                continue
+            if state.status == DriverStatus.ONLINE and state.updated_at < stale_before:
+                stale.append(state)
+            elif state.status == DriverStatus.OFFLINE and state.updated_at < evict_before:
+                idle.append(state)
+
+        if stale:
+            stale = await self._mark_offline(stale, stale_before)
+        for state in idle:
+            driver_state_storage.evict(state.driver_profile_id)
+            driver_tracker.forget_fix(state.driver_profile_id)
+            await driver_feed.stop_feed(state.user_id)
+
+        self.sweeps += 1
+        self.marked_offline += len(stale)
+        self.evicted += len(idle)
+        self.last_sweep_ms = (time.perf_counter() - started) * 1000
+        self.last_sweep_at = now
+        if stale or idle:
+            logger.info(f"Driver sweep: {len(stale)} marked offline, {len(idle)} evicted in {self.last_sweep_ms:.1f}ms")
+        return {"marked_offline": len(stale), "evicted": len(idle)}
+
+    async def _mark_offline(self, states: List[DriverState], stale_before: datetime) -> List[DriverState]:
+        async with async_session_maker() as session:
+            locked = await session.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": SWEEP_LOCK_KEY})
+            if not locked.scalar():
+                return []
+
+            # a heartbeat replicated while waiting for the lock keeps the driver online
+            states = [state for state in states if state.status == DriverStatus.ONLINE and state.updated_at < stale_before]
+            if not states:
+                return []
+
+            await session.execute(
+                update(DriverLocation)
+                .where(
+                    DriverLocation.driver_profile_id.in_([state.driver_profile_id for state in states]),
+                    DriverLocation.status == DriverStatus.ONLINE.value,
+                )
+                .values(status=DriverStatus.OFFLINE.value)
+            )
+            await session.commit()
+
+        now = datetime.now(timezone.utc)
+        for state in states:
+            state.status = DriverStatus.OFFLINE
+            # a newer updated_at makes the replicas accept the change instead of keeping their online copy
+            state.updated_at = now
+            driver_state_storage.reindex(state)
+            await driver_feed.stop_feed(state.user_id)
+        return states
+
+    def get_stats(self) -> dict:
+        return {
+            "sweeps": self.sweeps,
+            "marked_offline": self.marked_offline,
+            "evicted": self.evicted,
+            "last_sweep_ms": round(self.last_sweep_ms, 2),
+            "last_sweep_at": self.last_sweep_at.isoformat() if self.last_sweep_at else None,
+        }
+
+
+driver_sweeper = DriverSweeper()
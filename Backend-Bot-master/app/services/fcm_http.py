@@ -0,0 +1,150 @@
+import asyncio, logging, time
+import httpx, jwt
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401 - httpx needs it for http2=True
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+    logger.warning("h2 not installed. FCM requests will use HTTP/1.1 connections.")
+
+FCM_SCOPE = "https://www.googleapis.com/auth/firebase.messaging"
+JWT_BEARER_GRANT = "urn:ietf:params:oauth:grant-type:jwt-bearer"
+TOKEN_LIFETIME_SECONDS = 3600
+TOKEN_REFRESH_MARGIN_SECONDS = 300
+STREAMS_PER_CONNECTION = 100
+
+
+class FCMError(Exception):
+    """A failed FCM v1 send; error_code is the FcmError code (UNREGISTERED, INVALID_ARGUMENT, ...) when FCM gave one."""
+
+    def __init__(self, status_code: int, status: Optional[str], message: str, error_code: Optional[str] = None):
+        super().__init__(f"{error_code or status or status_code}: {message}")
+        self.status_code = status_code
+        self.status = status
+        self.message = message
+        self.error_code = error_code
+
+    @property
+    def is_dead_token(self) -> bool:
+        """The target token will never work again: UNREGISTERED, or INVALID_ARGUMENT blamed on the token itself (a bad
+        payload also comes back as INVALID_ARGUMENT and must not cost the user their tokens)."""
+        if self.error_code == "UNREGISTERED":
+            return True
+        return (self.error_code or self.status) == "INVALID_ARGUMENT" and "registration token" in self.message.lower()
+
+    @classmethod
+    def from_response(cls, response: httpx.Response) -> "FCMError":
+        try:
+            error = response.json().get("error", {})
+        except ValueError:
+            return cls(response.status_code, None, response.text[:200])
+
+        error_code = next((detail.get("errorCode") for detail in error.get("details", []) if detail.get("errorCode")), None)
+        return cls(response.status_code, error.get("status"), error.get("message", ""), error_code)
+
+
+@dataclass
+class SendResult:
+    success: bool
+    message_id: Optional[str] = None
+    exception: Optional[Exception] = None
+
+
+@dataclass
+class BatchResult:
+    responses: List[SendResult] = field(default_factory=list)
+
+    @property
+    def success_count(self) -> int:
+        return sum(1 for response in self.responses if response.success)
+
+    @property
+    def failure_count(self) -> int:
+        return len(self.responses) - self.success_count
+
+
+class FCMHttpClient:
+    """Asyncio FCM HTTP v1 client: one pooled (HTTP/2 when h2 is installed) connection set for every send.
+
+    The OAuth access token is obtained with a JWT bearer grant signed by the service account key and cached until
+    TOKEN_REFRESH_MARGIN_SECONDS before it expires. base_url and token_url can point at a local stub; plain http:// (and
+    a custom transport) use HTTP/1.1 with one connection per concurrent request."""
+
+    def __init__(self, service_account: Dict[str, Any], base_url: str, token_url: Optional[str] = None, max_concurrency: int = 100, timeout: float = 10, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.project_id = service_account["project_id"]
+        self._service_account = service_account
+        self._token_url = token_url or service_account.get("token_uri") or "https://oauth2.googleapis.com/token"
+        self.http2 = HTTP2_AVAILABLE and transport is None and base_url.startswith("https://")
+        connections = max_concurrency if not self.http2 else -(-max_concurrency // STREAMS_PER_CONNECTION)
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            http2=self.http2,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=connections, max_keepalive_connections=connections),
+            transport=transport,
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._token_lock = asyncio.Lock()
+        self._access_token: Optional[str] = None
+        self._token_expires_at = 0.0
+        self.requests_sent = 0
+        self.token_refreshes = 0
+
+    async def _get_access_token(self) -> str:
+        if self._access_token and time.time() < self._token_expires_at:
+            return self._access_token
+
+        async with self._token_lock:
+            if self._access_token and time.time() < self._token_expires_at:
+                return self._access_token
+
+            now = int(time.time())
+            assertion = jwt.encode(
+                {"iss": self._service_account["client_email"], "scope": FCM_SCOPE, "aud": self._token_url, "iat": now, "exp": now + TOKEN_LIFETIME_SECONDS},
+                self._service_account["private_key"],
+                algorithm="RS256",
+                headers={"kid": self._service_account.get("private_key_id")},
+            )
+            response = await self._client.post(self._token_url, data={"grant_type": JWT_BEARER_GRANT, "assertion": assertion})
+            response.raise_for_status()
+            token = response.json()
+            self._access_token = token["access_token"]
+            self._token_expires_at = now + int(token.get("expires_in", TOKEN_LIFETIME_SECONDS)) - TOKEN_REFRESH_MARGIN_SECONDS
+            self.token_refreshes += 1
+            return self._access_token
+
+    async def send(self, message: Dict[str, Any], dry_run: bool = False) -> str:
+        """Send one v1 message dict and return its name; raises FCMError when FCM rejects it."""
+        body = {"message": message, "validate_only": dry_run}
+        async with self._semaphore:
+            for attempt in range(2):
+                token = await self._get_access_token()
+                response = await self._client.post(f"/v1/projects/{self.project_id}/messages:send", json=body, headers={"Authorization": f"Bearer {token}"})
+                self.requests_sent += 1
+                if response.status_code == 401 and attempt == 0:
+                    self._access_token = None
+                    continue
+                if response.status_code != 200:
+                    raise FCMError.from_response(response)
+                return response.json().get("name", "")
+
+    async def send_each(self, messages: List[Dict[str, Any]], dry_run: bool = False) -> BatchResult:
+        """Send every message concurrently (bounded by max_concurrency); results keep the order of messages."""
+        async def send_one(message: Dict[str, Any]) -> SendResult:
+            try:
+                return SendResult(True, message_id=await self.send(message, dry_run))
+            except Exception as exc:
+                return SendResult(False, exception=exc)
+
+        return BatchResult(list(await asyncio.gather(*(send_one(message) for message in messages))))
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+    def get_stats(self) -> dict:
+        return {"http2": self.http2, "requests_sent": self.requests_sent, "token_refreshes": self.token_refreshes}
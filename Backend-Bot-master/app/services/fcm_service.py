@@ -1,18 +1,32 @@
 import asyncio, json, firebase_admin
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, Iterable, Optional, Union
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple, Union
 from firebase_admin import credentials, messaging
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.config import FIREBASE_SERVICE_ACCOUNT_PATH, ROOT_DIR
+from app.config import FCM_API_BASE_URL, FCM_MAX_CONCURRENT_REQUESTS, FCM_REQUEST_TIMEOUT_SECONDS, FCM_TOKEN_URL, FIREBASE_SERVICE_ACCOUNT_PATH, ROOT_DIR
 from app.logger import logger
-from app.schemas.push import PushSendToTokenRequest, PushSendToTopicRequest, PushSendToUserRequest
+from app.schemas.push import PushNotificationData, PushSendToTokenRequest, PushSendToTopicRequest, PushSendToUserRequest
 from app.crud.device_token import device_token_crud
+from app.db import async_session_maker
+from app.services.fcm_http import BatchResult, FCMError, FCMHttpClient
+
+PushPayload = Union[PushNotificationData, PushSendToUserRequest, PushSendToTokenRequest, PushSendToTopicRequest]
+
+
+@dataclass
+class UserPushResult:
+    success_count: int = 0
+    failure_count: int = 0
+    errors: List[str] = field(default_factory=list)
 
 
 class FCMService:
     def __init__(self) -> None:
         self._initialized: bool = False
         self._init_lock = asyncio.Lock()
+        self._client: Optional[FCMHttpClient] = None
+        self.tokens_pruned = 0
 
     def _service_account_file(self) -> Path:
         p = Path(FIREBASE_SERVICE_ACCOUNT_PATH)
@@ -48,15 +62,17 @@ class FCMService:
             base["data"] = payload.data
         return self._normalize_data(base)
 
-    def _build_notification(self, payload: Union[PushSendToUserRequest, PushSendToTokenRequest, PushSendToTopicRequest]) -> messaging.Notification | None:
-        if payload.title is None and payload.body is None and payload.image is None:
-            return None
+    def _build_notification(self, payload: Union[PushSendToUserRequest, PushSendToTokenRequest, PushSendToTopicRequest]) -> Dict[str, str] | None:
+        notification = {key: value for key, value in (("title", payload.title), ("body", payload.body), ("image", payload.image)) if value is not None}
+        return notification or None
 
-        return messaging.Notification(
-            title=payload.title,
-            body=payload.body,
-            image=payload.image,
-        )
+    def _build_message(self, target: Dict[str, str], notification: Dict[str, str] | None, data: Dict[str, str] | None = None) -> Dict[str, Any]:
+        message: Dict[str, Any] = dict(target)
+        if notification:
+            message["notification"] = notification
+        if data:
+            message["data"] = data
+        return message
 
     def _build_apns_config(self, payload: Union[PushSendToUserRequest, PushSendToTokenRequest, PushSendToTopicRequest]) -> messaging.APNSConfig | None:
         notification = self._build_notification(payload)
@@ -105,33 +121,44 @@ class FCMService:
             self._initialized = True
             logger.info("Firebase Admin SDK initialized")
 
-    async def send_to_token(self, payload: PushSendToTokenRequest) -> str:
-        await self.initialize()
+    async def get_client(self) -> FCMHttpClient:
+        if self._client is not None:
+            return self._client
 
-        message = messaging.Message(
-            token=payload.token,
-            notification=self._build_notification(payload),
-            data=self._build_data_payload(payload),
-        )
+        async with self._init_lock:
+            if self._client is None:
+                key_path = self._service_account_file()
+                if not key_path.exists():
+                    raise FileNotFoundError(f"Firebase service account file not found: {key_path}")
 
-        return await asyncio.to_thread(messaging.send, message)
+                service_account = json.loads(key_path.read_text())
+                self._client = FCMHttpClient(service_account, FCM_API_BASE_URL, FCM_TOKEN_URL, FCM_MAX_CONCURRENT_REQUESTS, FCM_REQUEST_TIMEOUT_SECONDS)
+                logger.info(f"FCM HTTP client initialized for project {self._client.project_id} (http2={self._client.http2})")
+            return self._client
 
-    async def send_to_tokens(self, tokens: Iterable[str], payload: Union[PushSendToUserRequest, PushSendToTokenRequest, PushSendToTopicRequest], dry_run: bool = False) -> messaging.BatchResponse:
-        await self.initialize()
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    async def send_to_token(self, payload: PushSendToTokenRequest) -> str:
+        client = await self.get_client()
+        message = self._build_message({"token": payload.token}, self._build_notification(payload), self._build_data_payload(payload))
+        return await client.send(message)
+
+    async def send_to_tokens(self, tokens: Iterable[str], payload: Union[PushSendToUserRequest, PushSendToTokenRequest, PushSendToTopicRequest], dry_run: bool = False) -> BatchResult:
+        client = await self.get_client()
 
         tokens_list = [t for t in tokens if t]
         if not tokens_list:
             raise ValueError("tokens is empty")
 
-        message = messaging.MulticastMessage(
-            tokens=tokens_list,
-            notification=self._build_notification(payload),
-            data=self._build_data_payload(payload),
-        )
+        notification, data = self._build_notification(payload), self._build_data_payload(payload)
+        response = await client.send_each([self._build_message({"token": token}, notification, data) for token in tokens_list], dry_run)
+        await self._prune_dead_tokens(zip(tokens_list, response.responses))
+        return response
 
-        return await asyncio.to_thread(messaging.send_each_for_multicast, message, dry_run)
-
-    async def send_to_user(self, session: AsyncSession, user_id: int, payload: Union[PushSendToUserRequest, PushSendToTokenRequest, PushSendToTopicRequest]) -> messaging.BatchResponse | None:
+    async def send_to_user(self, session: AsyncSession, user_id: int, payload: Union[PushSendToUserRequest, PushSendToTokenRequest, PushSendToTopicRequest]) -> BatchResult | None:
         tokens = await device_token_crud.get_by_user_id(session, user_id)
         token_values = [t.token for t in tokens]
         if not token_values:
@@ -145,15 +172,70 @@ class FCMService:
         
         return result
 
-    async def send_to_topic(self, payload: PushSendToTopicRequest) -> str:
-        await self.initialize()
+    async def send_to_users(self, session: AsyncSession, user_ids: Iterable[int], payload: Union[PushPayload, Mapping[int, PushPayload]], dry_run: bool = False) -> Dict[int, UserPushResult]:
+        """Push to many users with one token query; the sends share the HTTP client's connections and concurrency limit.
 
-        message = messaging.Message(
-            topic=payload.topic,
-            notification=self._build_notification(payload),
-        )
+        payload is either shared by everyone or a per-user mapping (users missing from it are skipped). Users without
+        tokens get no entry in the result; if the client cannot be set up every token counts as failed, so callers that
+        retry (the outbox) do."""
+        per_user = isinstance(payload, Mapping)
+        ids = list(dict.fromkeys(user_id for user_id in user_ids if not per_user or user_id in payload))
+        tokens = await device_token_crud.get_by_user_ids(session, ids)
+        if not tokens:
+            return {}
 
-        return await asyncio.to_thread(messaging.send, message)
+        try:
+            client = await self.get_client()
+        except Exception as e:
+            logger.error(f"Error sending push notifications to {len(ids)} users: {e}")
+            results: Dict[int, UserPushResult] = {}
+            for device_token in tokens:
+                result = results.setdefault(device_token.user_id, UserPushResult())
+                result.failure_count += 1
+                result.errors.append(f"FCM client unavailable: {e}")
+            return results
+
+        parts: Dict[int, Tuple[Dict[str, str] | None, Dict[str, str]]] = {}
+        messages: List[Dict[str, Any]] = []
+        for device_token in tokens:
+            user_payload = payload[device_token.user_id] if per_user else payload
+            if id(user_payload) not in parts:
+                parts[id(user_payload)] = (self._build_notification(user_payload), self._build_data_payload(user_payload))
+            messages.append(self._build_message({"token": device_token.token}, *parts[id(user_payload)]))
+
+        response = await client.send_each(messages, dry_run)
+        results: Dict[int, UserPushResult] = {}
+        for device_token, item in zip(tokens, response.responses):
+            result = results.setdefault(device_token.user_id, UserPushResult())
+            if item.success:
+                result.success_count += 1
+            else:
+                result.failure_count += 1
+                result.errors.append(str(item.exception))
+        await self._prune_dead_tokens((device_token.token, item) for device_token, item in zip(tokens, response.responses))
+        return results
+
+    async def _prune_dead_tokens(self, sent: Iterable[Tuple[str, Any]]) -> int:
+        """Delete tokens FCM reported as dead in one statement, in a session of its own (callers may never commit)."""
+        dead = list(dict.fromkeys(token for token, item in sent if isinstance(item.exception, FCMError) and item.exception.is_dead_token))
+        if not dead:
+            return 0
+
+        try:
+            async with async_session_maker() as session:
+                deleted = await device_token_crud.delete_tokens(session, dead)
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Error pruning {len(dead)} dead device tokens: {e}")
+            return 0
+
+        self.tokens_pruned += deleted
+        logger.info(f"Pruned {deleted} device tokens reported as unregistered by FCM")
+        return deleted
+
+    async def send_to_topic(self, payload: PushSendToTopicRequest) -> str:
+        client = await self.get_client()
+        return await client.send(self._build_message({"topic": payload.topic}, self._build_notification(payload)))
 
     async def subscribe_to_topic(self, tokens: Iterable[str], topic: str) -> messaging.TopicManagementResponse:
         await self.initialize()
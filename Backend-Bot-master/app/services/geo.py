@@ -0,0 +1,136 @@
+import math
+import numpy as np
+from typing import Dict, Hashable, Iterator, Optional, Set, Tuple
+
+EARTH_RADIUS_KM = 6371
+KM_PER_DEGREE_LAT = 111.32
+
+Cell = Tuple[int, int]
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    delta_lat = math.radians(lat2 - lat1)
+    delta_lon = math.radians(lon2 - lon1)
+
+    a = (math.sin(delta_lat / 2) ** 2 +
+         math.cos(lat1_rad) * math.cos(lat2_rad) *
+         math.sin(delta_lon / 2) ** 2)
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return EARTH_RADIUS_KM * c
+
+
+def haversine_km_many(latitude: float, longitude: float, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """Distances from one origin to arrays of coordinates."""
+    lat1 = math.radians(latitude)
+    lat2 = np.radians(latitudes)
+    sin_dlat = np.sin((lat2 - lat1) / 2)
+    sin_dlon = np.sin((np.radians(longitudes) - math.radians(longitude)) / 2)
+    a = sin_dlat ** 2 + math.cos(lat1) * np.cos(lat2) * sin_dlon ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def haversine_km_segments(latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """Lengths of the consecutive segments of a path, shape (len(latitudes) - 1,)."""
+    lat = np.radians(latitudes)
+    sin_dlat = np.sin(np.diff(lat) / 2)
+    sin_dlon = np.sin(np.diff(np.radians(longitudes)) / 2)
+    a = sin_dlat ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * sin_dlon ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def haversine_km_matrix(latitudes1: np.ndarray, longitudes1: np.ndarray, latitudes2: np.ndarray, longitudes2: np.ndarray) -> np.ndarray:
+    """Pairwise distances, shape (len(latitudes1), len(latitudes2))."""
+    lat1 = np.radians(latitudes1)[:, None]
+    lat2 = np.radians(latitudes2)[None, :]
+    sin_dlat = np.sin((lat2 - lat1) / 2)
+    sin_dlon = np.sin((np.radians(longitudes2)[None, :] - np.radians(longitudes1)[:, None]) / 2)
+    a = sin_dlat ** 2 + np.cos(lat1) * np.cos(lat2) * sin_dlon ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def bounding_box(latitude: float, longitude: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lng, max_lng) enclosing the radius around the point."""
+    lat_span = radius_km / KM_PER_DEGREE_LAT
+    cos_lat = max(math.cos(math.radians(min(abs(latitude) + lat_span, 89.9))), 1e-6)
+    lng_span = radius_km / (KM_PER_DEGREE_LAT * cos_lat)
+    return latitude - lat_span, latitude + lat_span, longitude - lng_span, longitude + lng_span
+
+
+def within_radius(latitude: float, longitude: float, latitudes: np.ndarray, longitudes: np.ndarray, radius_km: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Indices and distances of the points within radius_km; a bounding-box mask runs before the trigonometry."""
+    min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, longitude, radius_km)
+    candidates = np.flatnonzero((latitudes >= min_lat) & (latitudes <= max_lat) & (longitudes >= min_lng) & (longitudes <= max_lng))
+    if not len(candidates):
+        return candidates, np.empty(0)
+
+    distances = haversine_km_many(latitude, longitude, latitudes[candidates], longitudes[candidates])
+    inside = distances <= radius_km
+    return candidates[inside], distances[inside]
+
+
+class GridIndex:
+    """Fixed lat/lng grid: maps cells to the set of keys positioned inside them."""
+
+    def __init__(self, cell_size_deg: float):
+        self.cell_size_deg = cell_size_deg
+        self._cells: Dict[Cell, Set[Hashable]] = {}
+        self._key_to_cell: Dict[Hashable, Cell] = {}
+
+    def __len__(self) -> int:
+        return len(self._key_to_cell)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._key_to_cell
+
+    def keys(self) -> Iterator[Hashable]:
+        return iter(list(self._key_to_cell))
+
+    def cell_of(self, latitude: float, longitude: float) -> Cell:
+        return (math.floor(latitude / self.cell_size_deg), math.floor(longitude / self.cell_size_deg))
+
+    def get_cell(self, key: Hashable) -> Optional[Cell]:
+        return self._key_to_cell.get(key)
+
+    def upsert(self, key: Hashable, latitude: float, longitude: float) -> Cell:
+        cell = self.cell_of(latitude, longitude)
+        old_cell = self._key_to_cell.get(key)
+        if old_cell == cell:
+            return cell
+
+        if old_cell is not None:
+            self._discard_from_cell(key, old_cell)
+
+        self._cells.setdefault(cell, set()).add(key)
+        self._key_to_cell[key] = cell
+        return cell
+
+    def remove(self, key: Hashable) -> Optional[Cell]:
+        cell = self._key_to_cell.pop(key, None)
+        if cell is not None:
+            self._discard_from_cell(key, cell)
+        return cell
+
+    def _discard_from_cell(self, key: Hashable, cell: Cell) -> None:
+        keys = self._cells.get(cell)
+        if keys is None:
+            return
+
+        keys.discard(key)
+        if not keys:
+            del self._cells[cell]
+
+    def cells_within(self, latitude: float, longitude: float, radius_km: float) -> Iterator[Cell]:
+        min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, longitude, radius_km)
+        min_row, min_col = self.cell_of(min_lat, min_lng)
+        max_row, max_col = self.cell_of(max_lat, max_lng)
+        for row in range(min_row, max_row + 1):
+            for col in range(min_col, max_col + 1):
+                if (row, col) in self._cells:
+                    yield (row, col)
+
+    def keys_within(self, latitude: float, longitude: float, radius_km: float) -> Iterator[Hashable]:
+        """Yield keys of every cell overlapping the radius; callers still check the exact distance."""
+        for cell in self.cells_within(latitude, longitude, radius_km):
+            yield from self._cells[cell]
@@ -0,0 +1,200 @@
+import logging, math, time, app.config
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.dataclass import ONLINE, STATUS_CODE, DriverState
+from app.enum import DriverStatus
+from app.schemas.ride import RideSchema
+from app.services.ride_events import ride_events, RIDE_ADDED
+
+logger = logging.getLogger(__name__)
+
+Cell = Tuple[int, int]
+
+WINDOW_MINUTES = 15
+SHORT_WINDOW_MINUTES = 5
+BUSY = STATUS_CODE[DriverStatus.BUSY]
+
+SUPPLY_NONE, SUPPLY_ONLINE, SUPPLY_BUSY = 0, 1, 2
+EVENT_REQUESTED, EVENT_MATCHED, EVENT_CANCELED = 0, 1, 2
+EVENT_NAMES = ("requested", "matched", "canceled")
+WINDOW_KEYS = tuple((f"{name}_{SHORT_WINDOW_MINUTES}m", f"{name}_{WINDOW_MINUTES}m") for name in EVENT_NAMES)
+
+
+class _CellCounters:
+    """Live counts of one cell plus per-minute ring buffers of ride events over the last WINDOW_MINUTES."""
+
+    __slots__ = ("open_rides", "online", "busy", "last_minute", "minutes", "events")
+
+    def __init__(self):
+        self.open_rides = 0
+        self.online = 0
+        self.busy = 0
+        self.last_minute = -1
+        self.minutes = [-1] * WINDOW_MINUTES
+        self.events = [[0] * WINDOW_MINUTES for _ in EVENT_NAMES]
+
+    def add_event(self, event: int, minute: int) -> None:
+        slot = minute % WINDOW_MINUTES
+        if self.minutes[slot] != minute:
+            self.minutes[slot] = minute
+            for counts in self.events:
+                counts[slot] = 0
+        self.events[event][slot] += 1
+        self.last_minute = max(self.last_minute, minute)
+
+    def windows(self, now_minute: int) -> List[Tuple[int, int]]:
+        """(last SHORT_WINDOW_MINUTES, last WINDOW_MINUTES) counts per event."""
+        totals = [(0, 0)] * len(EVENT_NAMES)
+        if self.last_minute <= now_minute - WINDOW_MINUTES:
+            return totals
+
+        for slot, minute in enumerate(self.minutes):
+            if now_minute - WINDOW_MINUTES < minute <= now_minute:
+                recent = minute > now_minute - SHORT_WINDOW_MINUTES
+                totals = [(short + counts[slot] * recent, long + counts[slot]) for (short, long), counts in zip(totals, self.events)]
+        return totals
+
+    def is_empty(self, now_minute: int) -> bool:
+        return not (self.open_rides or self.online or self.busy) and self.last_minute <= now_minute - WINDOW_MINUTES
+
+
+class SupplyDemandHeatmap:
+    """Supply and demand per HEATMAP_CELL_DEG cell, maintained incrementally.
+
+    Driver transitions arrive through DriverStateStorage._index and ride transitions through ride_events, each costing
+    one dict lookup and a couple of counter updates. Open rides, online (available) and busy drivers are live counts;
+    requested/matched/canceled rides are also kept in minute buckets for the 5 and 15 minute windows."""
+
+    def __init__(self, cell_size_deg: float):
+        self.cell_size_deg = cell_size_deg
+        self._cells: Dict[Cell, _CellCounters] = {}
+        self._drivers: Dict[int, Tuple[Cell, int]] = {}
+        self._rides: Dict[int, Cell] = {}
+        self.events = 0
+        ride_events.subscribe(self.on_ride_event)
+
+    def cell_of(self, latitude: float, longitude: float) -> Cell:
+        return (math.floor(latitude / self.cell_size_deg), math.floor(longitude / self.cell_size_deg))
+
+    def _counters(self, cell: Cell) -> _CellCounters:
+        counters = self._cells.get(cell)
+        if counters is None:
+            counters = self._cells[cell] = _CellCounters()
+        return counters
+
+    @staticmethod
+    def _supply(state: DriverState) -> int:
+        if state.latitude is None or state.longitude is None:
+            return SUPPLY_NONE
+        if state.status_code == BUSY or state.current_ride_id is not None:
+            return SUPPLY_BUSY
+        return SUPPLY_ONLINE if state.status_code == ONLINE else SUPPLY_NONE
+
+    def update_driver(self, state: DriverState) -> None:
+        supply = self._supply(state)
+        cell = self.cell_of(float(state.latitude), float(state.longitude)) if supply else None
+        old = self._drivers.get(state.driver_profile_id)
+        if old == (cell, supply) or (old is None and not supply):
+            return
+
+        self.events += 1
+        if old is not None:
+            self._count_driver(old[0], old[1], -1)
+        if supply:
+            self._drivers[state.driver_profile_id] = (cell, supply)
+            self._count_driver(cell, supply, 1)
+        else:
+            del self._drivers[state.driver_profile_id]
+
+    def remove_driver(self, driver_profile_id: int) -> None:
+        old = self._drivers.pop(driver_profile_id, None)
+        if old is not None:
+            self.events += 1
+            self._count_driver(old[0], old[1], -1)
+
+    def _count_driver(self, cell: Cell, supply: int, delta: int) -> None:
+        counters = self._counters(cell)
+        if supply == SUPPLY_ONLINE:
+            counters.online += delta
+        else:
+            counters.busy += delta
+
+    def add_ride(self, ride: RideSchema, now: Optional[float] = None) -> None:
+        cell = self.cell_of(float(ride.pickup_lat), float(ride.pickup_lng))
+        old = self._rides.get(ride.id)
+        if old == cell:
+            return
+
+        self.events += 1
+        if old is not None:
+            self._counters(old).open_rides -= 1
+        self._rides[ride.id] = cell
+        counters = self._counters(cell)
+        counters.open_rides += 1
+        if old is None:
+            now = now or time.time()
+            created = ride.created_at.timestamp() if isinstance(ride.created_at, datetime) else now
+            if created > now - WINDOW_MINUTES * 60:
+                counters.add_event(EVENT_REQUESTED, int(min(created, now) // 60))
+
+    def remove_ride(self, ride: RideSchema, now: Optional[float] = None) -> None:
+        cell = self._rides.pop(ride.id, None)
+        if cell is None:
+            return
+
+        self.events += 1
+        counters = self._counters(cell)
+        counters.open_rides -= 1
+        counters.add_event(EVENT_MATCHED if ride.driver_profile_id is not None else EVENT_CANCELED, int((now or time.time()) // 60))
+
+    def load_rides(self, rides: Iterable[RideSchema]) -> None:
+        for ride in rides:
+            self.add_ride(ride)
+
+    async def on_ride_event(self, kind: str, ride: RideSchema) -> None:
+        if kind == RIDE_ADDED:
+            self.add_ride(ride)
+        else:
+            self.remove_ride(ride)
+
+    def snapshot(self, bbox: Optional[Tuple[float, float, float, float]] = None, limit: Optional[int] = None, now: Optional[float] = None) -> List[dict]:
+        """Non-empty cells, the largest demand - supply gap first; bbox is (min_lat, max_lat, min_lng, max_lng)."""
+        now_minute = int((now or time.time()) // 60)
+        half = self.cell_size_deg / 2
+        cells = []
+        for cell, counters in list(self._cells.items()):
+            if counters.is_empty(now_minute):
+                del self._cells[cell]
+                continue
+
+            latitude, longitude = cell[0] * self.cell_size_deg + half, cell[1] * self.cell_size_deg + half
+            if bbox is not None and not (bbox[0] <= latitude <= bbox[1] and bbox[2] <= longitude <= bbox[3]):
+                continue
+
+            entry = {
+                "cell": [cell[0], cell[1]],
+                "latitude": round(latitude, 6),
+                "longitude": round(longitude, 6),
+                "open_rides": counters.open_rides,
+                "online": counters.online,
+                "busy": counters.busy,
+                "gap": counters.open_rides - counters.online,
+            }
+            for (short_key, long_key), (short, long) in zip(WINDOW_KEYS, counters.windows(now_minute)):
+                entry[short_key] = short
+                entry[long_key] = long
+            cells.append(entry)
+
+        cells.sort(key=lambda entry: (entry["gap"], entry[f"requested_{SHORT_WINDOW_MINUTES}m"]), reverse=True)
+        return cells[:limit] if limit else cells
+
+    def get_stats(self) -> dict:
+        return {
+            "cells": len(self._cells),
+            "drivers": len(self._drivers),
+            "open_rides": len(self._rides),
+            "events": self.events,
+        }
+
+
+heatmap = SupplyDemandHeatmap(app.config.HEATMAP_CELL_DEG)
@@ -9,7 +9,7 @@ from app.crud.in_app_notification import in_app_notification_crud
 from app.models import DriverModerationInfo, DriverProfile, User
 from app.schemas.in_app_notification import InAppNotificationCreate
 from app.schemas.push import PushNotificationData
-from app.services.fcm_service import fcm_service
+from app.services.outbox import outbox
 
 
 logger = logging.getLogger(__name__)
@@ -70,16 +70,13 @@ async def send_moderation_notification(
     if notification is None:
         return
 
-    try:
-        await fcm_service.send_to_user(
-            session,
-            user.id,
-            PushNotificationData(title=title, body=message[:255], data={
-                "type": event_type,
-                "driver_profile_id": str(driver_profile_id),
-                "status": str(profile.status),
-                "reasons": reason_messages,
-            }),
-        )
-    except Exception:
-        logger.exception("Failed to send moderation notification profile_id=%s", driver_profile_id)
+    outbox.send_push(
+        session,
+        [user.id],
+        PushNotificationData(title=title, body=message[:255], data={
+            "type": event_type,
+            "driver_profile_id": str(driver_profile_id),
+            "status": str(profile.status),
+            "reasons": reason_messages,
+        }),
+    )
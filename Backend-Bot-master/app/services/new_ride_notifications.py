@@ -3,48 +3,20 @@ from __future__ import annotations
 import logging
 from typing import Any
 
-from sqlalchemy import exists, select
+from sqlalchemy import select
 
 import app.config
-from app.crud.driver_feed import driver_feed
 from app.crud.in_app_notification import in_app_notification_crud
 from app.db import async_session_maker
-from app.models import DriverLocation, DriverProfile, Ride
+from app.models import Ride
 from app.schemas.in_app_notification import InAppNotificationCreate
 from app.schemas.push import PushNotificationData
-from app.services.fcm_service import fcm_service
+from app.services.driver_state_storage import driver_state_storage
+from app.services.outbox import outbox
 
 
 logger = logging.getLogger(__name__)
 
-ACTIVE_RIDE_STATUSES = ("waiting_commission", "accepted", "on_the_way", "arrived", "started")
-
-
-def is_matching_driver(driver_location: Any, driver_profile: Any, ride: Any) -> bool:
-    """Return whether a persisted driver matches the current feed rules."""
-    if driver_location.status != "online":
-        return False
-    if driver_location.latitude is None or driver_location.longitude is None:
-        return False
-
-    allowed_classes = {
-        str(ride_class).lower()
-        for ride_class in (driver_profile.classes_allowed or [])
-    }
-    if str(ride.ride_class).lower() not in allowed_classes:
-        return False
-
-    if ride.ride_type == "with_car" and driver_profile.current_car_id is None:
-        return False
-
-    distance = driver_feed._haversine_distance(
-        float(driver_location.latitude),
-        float(driver_location.longitude),
-        float(ride.pickup_lat),
-        float(ride.pickup_lng),
-    )
-    return distance <= app.config.MAX_DISTANCE_KM
-
 
 def build_new_ride_push_data(ride: Any, distance_to_pickup_km: float) -> dict[str, str]:
     return {
@@ -65,7 +37,10 @@ def _build_notification_message(ride: Any, distance_to_pickup_km: float) -> tupl
 
 
 async def notify_about_new_ride(ride_id: int) -> None:
-    """Best-effort notification fan-out for an already-created requested ride."""
+    """Best-effort notification fan-out for an already-created requested ride.
+
+    All candidate notifications are written with one INSERT ... ON CONFLICT DO NOTHING RETURNING; WebSocket and push
+    deliveries for the rows actually inserted go to the outbox in the same transaction."""
     async with async_session_maker() as session:
         try:
             ride_result = await session.execute(
@@ -79,74 +54,38 @@ async def notify_about_new_ride(ride_id: int) -> None:
             if not ride:
                 return
 
-            active_ride_exists = exists(
-                select(Ride.id).where(
-                    Ride.driver_profile_id == DriverProfile.id,
-                    Ride.status.in_(ACTIVE_RIDE_STATUSES),
-                )
+            candidates = driver_state_storage.get_available_drivers_near(
+                float(ride.pickup_lat),
+                float(ride.pickup_lng),
+                app.config.MAX_DISTANCE_KM,
+                ride.ride_class,
+                ride.ride_type,
             )
-            candidates_result = await session.execute(
-                select(DriverLocation, DriverProfile)
-                .join(DriverProfile, DriverProfile.id == DriverLocation.driver_profile_id)
-                .where(
-                    DriverProfile.approved.is_(True),
-                    DriverProfile.user_id.is_not(None),
-                    DriverLocation.status == "online",
-                    DriverLocation.latitude.is_not(None),
-                    DriverLocation.longitude.is_not(None),
-                    ~active_ride_exists,
-                )
-            )
-
-            for driver_location, driver_profile in candidates_result.all():
-                if not is_matching_driver(driver_location, driver_profile, ride):
-                    continue
+            approved = {driver.driver_profile_id for driver in await driver_state_storage.filter_approved(session, [driver for driver, _ in candidates])}
+            candidates = [(driver, distance) for driver, distance in candidates if driver.driver_profile_id in approved]
+            if not candidates:
+                return
 
-                distance = driver_feed._haversine_distance(
-                    float(driver_location.latitude),
-                    float(driver_location.longitude),
-                    float(ride.pickup_lat),
-                    float(ride.pickup_lng),
-                )
+            push_data: dict[int, dict[str, str]] = {}
+            create_objs = []
+            for driver_state, distance in candidates:
                 title, body = _build_notification_message(ride, distance)
                 data = build_new_ride_push_data(ride, distance)
-                try:
-                    async with session.begin_nested():
-                        notification = await in_app_notification_crud.create(
-                            session,
-                            InAppNotificationCreate(
-                                user_id=driver_profile.user_id,
-                                type="new_ride",
-                                title=title,
-                                message=body,
-                                data={**data, "pickup_address": ride.pickup_address},
-                                dedup_key=f"new_ride:{ride.id}:{driver_profile.id}",
-                            ),
-                        )
-                except Exception:
-                    logger.exception(
-                        "Failed to save new ride notification ride_id=%s user_id=%s",
-                        ride.id,
-                        driver_profile.user_id,
-                    )
-                    continue
-
-                if notification is None:
-                    continue
-
-                try:
-                    await fcm_service.send_to_user(
-                        session,
-                        driver_profile.user_id,
-                        PushNotificationData(title=title, body=body, data=data),
-                    )
-                except Exception:
-                    logger.exception(
-                        "Failed to send new ride push ride_id=%s user_id=%s",
-                        ride.id,
-                        driver_profile.user_id,
+                push_data[driver_state.user_id] = data
+                create_objs.append(
+                    InAppNotificationCreate(
+                        user_id=driver_state.user_id,
+                        type="new_ride",
+                        title=title,
+                        message=body,
+                        data={**data, "pickup_address": ride.pickup_address},
+                        dedup_key=f"new_ride:{ride.id}:{driver_state.driver_profile_id}",
                     )
+                )
 
+            notifications = await in_app_notification_crud.create_many(session, create_objs)
+            for notification in notifications:
+                outbox.send_push(session, [notification.user_id], PushNotificationData(title=notification.title, body=notification.message, data=push_data[notification.user_id]))
             await session.commit()
         except Exception:
             await session.rollback()
@@ -0,0 +1,193 @@
+import asyncio, logging, app.config
+from asyncio import Task
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+from sqlalchemy import delete, event, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.db import async_session_maker
+from app.models.outbox import OutboxMessage
+from app.schemas.push import PushNotificationData
+from app.services.fcm_service import fcm_service
+from app.services.websocket_manager import ConnectionManager
+
+logger = logging.getLogger(__name__)
+
+PUSH = "push"
+
+_PENDING_KEY = "outbox"
+
+
+class NotificationOutbox:
+    """WebSocket and push deliveries written to `outbox` inside the business transaction and sent by a background worker.
+
+    A commit wakes the worker, which claims a batch by moving available_at OUTBOX_LEASE_SECONDS ahead (FOR UPDATE SKIP
+    LOCKED, so several workers split the rows). Delivered rows are deleted, failed ones come back after an exponential
+    backoff and are dropped after OUTBOX_MAX_ATTEMPTS. Delivery is at least once: a worker dying mid-batch leaves its
+    lease to expire and the rows are sent again."""
+
+    def __init__(self):
+        self._wakeup = asyncio.Event()
+        self._task: Optional[Task[None]] = None
+        self.delivered = 0
+        self.retried = 0
+        self.dropped = 0
+
+    def send_ws(self, session: AsyncSession, manager: ConnectionManager, user_id: Optional[int], message: dict) -> None:
+        if user_id is None:
+            return
+        self._add(session, [OutboxMessage(channel=manager.name, user_id=user_id, payload=manager.convert_datetime_to_str_in_dict(message))])
+
+    def send_push(self, session: AsyncSession, user_ids: Iterable[int], payload: PushNotificationData) -> None:
+        data = payload.model_dump(mode="json")
+        self._add(session, [OutboxMessage(channel=PUSH, user_id=user_id, payload=data) for user_id in user_ids if user_id is not None])
+
+    def _add(self, session: AsyncSession, messages: List[OutboxMessage]) -> None:
+        if messages:
+            session.add_all(messages)
+            session.sync_session.info[_PENDING_KEY] = True
+
+    def _on_commit(self, session: Session) -> None:
+        if session.info.pop(_PENDING_KEY, False):
+            self._wakeup.set()
+
+    @staticmethod
+    def _on_rollback(session: Session) -> None:
+        session.info.pop(_PENDING_KEY, None)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _loop(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                claimed = await self.dispatch_once()
+            except Exception as exc:
+                logger.error(f"Outbox dispatch error: {exc}")
+                claimed = 0
+
+            if claimed >= app.config.OUTBOX_BATCH_SIZE:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=app.config.OUTBOX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def dispatch_once(self) -> int:
+        """Claim, deliver and settle one batch; returns how many rows were claimed."""
+        rows = await self._claim()
+        if not rows:
+            return 0
+
+        failed = await self._deliver(rows)
+        await self._settle(rows, failed)
+        return len(rows)
+
+    async def _claim(self) -> List[Any]:
+        due = (
+            select(OutboxMessage.id)
+            .where(OutboxMessage.available_at <= func.now())
+            .order_by(OutboxMessage.id)
+            .limit(app.config.OUTBOX_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        stmt = (
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(due))
+            .values(available_at=func.now() + timedelta(seconds=app.config.OUTBOX_LEASE_SECONDS), attempts=OutboxMessage.attempts + 1)
+            .returning(OutboxMessage.id, OutboxMessage.channel, OutboxMessage.user_id, OutboxMessage.payload, OutboxMessage.attempts)
+            .execution_options(synchronize_session=False)
+        )
+        async with async_session_maker() as session:
+            result = await session.execute(stmt)
+            rows = sorted(result.all(), key=lambda row: row.id)
+            await session.commit()
+        return rows
+
+    async def _deliver(self, rows: List[Any]) -> Dict[int, str]:
+        """Send the batch; returns the ids that failed with their error."""
+        failed: Dict[int, str] = {}
+        ws_rows = [row for row in rows if row.channel != PUSH]
+        outcomes = await asyncio.gather(*(self._send_ws(row) for row in ws_rows), return_exceptions=True)
+        for row, outcome in zip(ws_rows, outcomes):
+            if isinstance(outcome, Exception):
+                failed[row.id] = str(outcome)
+
+        pending = [row for row in rows if row.channel == PUSH]
+        while pending:
+            # send_to_users takes one payload per user, so a user with several pushes in the batch gets them in rounds
+            current: Dict[int, Any] = {}
+            later = []
+            for row in pending:
+                if row.user_id in current:
+                    later.append(row)
+                else:
+                    current[row.user_id] = row
+            failed.update(await self._send_push(current))
+            pending = later
+        return failed
+
+    @staticmethod
+    async def _send_ws(row: Any) -> None:
+        manager = ConnectionManager._registry.get(row.channel)
+        if manager is None:
+            logger.warning(f"Outbox message {row.id} has unknown channel {row.channel}")
+            return
+        await manager.send_personal_message(row.user_id, row.payload)
+
+    @staticmethod
+    async def _send_push(rows: Dict[int, Any]) -> Dict[int, str]:
+        payloads = {user_id: PushNotificationData.model_validate(row.payload) for user_id, row in rows.items()}
+        try:
+            async with async_session_maker() as session:
+                results = await fcm_service.send_to_users(session, list(payloads), payloads)
+        except Exception as exc:
+            return {row.id: str(exc) for row in rows.values()}
+
+        return {rows[user_id].id: "; ".join(result.errors) for user_id, result in results.items() if result.failure_count and not result.success_count}
+
+    async def _settle(self, rows: List[Any], failed: Dict[int, str]) -> None:
+        done = [row.id for row in rows if row.id not in failed]
+        dropped = [row.id for row in rows if row.id in failed and row.attempts >= app.config.OUTBOX_MAX_ATTEMPTS]
+        now = datetime.now(timezone.utc)
+        retries = [
+            {
+                "id": row.id,
+                "available_at": now + timedelta(seconds=min(app.config.OUTBOX_RETRY_BASE_SECONDS * 2 ** (row.attempts - 1), app.config.OUTBOX_RETRY_MAX_SECONDS)),
+                "last_error": failed[row.id][:1000],
+            }
+            for row in rows
+            if row.id in failed and row.attempts < app.config.OUTBOX_MAX_ATTEMPTS
+        ]
+
+        async with async_session_maker() as session:
+            if done or dropped:
+                await session.execute(delete(OutboxMessage).where(OutboxMessage.id.in_(done + dropped)))
+            if retries:
+                await session.execute(update(OutboxMessage), retries)
+            await session.commit()
+
+        self.delivered += len(done)
+        self.retried += len(retries)
+        self.dropped += len(dropped)
+        for row_id in dropped:
+            logger.error(f"Outbox message {row_id} dropped after {app.config.OUTBOX_MAX_ATTEMPTS} attempts: {failed[row_id]}")
+
+    def get_stats(self) -> dict:
+        return {"delivered": self.delivered, "retried": self.retried, "dropped": self.dropped}
+
+
+outbox = NotificationOutbox()
+event.listen(Session, "after_commit", outbox._on_commit)
+event.listen(Session, "after_rollback", outbox._on_rollback)
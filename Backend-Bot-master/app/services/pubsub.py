@@ -0,0 +1,161 @@
+import abc, asyncio, json, logging, uuid
+import asyncpg
+from typing import Awaitable, Callable, Dict, List, Optional
+import app.config
+
+logger = logging.getLogger(__name__)
+
+WORKER_ID = uuid.uuid4().hex
+
+PubSubHandler = Callable[[dict], Awaitable[None]]
+
+CHANNEL_PREFIX = "ubro_"
+POSTGRES_PAYLOAD_LIMIT = 7900
+
+
+class PubSub(abc.ABC):
+    """Cross-worker message bus. Handlers only see messages published by other workers; local delivery stays with the caller."""
+
+    distributed = False
+
+    def __init__(self):
+        self.worker_id = WORKER_ID
+        self._handlers: Dict[str, List[PubSubHandler]] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._sender: Optional[asyncio.Task] = None
+
+    def subscribe(self, channel: str, handler: PubSubHandler) -> None:
+        self._handlers.setdefault(channel, []).append(handler)
+
+    async def start(self) -> None:
+        return None
+
+    async def stop(self) -> None:
+        if self._sender is not None and not self._sender.done():
+            await self._queue.join()
+            self._sender.cancel()
+
+    async def publish(self, channel: str, payload: dict) -> None:
+        await self._send(channel, json.dumps({"origin": self.worker_id, "data": payload}, default=str))
+
+    def publish_nowait(self, channel: str, payload: dict) -> None:
+        """Queue a message from sync code; a single sender task keeps publication order."""
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._queue.put_nowait((channel, payload))
+        if self._sender is None or self._sender.done():
+            self._sender = asyncio.create_task(self._drain())
+
+    async def _drain(self) -> None:
+        while True:
+            channel, payload = await self._queue.get()
+            try:
+                await self.publish(channel, payload)
+            except Exception as exc:
+                logger.error(f"PubSub publish error channel={channel}: {exc}")
+            finally:
+                self._queue.task_done()
+
+    @abc.abstractmethod
+    async def _send(self, channel: str, raw: str) -> None:
+        ...
+
+    async def _receive(self, channel: str, raw: str) -> None:
+        message = json.loads(raw)
+        if message.get("origin") == self.worker_id:
+            return
+
+        for handler in self._handlers.get(channel, []):
+            try:
+                await handler(message["data"])
+            except Exception as exc:
+                logger.error(f"PubSub handler error channel={channel}: {exc}")
+
+
+class InMemoryBus:
+    def __init__(self):
+        self.members: List["InMemoryPubSub"] = []
+
+
+class InMemoryPubSub(PubSub):
+    """In-process stand-in: every member of the same bus behaves like a separate worker."""
+
+    def __init__(self, bus: Optional[InMemoryBus] = None, worker_id: Optional[str] = None):
+        super().__init__()
+        self.bus = bus or InMemoryBus()
+        self.bus.members.append(self)
+        if worker_id:
+            self.worker_id = worker_id
+
+    @property
+    def distributed(self) -> bool:
+        return len(self.bus.members) > 1
+
+    async def _send(self, channel: str, raw: str) -> None:
+        for member in list(self.bus.members):
+            await member._receive(channel, raw)
+
+
+class PostgresPubSub(PubSub):
+    """LISTEN/NOTIFY on a dedicated asyncpg connection; payloads are capped at NOTIFY's 8000-byte limit."""
+
+    distributed = True
+
+    def __init__(self):
+        super().__init__()
+        self._connection = None
+        self._lock = asyncio.Lock()
+
+    def subscribe(self, channel: str, handler: PubSubHandler) -> None:
+        first = channel not in self._handlers
+        super().subscribe(channel, handler)
+        if first and self._connection is not None:
+            asyncio.create_task(self._listen(channel))
+
+    async def start(self) -> None:
+        await self._connect()
+
+    async def stop(self) -> None:
+        await super().stop()
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+    async def _connect(self) -> None:
+        self._connection = await asyncpg.connect(
+            host=app.config.DB_HOST,
+            port=int(app.config.DB_PORT or 5432),
+            user=app.config.DB_USER,
+            password=app.config.DB_PASS,
+            database=app.config.DB_NAME,
+        )
+        for channel in self._handlers:
+            await self._listen(channel)
+        logger.info(f"PubSub worker {self.worker_id} listening on {len(self._handlers)} channels")
+
+    async def _listen(self, channel: str) -> None:
+        await self._connection.add_listener(CHANNEL_PREFIX + channel, self._on_notify)
+
+    def _on_notify(self, connection, pid, channel: str, raw: str) -> None:
+        asyncio.create_task(self._receive(channel[len(CHANNEL_PREFIX):], raw))
+
+    async def _send(self, channel: str, raw: str) -> None:
+        if len(raw.encode()) > POSTGRES_PAYLOAD_LIMIT:
+            logger.error(f"PubSub payload too large for NOTIFY channel={channel} size={len(raw)}")
+            return
+
+        async with self._lock:
+            if self._connection is None or self._connection.is_closed():
+                await self._connect()
+            await self._connection.execute("SELECT pg_notify($1, $2)", CHANNEL_PREFIX + channel, raw)
+
+
+def create_pubsub(backend: str) -> PubSub:
+    if backend == "postgres":
+        return PostgresPubSub()
+    if backend == "memory":
+        return InMemoryPubSub()
+    raise ValueError(f"Unknown STATE_BACKEND: {backend}")
+
+
+pubsub = create_pubsub(app.config.STATE_BACKEND)
@@ -0,0 +1,191 @@
+import logging
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import MATCHING_GRID_CELL_DEG
+from app.dataclass import DriverState, class_mask
+from app.models import Ride
+from app.schemas.ride import RideSchema
+from app.services.geo import KM_PER_DEGREE_LAT, GridIndex, haversine_km_matrix, within_radius
+from app.services.ride_events import ride_events, RIDE_ADDED
+
+logger = logging.getLogger(__name__)
+
+RideKind = Tuple[str, str]
+
+MATRIX_CHUNK_ELEMENTS = 1_000_000
+CANDIDATE_BAND_DRIVERS = 64
+
+
+class RideBook:
+    """Process-level book of open (requested, unassigned) rides, indexed by (ride_class, ride_type) and grid cell."""
+
+    def __init__(self):
+        self._rides: Dict[int, RideSchema] = {}
+        self._grids: Dict[RideKind, GridIndex] = {}
+        self._arrays: Optional[Tuple[List[RideSchema], np.ndarray, np.ndarray, np.ndarray, List[RideKind]]] = None
+        self.loaded = False
+        ride_events.subscribe(self.on_ride_event)
+
+    def __len__(self) -> int:
+        return len(self._rides)
+
+    @staticmethod
+    def _kind(ride: RideSchema) -> RideKind:
+        return (str(ride.ride_class).lower(), ride.ride_type)
+
+    async def load(self, session: AsyncSession) -> int:
+        result = await session.execute(select(Ride).where(and_(Ride.status == "requested", Ride.driver_profile_id.is_(None))))
+        rides = [RideSchema.model_validate(ride) for ride in result.scalars().all()]
+
+        self._rides = {}
+        self._grids = {}
+        self._arrays = None
+        for ride in rides:
+            self.add(ride)
+
+        self.loaded = True
+        logger.info(f"Ride book loaded with {len(rides)} open rides")
+        return len(rides)
+
+    def add(self, ride: RideSchema) -> None:
+        old = self._rides.get(ride.id)
+        if old is not None and self._kind(old) != self._kind(ride):
+            self.remove(ride.id)
+
+        self._rides[ride.id] = ride
+        self._arrays = None
+        grid = self._grids.setdefault(self._kind(ride), GridIndex(MATCHING_GRID_CELL_DEG))
+        grid.upsert(ride.id, float(ride.pickup_lat), float(ride.pickup_lng))
+
+    def remove(self, ride_id: int) -> Optional[RideSchema]:
+        ride = self._rides.pop(ride_id, None)
+        if ride is None:
+            return None
+
+        self._arrays = None
+        grid = self._grids.get(self._kind(ride))
+        if grid is not None:
+            grid.remove(ride_id)
+        return ride
+
+    def get(self, ride_id: int) -> Optional[RideSchema]:
+        return self._rides.get(ride_id)
+
+    def all(self) -> List[RideSchema]:
+        return list(self._rides.values())
+
+    async def on_ride_event(self, kind: str, ride: RideSchema) -> None:
+        if kind == RIDE_ADDED:
+            self.add(ride)
+        else:
+            self.remove(ride.id)
+
+    def _permitted_kinds(self, driver: DriverState) -> List[RideKind]:
+        return [kind for kind in self._grids if driver.has_permit(*kind)]
+
+    def get_nearby_for_driver(self, driver: DriverState, radius_km: float, limit: Optional[int] = None) -> List[Tuple[float, RideSchema]]:
+        """Open rides the driver may take within radius_km of their position, nearest first."""
+        if driver.latitude is None or driver.longitude is None:
+            return []
+
+        latitude, longitude = float(driver.latitude), float(driver.longitude)
+        rides = [self._rides[ride_id] for kind in self._permitted_kinds(driver) for ride_id in self._grids[kind].keys_within(latitude, longitude, radius_km)]
+        if not rides:
+            return []
+
+        latitudes = np.fromiter((float(ride.pickup_lat) for ride in rides), dtype=float, count=len(rides))
+        longitudes = np.fromiter((float(ride.pickup_lng) for ride in rides), dtype=float, count=len(rides))
+        indices, distances = within_radius(latitude, longitude, latitudes, longitudes, radius_km)
+        return [(float(distances[i]), rides[indices[i]]) for i in self._top_k(distances, limit)]
+
+    @staticmethod
+    def _top_k(distances: np.ndarray, limit: Optional[int]) -> np.ndarray:
+        if limit is not None and len(distances) > limit:
+            candidates = np.argpartition(distances, limit - 1)[:limit]
+            return candidates[np.argsort(distances[candidates], kind="stable")]
+        return np.argsort(distances, kind="stable")
+
+    def _snapshot(self) -> Tuple[List[RideSchema], np.ndarray, np.ndarray, np.ndarray, List[RideKind]]:
+        if self._arrays is None:
+            rides = list(self._rides.values())
+            kinds = list(self._grids)
+            kind_codes = {kind: code for code, kind in enumerate(kinds)}
+            self._arrays = (
+                rides,
+                np.fromiter((float(ride.pickup_lat) for ride in rides), dtype=float, count=len(rides)),
+                np.fromiter((float(ride.pickup_lng) for ride in rides), dtype=float, count=len(rides)),
+                np.fromiter((kind_codes[self._kind(ride)] for ride in rides), dtype=np.int32, count=len(rides)),
+                kinds,
+            )
+        return self._arrays
+
+    def get_nearby_for_drivers(self, drivers: List[DriverState], radius_km: float, limit: int) -> Dict[int, List[Tuple[float, RideSchema]]]:
+        """Many-to-many variant for the feed tick: one distance matrix per chunk of drivers against the whole book."""
+        feeds: Dict[int, List[Tuple[float, RideSchema]]] = {driver.driver_profile_id: [] for driver in drivers}
+        drivers = [driver for driver in drivers if driver.latitude is not None and driver.longitude is not None]
+        rides, latitudes, longitudes, kind_codes, kinds = self._snapshot()
+        if not rides or not drivers:
+            return feeds
+
+        kind_masks = np.fromiter((class_mask((ride_class,)) for ride_class, _ in kinds), dtype=np.int64, count=len(kinds))
+        kind_needs_car = np.fromiter((ride_type == "with_car" for _, ride_type in kinds), dtype=bool, count=len(kinds))
+        chunk_size = max(1, MATRIX_CHUNK_ELEMENTS // len(rides))
+        for start in range(0, len(drivers), chunk_size):
+            chunk = drivers[start:start + chunk_size]
+            driver_latitudes = np.fromiter((float(driver.latitude) for driver in chunk), dtype=float, count=len(chunk))
+            driver_longitudes = np.fromiter((float(driver.longitude) for driver in chunk), dtype=float, count=len(chunk))
+            distances = haversine_km_matrix(driver_latitudes, driver_longitudes, latitudes, longitudes)
+            for row, driver in enumerate(chunk):
+                permitted = ((kind_masks & driver.class_mask) != 0) & (~kind_needs_car | (driver.car_id is not None))
+                indices = np.flatnonzero(permitted[kind_codes] & (distances[row] <= radius_km))
+                row_distances = distances[row][indices]
+                feeds[driver.driver_profile_id] = [(float(row_distances[i]), rides[indices[i]]) for i in self._top_k(row_distances, limit)]
+
+        return feeds
+
+    def get_candidates(self, drivers: List[DriverState], radius_km: float, k: int) -> Tuple[List[RideSchema], np.ndarray, np.ndarray]:
+        """Up to k nearest permitted rides within radius_km per driver, for batch dispatch.
+
+        Drivers are processed in latitude bands against the rides of the matching latitude window only, instead of the
+        full drivers x rides matrix. Returns (rides, candidates, distances): candidates[i] indexes into rides (-1 pads),
+        distances[i] in km (inf pads)."""
+        rides, latitudes, longitudes, kind_codes, kinds = self._snapshot()
+        candidates = np.full((len(drivers), k), -1, dtype=np.int64)
+        distances = np.full((len(drivers), k), np.inf)
+        if not rides or not drivers:
+            return rides, candidates, distances
+
+        kind_masks = np.fromiter((class_mask((ride_class,)) for ride_class, _ in kinds), dtype=np.int64, count=len(kinds))[kind_codes]
+        needs_car = np.fromiter((ride_type == "with_car" for _, ride_type in kinds), dtype=bool, count=len(kinds))[kind_codes]
+        driver_latitudes = np.fromiter((float(driver.latitude) for driver in drivers), dtype=float, count=len(drivers))
+        driver_longitudes = np.fromiter((float(driver.longitude) for driver in drivers), dtype=float, count=len(drivers))
+        driver_masks = np.fromiter((driver.class_mask for driver in drivers), dtype=np.int64, count=len(drivers))
+        driver_has_car = np.fromiter((driver.car_id is not None for driver in drivers), dtype=bool, count=len(drivers))
+
+        ride_order = np.argsort(latitudes, kind="stable")
+        sorted_latitudes = latitudes[ride_order]
+        lat_span = radius_km / KM_PER_DEGREE_LAT
+        driver_order = np.argsort(driver_latitudes, kind="stable")
+        for start in range(0, len(drivers), CANDIDATE_BAND_DRIVERS):
+            band = driver_order[start:start + CANDIDATE_BAND_DRIVERS]
+            low = np.searchsorted(sorted_latitudes, driver_latitudes[band[0]] - lat_span, side="left")
+            high = np.searchsorted(sorted_latitudes, driver_latitudes[band[-1]] + lat_span, side="right")
+            columns = ride_order[low:high]
+            width = min(k, len(columns))
+            if not width:
+                continue
+
+            matrix = haversine_km_matrix(driver_latitudes[band], driver_longitudes[band], latitudes[columns], longitudes[columns])
+            permitted = ((driver_masks[band, None] & kind_masks[None, columns]) != 0) & (~needs_car[None, columns] | driver_has_car[band, None])
+            matrix[~permitted | (matrix > radius_km)] = np.inf
+
+            nearest = np.argpartition(matrix, width - 1, axis=1)[:, :width] if width < len(columns) else np.broadcast_to(np.arange(width), (len(band), width))
+            nearest_distances = np.take_along_axis(matrix, nearest, axis=1)
+            candidates[band, :width] = np.where(np.isfinite(nearest_distances), columns[nearest], -1)
+            distances[band, :width] = nearest_distances
+
+        return rides, candidates, distances
+
+ride_book = RideBook()
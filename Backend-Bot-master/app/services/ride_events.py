@@ -0,0 +1,72 @@
+import asyncio, logging
+from typing import Awaitable, Callable, List, Tuple
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.schemas.ride import RideSchema
+from app.services.pubsub import pubsub
+
+logger = logging.getLogger(__name__)
+
+RIDE_ADDED = "ride_added"
+RIDE_REMOVED = "ride_removed"
+
+RideEventHandler = Callable[[str, RideSchema], Awaitable[None]]
+
+_PENDING_KEY = "ride_events"
+
+
+class RideEvents:
+    """Ride lifecycle events for the open-ride feed, delivered only after the publishing transaction commits."""
+
+    def __init__(self):
+        self._handlers: List[RideEventHandler] = []
+        pubsub.subscribe("ride_events", self.on_remote_events)
+
+    def subscribe(self, handler: RideEventHandler) -> None:
+        self._handlers.append(handler)
+
+    def publish(self, session: AsyncSession, kind: str, ride: RideSchema) -> None:
+        session.sync_session.info.setdefault(_PENDING_KEY, []).append((kind, ride))
+
+    def publish_added(self, session: AsyncSession, ride: RideSchema) -> None:
+        self.publish(session, RIDE_ADDED, ride)
+
+    def publish_removed(self, session: AsyncSession, ride: RideSchema) -> None:
+        self.publish(session, RIDE_REMOVED, ride)
+
+    def _on_commit(self, session: Session) -> None:
+        events = session.info.pop(_PENDING_KEY, None)
+        if not events:
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            logger.warning(f"Dropped {len(events)} ride events: no running event loop")
+            return
+
+        loop.create_task(self._dispatch(events))
+        if pubsub.distributed:
+            for kind, ride in events:
+                pubsub.publish_nowait("ride_events", {"kind": kind, "ride": ride.model_dump(mode="json")})
+
+    @staticmethod
+    def _on_rollback(session: Session) -> None:
+        session.info.pop(_PENDING_KEY, None)
+
+    async def on_remote_events(self, payload: dict) -> None:
+        await self._dispatch([(payload["kind"], RideSchema.model_validate(payload["ride"]))])
+
+    async def _dispatch(self, events: List[Tuple[str, RideSchema]]) -> None:
+        for kind, ride in events:
+            for handler in self._handlers:
+                try:
+                    await handler(kind, ride)
+                except Exception as exc:
+                    logger.error(f"Ride event handler error kind={kind} ride_id={ride.id}: {exc}")
+
+
+ride_events = RideEvents()
+event.listen(Session, "after_commit", ride_events._on_commit)
+event.listen(Session, "after_rollback", ride_events._on_rollback)
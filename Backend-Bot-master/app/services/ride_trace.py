@@ -0,0 +1,310 @@
+import asyncio, logging, math, time, app.config
+import numpy as np
+from asyncio import Task
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.db import async_session_maker
+from app.models import Ride
+from app.models.ride_trace import RideTrace
+from app.services.pubsub import pubsub
+
+logger = logging.getLogger(__name__)
+
+COORD_SCALE = 100_000
+KM_PER_DEGREE = 111.195
+MAX_CLOCK_SKEW_SECONDS = 60
+
+Point = Tuple[int, int, int]
+
+_PENDING_KEY = "ride_trace"
+START, STOP = "start", "stop"
+
+
+def encode_points(points: np.ndarray, previous: Point = (0, 0, 0)) -> bytes:
+    """Zigzag varint deltas of (lat*1e5, lng*1e5, unix seconds) triples; a 1 Hz city trace takes ~3-4 bytes per fix."""
+    deltas = np.diff(np.asarray(points, dtype=np.int64).reshape(-1, 3), axis=0, prepend=np.array([previous], dtype=np.int64)).ravel()
+    zigzag = ((deltas << 1) ^ (deltas >> 63)).astype(np.uint64)
+    sizes = np.ones(len(zigzag), dtype=np.int64)
+    for group in range(1, 10):
+        sizes += zigzag >= np.uint64(1 << (7 * group))
+
+    out = np.empty(int(sizes.sum()), dtype=np.uint8)
+    offsets = np.cumsum(sizes) - sizes
+    for group in range(int(sizes.max(initial=0))):
+        mask = sizes > group
+        chunk = (zigzag[mask] >> np.uint64(7 * group)) & np.uint64(0x7F)
+        more = (sizes[mask] > group + 1).astype(np.uint64) << np.uint64(7)
+        out[offsets[mask] + group] = (chunk | more).astype(np.uint8)
+    return out.tobytes()
+
+
+def decode_points(data: bytes) -> np.ndarray:
+    """Inverse of encode_points for a whole trace: absolute triples, shape (n, 3)."""
+    raw = np.frombuffer(data, dtype=np.uint8).astype(np.uint64)
+    if not len(raw):
+        return np.empty((0, 3), dtype=np.int64)
+
+    ends = (raw & np.uint64(0x80)) == 0
+    starts = np.flatnonzero(np.concatenate(([True], ends[:-1])))
+    positions = np.arange(len(raw)) - np.repeat(starts, np.diff(np.append(starts, len(raw))))
+    zigzag = np.add.reduceat((raw & np.uint64(0x7F)) << (np.uint64(7) * positions.astype(np.uint64)), starts)
+    deltas = (zigzag >> np.uint64(1)).astype(np.int64) ^ -(zigzag & np.uint64(1)).astype(np.int64)
+    return np.cumsum(deltas.reshape(-1, 3), axis=0)
+
+
+@dataclass
+class TraceSummary:
+    distance_meters: int
+    duration_seconds: int
+    fix_count: int
+
+
+def summarize(data: bytes) -> Optional[TraceSummary]:
+    """Driven distance and duration of a trace.
+
+    Distance only grows once the driver is TRACE_MIN_SEGMENT_METERS away from the last counted point, so 1 Hz GPS
+    jitter while standing or crawling does not add up; jumps faster than TRACE_MAX_SPEED_KMH are skipped."""
+    points = decode_points(data)
+    if len(points) < 2:
+        return None
+
+    meters_per_unit = KM_PER_DEGREE * 1000 / COORD_SCALE
+    ys = (points[:, 0] * meters_per_unit).tolist()
+    xs = (points[:, 1] * meters_per_unit * math.cos(math.radians(points[0, 0] / COORD_SCALE))).tolist()
+    seconds = points[:, 2].tolist()
+    min_segment = app.config.TRACE_MIN_SEGMENT_METERS
+    max_speed = app.config.TRACE_MAX_SPEED_KMH / 3.6
+
+    distance = 0.0
+    anchor = 0
+    for index in range(1, len(points)):
+        segment = math.hypot(xs[index] - xs[anchor], ys[index] - ys[anchor])
+        if min_segment <= segment <= max_speed * max(seconds[index] - seconds[anchor], 1):
+            distance += segment
+            anchor = index
+
+    return TraceSummary(distance_meters=int(round(distance)), duration_seconds=int(seconds[-1] - seconds[0]), fix_count=len(points))
+
+
+class _Trace:
+    __slots__ = ("driver_profile_id", "data", "flushed", "count", "flushed_count", "last", "finishing")
+
+    def __init__(self, driver_profile_id: Optional[int], data: bytes = b"", count: int = 0, last: Optional[Point] = None):
+        self.driver_profile_id = driver_profile_id
+        self.data = bytearray(data)
+        self.flushed = len(data)
+        self.count = count
+        self.flushed_count = count
+        self.last = last
+        self.finishing = False
+
+
+class RideTraceRecorder:
+    """GPS breadcrumbs of started rides, one delta-encoded blob per ride in ride_traces.
+
+    Fixes are appended to an in-memory buffer and the new bytes are flushed every TRACE_FLUSH_INTERVAL_SECONDS with one
+    multi-row upsert (points = points || new bytes). The distance and duration of a ride are computed from it on finish.
+
+    Starting and stopping take effect when the ride's transaction commits and are replicated to the other workers, since
+    fixes arrive on whichever worker holds the driver's socket."""
+
+    def __init__(self):
+        self._active: Set[int] = set()
+        self._traces: Dict[int, _Trace] = {}
+        self._flusher: Optional[Task[None]] = None
+        self._lock = asyncio.Lock()
+        self.fixes_recorded = 0
+        self.bytes_flushed = 0
+        pubsub.subscribe("ride_trace", self.on_remote_changes)
+
+    async def load(self, session: AsyncSession) -> int:
+        result = await session.execute(select(Ride.id).where(Ride.status == "started"))
+        self._active.update(result.scalars().all())
+        return len(self._active)
+
+    def start(self, session: AsyncSession, ride_id: int) -> None:
+        session.sync_session.info.setdefault(_PENDING_KEY, {})[ride_id] = START
+
+    def stop(self, session: AsyncSession, ride_id: int) -> None:
+        session.sync_session.info.setdefault(_PENDING_KEY, {})[ride_id] = STOP
+
+    def _on_commit(self, session: Session) -> None:
+        changes = session.info.pop(_PENDING_KEY, None)
+        if not changes:
+            return
+
+        self._apply(changes)
+        if pubsub.distributed:
+            pubsub.publish_nowait("ride_trace", {
+                "start": [ride_id for ride_id, change in changes.items() if change == START],
+                "stop": [ride_id for ride_id, change in changes.items() if change != START],
+            })
+
+    def _on_rollback(self, session: Session) -> None:
+        for ride_id in session.info.pop(_PENDING_KEY, None) or ():
+            trace = self._traces.get(ride_id)
+            if trace is not None:
+                trace.finishing = False
+
+    def _apply(self, changes: Dict[int, object]) -> None:
+        """START, STOP or, for a finish, the (bytes, fixes) its transaction wrote up to."""
+        for ride_id, change in changes.items():
+            if change == START:
+                self._active.add(ride_id)
+                continue
+
+            self._active.discard(ride_id)
+            trace = self._traces.get(ride_id)
+            if trace is not None and isinstance(change, tuple):
+                trace.finishing = False
+                self._mark_flushed({ride_id: change})
+
+    async def on_remote_changes(self, payload: dict) -> None:
+        self._active.update(payload["start"])
+        self._active.difference_update(payload["stop"])
+
+    def is_recording(self, ride_id: Optional[int]) -> bool:
+        return ride_id in self._active
+
+    async def record(self, ride_id: int, driver_profile_id: int, fixes: Iterable[Tuple[float, float, Optional[float]]]) -> int:
+        """Append (lat, lng, unix ts or None for now) fixes; out-of-order and repeated fixes are dropped."""
+        if ride_id not in self._active:
+            return 0
+
+        trace = self._traces.get(ride_id)
+        if trace is None:
+            trace = await self._restore(ride_id, driver_profile_id)
+
+        now = time.time()
+        points: List[Point] = []
+        last = trace.last
+        for latitude, longitude, ts in fixes:
+            seconds = int(ts) if ts and 0 < ts <= now + MAX_CLOCK_SKEW_SECONDS else int(now)
+            point = (int(round(latitude * COORD_SCALE)), int(round(longitude * COORD_SCALE)), seconds)
+            if last is not None and (seconds < last[2] or point == last):
+                continue
+            points.append(point)
+            last = point
+
+        if not points:
+            return 0
+
+        trace.data += encode_points(np.array(points), trace.last or (0, 0, 0))
+        trace.count += len(points)
+        trace.last = last
+        self.fixes_recorded += len(points)
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._loop())
+        return len(points)
+
+    async def _restore(self, ride_id: int, driver_profile_id: int) -> _Trace:
+        """Pick up a trace written before a restart, so new deltas continue from its last point."""
+        async with async_session_maker() as session:
+            result = await session.execute(select(RideTrace.points, RideTrace.fix_count).where(RideTrace.ride_id == ride_id))
+            row = result.one_or_none()
+
+        trace = self._traces.get(ride_id)
+        if trace is not None:
+            return trace
+
+        if row is None:
+            trace = _Trace(driver_profile_id)
+        else:
+            points = decode_points(row.points)
+            trace = _Trace(driver_profile_id, row.points, row.fix_count, tuple(int(value) for value in points[-1]) if len(points) else None)
+        self._traces[ride_id] = trace
+        return trace
+
+    async def _loop(self) -> None:
+        while self._traces:
+            await asyncio.sleep(app.config.TRACE_FLUSH_INTERVAL_SECONDS)
+            try:
+                await self.flush()
+            except Exception as exc:
+                logger.error(f"Ride trace flush error: {exc}")
+
+    async def flush(self) -> int:
+        async with self._lock:
+            pending = {ride_id: (len(trace.data), trace.count) for ride_id, trace in self._traces.items() if len(trace.data) > trace.flushed and not trace.finishing}
+            if pending:
+                async with async_session_maker() as session:
+                    await self._write(session, pending)
+                    await session.commit()
+                self._mark_flushed(pending)
+
+            for ride_id in [ride_id for ride_id, trace in self._traces.items() if ride_id not in self._active and len(trace.data) == trace.flushed and not trace.finishing]:
+                del self._traces[ride_id]
+            return len(pending)
+
+    async def _write(self, session: AsyncSession, pending: Dict[int, Tuple[int, int]]) -> None:
+        rows = [
+            {
+                "ride_id": ride_id,
+                "driver_profile_id": self._traces[ride_id].driver_profile_id,
+                "points": bytes(self._traces[ride_id].data[self._traces[ride_id].flushed:end]),
+                "fix_count": count - self._traces[ride_id].flushed_count,
+            }
+            for ride_id, (end, count) in pending.items()
+        ]
+        stmt = insert(RideTrace).values(rows)
+        await session.execute(stmt.on_conflict_do_update(
+            index_elements=[RideTrace.ride_id],
+            set_={
+                "points": RideTrace.points.op("||")(stmt.excluded.points),
+                "fix_count": RideTrace.fix_count + stmt.excluded.fix_count,
+                "updated_at": func.now(),
+            },
+        ))
+        self.bytes_flushed += sum(len(row["points"]) for row in rows)
+
+    def _mark_flushed(self, pending: Dict[int, Tuple[int, int]]) -> None:
+        for ride_id, (end, count) in pending.items():
+            trace = self._traces.get(ride_id)
+            if trace is not None:
+                trace.flushed, trace.flushed_count = end, count
+
+    async def finish(self, session: AsyncSession, ride_id: int) -> Optional[TraceSummary]:
+        """Write what is left within the caller's transaction and summarise the whole trace.
+
+        Recording stops and the buffer is released only when that transaction commits; if it rolls back (say the
+        status change is rejected) the trace is left as it was and keeps recording."""
+        async with self._lock:
+            trace = self._traces.get(ride_id)
+            if trace is None:
+                self.stop(session, ride_id)
+                result = await session.execute(select(RideTrace.points).where(RideTrace.ride_id == ride_id))
+                data = result.scalar_one_or_none()
+                return summarize(data) if data else None
+
+            end, count = len(trace.data), trace.count
+            if end > trace.flushed:
+                await self._write(session, {ride_id: (end, count)})
+            trace.finishing = True
+            session.sync_session.info.setdefault(_PENDING_KEY, {})[ride_id] = (end, count)
+            return summarize(bytes(trace.data[:end]))
+
+    async def close(self) -> None:
+        if self._flusher is not None and not self._flusher.done():
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+    def get_stats(self) -> dict:
+        return {
+            "recording": len(self._active),
+            "buffered": len(self._traces),
+            "fixes_recorded": self.fixes_recorded,
+            "bytes_flushed": self.bytes_flushed,
+        }
+
+
+ride_trace = RideTraceRecorder()
+event.listen(Session, "after_commit", ride_trace._on_commit)
+event.listen(Session, "after_rollback", ride_trace._on_rollback)
@@ -6,6 +6,7 @@ from app.crud import commission_payment_crud, ride_crud, in_app_notification_cru
 from app.schemas.in_app_notification import InAppNotificationCreate
 from app.schemas.ride import RideschemaUpdateAfterCommission
 from .websocket_manager import manager_driver_feed
+from .outbox import outbox
 from app.crud.driver_location_sender import driver_location_sender
 from .tbank_acquiring import amount_to_minor_units, tbank_acquiring_client
 
@@ -92,8 +93,8 @@ class WebhookDispatcher:
         ))
         driver_profile = await driver_profile_crud.get_by_id(session, ride.driver_profile_id)
         driver_id = driver_profile.user_id if driver_profile else 0
-        await manager_driver_feed.send_personal_message(driver_id, {"type": "ride_commission_paid", "message": "Клиент оплатил комиссию за поездку", "data": updated_ride.model_dump(mode="json")})
-        await driver_location_sender.start_task(updated_ride.client_id, updated_ride.driver_profile_id)
+        outbox.send_ws(session, manager_driver_feed, driver_id, {"type": "ride_commission_paid", "message": "Клиент оплатил комиссию за поездку", "data": updated_ride.model_dump(mode="json")})
+        await driver_location_sender.subscribe(updated_ride.client_id, updated_ride.driver_profile_id)
 
     async def _handle_failure(self, session: AsyncSession, commission_payment, updated) -> None:
         logger.warning("T-Bank acquiring payment failed: payment_id=%s status=%s", updated.payment_id, updated.status)
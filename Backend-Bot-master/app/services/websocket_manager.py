@@ -8,16 +8,21 @@ from sqlalchemy.future import select
 from sqlalchemy.orm import joinedload
 from sqlalchemy.ext.asyncio import AsyncSession
 from .fcm_service import fcm_service
+from .pubsub import PubSub, pubsub
 from app.schemas.push import PushNotificationData
 
 logger = logging.getLogger(__name__)
 
 
 class ConnectionManager:
+    _registry: Dict[str, "ConnectionManager"] = {}
     
-    def __init__(self):
+    def __init__(self, name: str, bus: Optional[PubSub] = None):
+        self.name = name
         self.active_connections: Dict[int, List[WebSocket]] = {}
-        self.ride_participants: Dict[int, set] = {}
+        self._pubsub = bus or pubsub
+        self._pubsub.subscribe("ws", self.on_remote_message)
+        ConnectionManager._registry[name] = self
     
     async def connect(self, websocket: WebSocket, user_id: int) -> None:
         await websocket.accept()
@@ -42,9 +47,18 @@ class ConnectionManager:
         return user_id in self.active_connections and len(self.active_connections[user_id]) > 0
 
     async def send_personal_message(self, user_id: int, message: dict) -> bool:
+        if not self.active_connections.get(user_id):
+            if self._pubsub.distributed:
+                await self._pubsub.publish("ws", {"manager": self.name, "kind": "personal", "user_id": user_id, "message": self.convert_datetime_to_str_in_dict(message)})
+            else:
+                logger.warning(f"User {user_id} is not connected")
+            return False
+
+        return await self._send_local(user_id, message)
+
+    async def _send_local(self, user_id: int, message: dict) -> bool:
         connections = self.active_connections.get(user_id)
         if not connections:
-            logger.warning(f"User {user_id} is not connected")
             return False
 
         message_with_timestamp = {
@@ -73,6 +87,11 @@ class ConnectionManager:
         return delivered
     
     async def broadcast(self, message: dict, exclude_user_id: Optional[int] = None) -> None:
+        if self._pubsub.distributed:
+            await self._pubsub.publish("ws", {"manager": self.name, "kind": "broadcast", "exclude_user_id": exclude_user_id, "message": self.convert_datetime_to_str_in_dict(message)})
+        await self._broadcast_local(message, exclude_user_id)
+
+    async def _broadcast_local(self, message: dict, exclude_user_id: Optional[int] = None) -> None:
         message_with_timestamp = {
             **self.convert_datetime_to_str_in_dict(message),
             "timestamp": datetime.now(timezone.utc).isoformat()
@@ -85,19 +104,6 @@ class ConnectionManager:
             for websocket in connections:
                 await websocket.send_json(message_with_timestamp)
     
-    def join_ride(self, ride_id: int, user_id: int) -> None:
-        if ride_id not in self.ride_participants:
-            self.ride_participants[ride_id] = set()
-        self.ride_participants[ride_id].add(user_id)
-        logger.info(f"User {user_id} joined ride {ride_id}")
-    
-    def leave_ride(self, ride_id: int, user_id: int) -> None:
-        if ride_id in self.ride_participants:
-            self.ride_participants[ride_id].discard(user_id)
-            if not self.ride_participants[ride_id]:
-                del self.ride_participants[ride_id]
-        logger.info(f"User {user_id} left ride {ride_id}")
-    
     async def send_to_ride(self, session: AsyncSession, ride_id: int, message: dict, exclude_user_id: Optional[int] = None, my_user_id: Optional[int] = None) -> None:
         ride = await session.execute(select(Ride).options(joinedload(Ride.driver_profile)).where(Ride.id == ride_id))
         ride = ride.scalar_one_or_none()
@@ -106,9 +112,10 @@ class ConnectionManager:
             return
         
         driver_profile_user_id = ride.driver_profile.user_id if ride.driver_profile else None
-        ride_participants_push_notifications = [ride.client_id, driver_profile_user_id] if driver_profile_user_id else [ride.client_id]
+        ride_participants = [ride.client_id, driver_profile_user_id] if driver_profile_user_id else [ride.client_id]
         
-        for user_id in ride_participants_push_notifications:
+        pushes: Dict[int, PushNotificationData] = {}
+        for user_id in ride_participants:
             sender_id = message.get('message', {}).get('sender_id', 0)
             sender_role = 'driver' if driver_profile_user_id == sender_id else 'client'
             if message.get('type', '') == 'new_message' and sender_id != user_id:
@@ -119,14 +126,13 @@ class ConnectionManager:
                     sender = await user_crud.get_by_id(session, sender_id)
                     
                 sender_fullname = " ".join([word for word in [sender.last_name, sender.first_name] if word]) if sender else "Unknown"
-                await fcm_service.send_to_user(session, user_id, PushNotificationData(title=sender_fullname, body=message.get('message', {}).get('text', 'TEXT')))
+                pushes[user_id] = PushNotificationData(title=sender_fullname, body=message.get('message', {}).get('text', 'TEXT'))
+        if pushes:
+            await fcm_service.send_to_users(session, list(pushes), pushes)
 
         
-        if ride_id not in self.ride_participants:
-            logger.warning(f"No participants in ride {ride_id}")
-            return
-
-        for user_id in self.ride_participants[ride_id]:
+        # participants come from the ride, so send_personal_message reaches them on whichever worker holds their socket
+        for user_id in ride_participants:
             if exclude_user_id and user_id == exclude_user_id:
                 continue
             
@@ -158,6 +164,15 @@ class ConnectionManager:
 
         return convert_datetimes(dictionary)
 
-manager = ConnectionManager()
-manager_driver_feed = ConnectionManager()
-manager_notifications = ConnectionManager()
+    async def on_remote_message(self, payload: dict) -> None:
+        if payload["manager"] != self.name:
+            return
+
+        if payload["kind"] == "broadcast":
+            await self._broadcast_local(payload["message"], payload.get("exclude_user_id"))
+        else:
+            await self._send_local(int(payload["user_id"]), payload["message"])
+
+manager = ConnectionManager("chat")
+manager_driver_feed = ConnectionManager("driver_feed")
+manager_notifications = ConnectionManager("notifications")
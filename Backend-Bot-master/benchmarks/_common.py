@@ -0,0 +1,20 @@
+"""Setup shared by the benchmark scripts.
+
+Run a script from the project root with the usual .env in place: python -m benchmarks.<script>. Importing this module
+first loads app.crud, which has to be imported before app.services.
+"""
+import time
+from typing import Callable
+import app.crud  # noqa: F401 - app.services must be imported after app.crud
+
+REPEATS = 5
+
+
+def best_of(func: Callable[[], object], repeats: int = REPEATS) -> float:
+    """Fastest of `repeats` calls, in seconds."""
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
@@ -0,0 +1,109 @@
+"""Batch dispatch on 2k drivers x 5k open rides and the reverse: candidate generation, assignment solve and pickup distance.
+
+The baseline is the pull feed: drivers grab their nearest free ride in arrival order (greedy). When SciPy is installed
+its Hungarian solver is run on the same candidates as an exact reference.
+"""
+import random
+import time
+from types import SimpleNamespace
+import numpy as np
+import benchmarks._common  # noqa: F401 - loads app.crud before app.services
+from app.dataclass import DriverState
+from app.services.assignment import solve_assignment
+from app.services.ride_book import RideBook
+
+SCENARIOS = ((2_000, 5_000), (5_000, 2_000))
+RADIUS_KM = 3.0
+CANDIDATES = 8
+CLASSES = ("light", "pro", "vip", "elite")
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+
+def _book(count: int) -> RideBook:
+    book = RideBook()
+    for ride_id in range(1, count + 1):
+        book.add(SimpleNamespace(
+            id=ride_id,
+            ride_class=random.choice(CLASSES),
+            ride_type=random.choice(("with_car", "without_car")),
+            pickup_lat=55.75 + random.uniform(-0.15, 0.15),
+            pickup_lng=37.62 + random.uniform(-0.25, 0.25),
+        ))
+    return book
+
+
+def _drivers(count: int) -> list[DriverState]:
+    return [
+        DriverState(
+            driver_profile_id=driver_profile_id,
+            user_id=driver_profile_id,
+            status="online",
+            latitude=55.75 + random.uniform(-0.15, 0.15),
+            longitude=37.62 + random.uniform(-0.25, 0.25),
+            classes_allowed=random.sample(CLASSES, random.randint(1, len(CLASSES))),
+            car_id=driver_profile_id if random.random() < 0.7 else None,
+        )
+        for driver_profile_id in range(1, count + 1)
+    ]
+
+
+def _greedy(candidates: np.ndarray, distances: np.ndarray) -> list[float]:
+    taken, picked = set(), []
+    for row in np.random.permutation(len(candidates)):
+        for column in np.argsort(distances[row]):
+            ride = candidates[row, column]
+            if ride >= 0 and ride not in taken:
+                taken.add(ride)
+                picked.append(distances[row, column])
+                break
+    return picked
+
+
+def _hungarian(candidates: np.ndarray, distances: np.ndarray, unmatched_cost: float) -> tuple[np.ndarray, np.ndarray]:
+    rides, columns = np.unique(candidates[candidates >= 0], return_inverse=True)
+    drivers = len(candidates)
+    matrix = np.full((drivers, len(rides) + drivers), unmatched_cost * 10)
+    matrix[np.nonzero(candidates >= 0)[0], columns] = distances[candidates >= 0]
+    matrix[np.arange(drivers), len(rides) + np.arange(drivers)] = unmatched_cost
+    row_ind, col_ind = linear_sum_assignment(matrix)
+    matched = col_ind < len(rides)
+    return row_ind[matched], rides[col_ind[matched]]
+
+
+def _report(name: str, elapsed: float, picked) -> None:
+    print(f"{name:>10}: {elapsed * 1000:8.1f} ms, {len(picked)} pairs, avg pickup {np.mean(picked):.3f} km, total {np.sum(picked):8.1f} km")
+
+
+def _run(driver_count: int, ride_count: int) -> None:
+    book, drivers = _book(ride_count), _drivers(driver_count)
+    started = time.perf_counter()
+    rides, candidates, distances = book.get_candidates(drivers, RADIUS_KM, CANDIDATES)
+    print(f"{driver_count} drivers x {ride_count} rides: candidates in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    started = time.perf_counter()
+    picked = _greedy(candidates, distances)
+    _report("greedy", time.perf_counter() - started, picked)
+
+    solvers = [("auction", lambda: solve_assignment(candidates, distances, 2 * RADIUS_KM))]
+    if linear_sum_assignment is not None:
+        solvers.append(("hungarian", lambda: _hungarian(candidates, distances, 2 * RADIUS_KM)))
+    for name, solve in solvers:
+        started = time.perf_counter()
+        driver_indices, ride_indices = solve()
+        elapsed = time.perf_counter() - started
+        assert len(set(ride_indices.tolist())) == len(ride_indices)
+        picked = [distances[i][candidates[i] == j][0] for i, j in zip(driver_indices, ride_indices)]
+        _report(name, elapsed, picked)
+
+
+def main() -> None:
+    for driver_count, ride_count in SCENARIOS:
+        _run(driver_count, ride_count)
+
+
+if __name__ == "__main__":
+    main()
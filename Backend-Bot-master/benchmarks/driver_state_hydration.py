@@ -0,0 +1,61 @@
+"""Cold-start hydration of DriverStateStorage for 10k drivers.
+
+Times the in-process part of DriverStateStorage.hydrate (rows -> DriverState + grid index) on synthetic rows.
+With --db it also runs the full DriverStateStorage.hydrate, query included, against the configured database.
+"""
+import asyncio
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+import benchmarks._common  # noqa: F401 - loads app.crud before app.services
+from app.services.driver_state_storage import DriverStateStorage
+
+DRIVERS = (1_000, 10_000, 50_000)
+CLASSES = ("light", "pro", "vip", "elite")
+STATUSES = ("online", "offline", "busy", "waiting_ride")
+
+
+def _rows(count: int) -> list[tuple]:
+    now = datetime.now(timezone.utc)
+    return [
+        (
+            driver_profile_id,
+            100_000 + driver_profile_id,
+            random.sample(CLASSES, random.randint(1, len(CLASSES))),
+            driver_profile_id if random.random() < 0.7 else None,
+            random.choice(STATUSES),
+            55.75 + random.uniform(-0.5, 0.5),
+            37.62 + random.uniform(-0.8, 0.8),
+            now - timedelta(seconds=random.randint(0, 3600)),
+        )
+        for driver_profile_id in range(1, count + 1)
+    ]
+
+
+def main() -> None:
+    for count in DRIVERS:
+        rows = _rows(count)
+        storage = DriverStateStorage()
+        started = time.perf_counter()
+        storage.hydrate_rows(rows)
+        elapsed = time.perf_counter() - started
+        stats = storage.get_stats()
+        print(f"{count:>6} drivers: hydrated in {elapsed * 1000:8.1f} ms, online={stats['online']}, indexed={len(storage._available_index)}")
+
+
+async def hydrate_from_db() -> None:
+    from app.db import async_session_maker
+
+    storage = DriverStateStorage()
+    async with async_session_maker() as session:
+        started = time.perf_counter()
+        count = await storage.hydrate(session)
+        elapsed = time.perf_counter() - started
+    print(f"{count:>6} drivers: hydrated from the database in {elapsed * 1000:8.1f} ms (query included)")
+
+
+if __name__ == "__main__":
+    main()
+    if "--db" in sys.argv[1:]:
+        asyncio.run(hydrate_from_db())
@@ -0,0 +1,77 @@
+"""Memory and permit-check throughput of 100k DriverState objects: the previous dataclass vs the slotted bitmask one."""
+import random
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Optional, Set
+from benchmarks._common import best_of
+from app.dataclass import DriverState, class_mask
+from app.enum import DriverStatus
+
+DRIVERS = 100_000
+CLASSES = ("light", "pro", "vip", "elite")
+KINDS = [(ride_class, ride_type) for ride_class in CLASSES for ride_type in ("with_car", "without_car", "delivery")]
+
+
+@dataclass
+class LegacyDriverState:
+    driver_profile_id: int
+    user_id: int
+    status: DriverStatus = DriverStatus.OFFLINE
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    classes_allowed: Set[str] = field(default_factory=set)
+    current_ride_id: Optional[int] = None
+    car_id: Optional[int] = None
+    updated_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+    def is_available(self) -> bool:
+        return self.status == DriverStatus.ONLINE and self.current_ride_id is None and self.latitude is not None
+
+    def has_permit(self, ride_class: str, ride_type: str) -> bool:
+        if ride_type == "with_car":
+            return ride_class.lower() in {c.lower() for c in self.classes_allowed} and self.car_id is not None
+        return ride_class.lower() in {c.lower() for c in self.classes_allowed}
+
+
+def _specs() -> list[dict]:
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "driver_profile_id": i,
+            "user_id": 100_000 + i,
+            "status": random.choice((DriverStatus.ONLINE, DriverStatus.OFFLINE, DriverStatus.BUSY)),
+            "latitude": 55.75 + random.uniform(-0.5, 0.5),
+            "longitude": 37.62 + random.uniform(-0.8, 0.8),
+            "classes_allowed": set(random.sample(CLASSES, random.randint(1, len(CLASSES)))),
+            "car_id": i if random.random() < 0.7 else None,
+            "updated_at": now,
+        }
+        for i in range(DRIVERS)
+    ]
+
+
+def _build(cls, specs: list[dict]) -> tuple[list, int]:
+    tracemalloc.start()
+    states = [cls(**{**spec, "classes_allowed": set(spec["classes_allowed"])}) for spec in specs]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return states, size
+
+
+def main() -> None:
+    specs = _specs()
+    legacy, legacy_size = _build(LegacyDriverState, specs)
+    compact, compact_size = _build(DriverState, specs)
+    print(f"{DRIVERS} drivers: dataclass {legacy_size / 2**20:6.1f} MiB, slots+bitmask {compact_size / 2**20:6.1f} MiB")
+
+    ride_class, ride_type = random.choice(KINDS)
+    ride_mask, needs_car = class_mask((ride_class,)), ride_type == "with_car"
+    legacy_time = best_of(lambda: [state for state in legacy if state.is_available() and state.has_permit(ride_class, ride_type)])
+    permit_time = best_of(lambda: [state for state in compact if state.is_available() and state.has_permit(ride_class, ride_type)])
+    mask_time = best_of(lambda: [state for state in compact if state.is_available() and state.permits(ride_mask, needs_car)])
+    print(f"{DRIVERS} permit checks: dataclass {legacy_time * 1000:7.1f} ms, has_permit {permit_time * 1000:7.1f} ms, permits(mask) {mask_time * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
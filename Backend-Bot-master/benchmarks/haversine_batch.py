@@ -0,0 +1,37 @@
+"""Scalar vs NumPy haversine on 1k/10k/50k (driver, ride) pairs."""
+import random
+import numpy as np
+from benchmarks._common import best_of
+from app.services.geo import haversine_km, haversine_km_many, haversine_km_matrix, within_radius
+
+PAIRS = (1_000, 10_000, 50_000)
+
+
+def _points(count: int) -> tuple[np.ndarray, np.ndarray]:
+    latitudes = np.array([55.75 + random.uniform(-0.5, 0.5) for _ in range(count)])
+    longitudes = np.array([37.62 + random.uniform(-0.8, 0.8) for _ in range(count)])
+    return latitudes, longitudes
+
+
+def main() -> None:
+    random.seed(42)
+    print(f"{'pairs':>8} {'scalar ms':>10} {'one-to-many ms':>15} {'bbox+many ms':>13} {'matrix ms':>10} {'speed-up':>9}")
+    for pairs in PAIRS:
+        latitudes, longitudes = _points(pairs)
+        lat_list, lng_list = latitudes.tolist(), longitudes.tolist()
+        origin = (55.75, 37.62)
+
+        scalar = best_of(lambda: [haversine_km(origin[0], origin[1], lat, lng) for lat, lng in zip(lat_list, lng_list)])
+        many = best_of(lambda: haversine_km_many(origin[0], origin[1], latitudes, longitudes))
+        bbox = best_of(lambda: within_radius(origin[0], origin[1], latitudes, longitudes, 10.0))
+
+        drivers = 100
+        driver_latitudes, driver_longitudes = _points(drivers)
+        ride_latitudes, ride_longitudes = latitudes[: pairs // drivers], longitudes[: pairs // drivers]
+        matrix = best_of(lambda: haversine_km_matrix(driver_latitudes, driver_longitudes, ride_latitudes, ride_longitudes))
+
+        print(f"{pairs:>8} {scalar * 1000:>10.2f} {many * 1000:>15.2f} {bbox * 1000:>13.2f} {matrix * 1000:>10.2f} {scalar / many:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Cost of the incrementally maintained heatmap and status counts against recounting on read.
+
+A 20k-driver city gets 200k location/status transitions through DriverStateStorage._index (which now also keeps the
+heatmap and the status counts), then get_stats is compared with the full pass it replaces and a heatmap snapshot is timed.
+"""
+import random
+import time
+from collections import Counter
+import benchmarks._common  # noqa: F401 - loads app.crud before app.services
+from app.dataclass import STATUSES, DriverState
+from app.enum import DriverStatus
+from app.services.driver_state_storage import driver_state_storage
+from app.services.heatmap import heatmap
+
+DRIVERS = 20_000
+UPDATES = 200_000
+READS = 100
+STATUS_CHOICES = (DriverStatus.ONLINE, DriverStatus.ONLINE, DriverStatus.ONLINE, DriverStatus.BUSY, DriverStatus.OFFLINE)
+
+
+def _full_pass_stats(drivers) -> dict:
+    counts = Counter(state.status_code for state in drivers.values())
+    return {status.value: counts[code] for code, status in enumerate(STATUSES)}
+
+
+def main() -> None:
+    random.seed(19)
+    storage = driver_state_storage
+    for driver_profile_id in range(DRIVERS):
+        state = DriverState(driver_profile_id, 1_000_000 + driver_profile_id, status=random.choice(STATUS_CHOICES), latitude=55.75 + random.uniform(-0.3, 0.3), longitude=37.62 + random.uniform(-0.5, 0.5), classes_allowed={"light"})
+        storage._drivers[driver_profile_id] = state
+        storage._user_to_driver[state.user_id] = driver_profile_id
+        storage._index(state)
+
+    states = list(storage._drivers.values())
+    started = time.perf_counter()
+    for _ in range(UPDATES):
+        state = random.choice(states)
+        if random.random() < 0.1:
+            state.status = random.choice(STATUS_CHOICES)
+        state.latitude += random.uniform(-0.002, 0.002)
+        state.longitude += random.uniform(-0.002, 0.002)
+        storage._index(state)
+    update_us = (time.perf_counter() - started) / UPDATES * 1e6
+
+    started = time.perf_counter()
+    for _ in range(READS):
+        stats = storage.get_stats()
+    incremental_ms = (time.perf_counter() - started) / READS * 1000
+    started = time.perf_counter()
+    for _ in range(READS):
+        recounted = _full_pass_stats(storage._drivers)
+    full_ms = (time.perf_counter() - started) / READS * 1000
+    assert all(stats[status] == recounted[status] for status in ("online", "busy", "offline")), (stats, recounted)
+
+    started = time.perf_counter()
+    cells = heatmap.snapshot()
+    snapshot_ms = (time.perf_counter() - started) * 1000
+    assert sum(cell["online"] + cell["busy"] for cell in cells) == stats["online"] + stats["busy"]
+
+    print(f"{UPDATES} transitions over {DRIVERS} drivers: {update_us:.2f} us per _index call (spatial index + status counts + heatmap)")
+    print(f"get_stats: incremental {incremental_ms * 1000:.1f} us, full pass {full_ms:.2f} ms")
+    print(f"heatmap: snapshot of {len(cells)} cells {snapshot_ms:.2f} ms, served once per stream tick to every subscriber")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Size and speed of the delta-encoded ride trace for a one-hour trip at 1 fix per second."""
+import math
+import time
+import numpy as np
+import benchmarks._common  # noqa: F401 - loads app.crud before app.services
+from app.services.geo import haversine_km_segments
+from app.services.ride_trace import COORD_SCALE, decode_points, encode_points, summarize
+
+SECONDS = 3_600
+GPS_NOISE_METERS = 3.0
+ROW_PER_FIX_BYTES = 24 + 3 * 8 + 8 + 8  # tuple header + id/driver/lat/lng/status/timestamps of a driver_locations-style row, no index
+
+
+def _trip() -> tuple[np.ndarray, float]:
+    rng = np.random.default_rng(42)
+    speed_ms = np.clip(9 + 7 * np.sin(np.arange(SECONDS) / 90) + rng.normal(0, 1, SECONDS), 0, 20)
+    heading = np.cumsum(rng.normal(0, 0.03, SECONDS))
+    north_m = np.cumsum(speed_ms * np.cos(heading))
+    east_m = np.cumsum(speed_ms * np.sin(heading))
+    latitudes = 55.75 + north_m / 111_195
+    longitudes = 37.62 + east_m / (111_195 * math.cos(math.radians(55.75)))
+    truth_km = float(haversine_km_segments(latitudes, longitudes).sum())
+
+    noisy_latitudes = latitudes + rng.normal(0, GPS_NOISE_METERS, SECONDS) / 111_195
+    noisy_longitudes = longitudes + rng.normal(0, GPS_NOISE_METERS, SECONDS) / (111_195 * math.cos(math.radians(55.75)))
+    points = np.column_stack([
+        np.round(noisy_latitudes * COORD_SCALE),
+        np.round(noisy_longitudes * COORD_SCALE),
+        1_760_000_000 + np.arange(SECONDS),
+    ]).astype(np.int64)
+    return points, truth_km
+
+
+def main() -> None:
+    points, truth_km = _trip()
+
+    started = time.perf_counter()
+    chunks = [encode_points(points[start:start + 15], tuple(points[start - 1]) if start else (0, 0, 0)) for start in range(0, SECONDS, 15)]
+    encode_ms = (time.perf_counter() - started) * 1000
+    blob = b"".join(chunks)
+
+    started = time.perf_counter()
+    decoded = decode_points(blob)
+    decode_ms = (time.perf_counter() - started) * 1000
+    assert np.array_equal(decoded, points)
+
+    started = time.perf_counter()
+    summary = summarize(blob)
+    summary_ms = (time.perf_counter() - started) * 1000
+
+    print(f"{SECONDS} fixes: blob {len(blob) / 1024:6.1f} KiB ({len(blob) / SECONDS:.2f} B/fix), "
+          f"float64 triples {SECONDS * 24 / 1024:6.1f} KiB, row per fix ~{SECONDS * ROW_PER_FIX_BYTES / 1024:6.1f} KiB")
+    print(f"encode in 15 s chunks {encode_ms:6.1f} ms, decode {decode_ms:5.1f} ms, summarize {summary_ms:5.1f} ms")
+    print(f"distance: trace {summary.distance_meters / 1000:.2f} km vs true {truth_km:.2f} km, duration {summary.duration_seconds} s")
+
+
+if __name__ == "__main__":
+    main()
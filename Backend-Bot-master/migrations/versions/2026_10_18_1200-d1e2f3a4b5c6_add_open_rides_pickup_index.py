@@ -0,0 +1,23 @@
+"""add partial index on open ride pickups
+
+Revision ID: d1e2f3a4b5c6
+Revises: c7d8e9f0a1b2
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "d1e2f3a4b5c6"
+down_revision: Union[str, None] = "c7d8e9f0a1b2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_rides_open_pickup", "rides", ["pickup_lat", "pickup_lng"], postgresql_where=sa.text("status = 'requested' AND driver_profile_id IS NULL"))
+
+
+def downgrade() -> None:
+    op.drop_index("ix_rides_open_pickup", table_name="rides")
@@ -0,0 +1,36 @@
+"""add deadlines
+
+Revision ID: e2f3a4b5c6d7
+Revises: d1e2f3a4b5c6
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "e2f3a4b5c6d7"
+down_revision: Union[str, None] = "d1e2f3a4b5c6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "deadlines",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("kind", sa.String(length=50), nullable=False),
+        sa.Column("ride_id", sa.BigInteger(), nullable=False),
+        sa.Column("user_id", sa.BigInteger(), nullable=True),
+        sa.Column("due_at", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.ForeignKeyConstraint(["ride_id"], ["rides.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("kind", "ride_id", name="uq_deadlines_kind_ride"),
+    )
+    op.create_index("ix_deadlines_due_at", "deadlines", ["due_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_deadlines_due_at", table_name="deadlines")
+    op.drop_table("deadlines")
@@ -0,0 +1,33 @@
+"""add ride traces
+
+Revision ID: f3a4b5c6d7e8
+Revises: e2f3a4b5c6d7
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "f3a4b5c6d7e8"
+down_revision: Union[str, None] = "e2f3a4b5c6d7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "ride_traces",
+        sa.Column("ride_id", sa.BigInteger(), nullable=False),
+        sa.Column("driver_profile_id", sa.BigInteger(), nullable=True),
+        sa.Column("points", sa.LargeBinary(), nullable=False),
+        sa.Column("fix_count", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("updated_at", sa.TIMESTAMP(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.ForeignKeyConstraint(["ride_id"], ["rides.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("ride_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("ride_traces")
@@ -0,0 +1,38 @@
+"""unique in-app notification dedup key
+
+Revision ID: a4b5c6d7e8f9
+Revises: f3a4b5c6d7e8
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "a4b5c6d7e8f9"
+down_revision: Union[str, None] = "f3a4b5c6d7e8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        DELETE FROM in_app_notifications n
+        USING in_app_notifications d
+        WHERE n.dedup_key IS NOT NULL
+          AND n.user_id = d.user_id
+          AND n.type = d.type
+          AND n.dedup_key = d.dedup_key
+          AND n.id > d.id
+        """
+    )
+    op.create_index(
+        "uq_in_app_notifications_user_type_dedup",
+        "in_app_notifications",
+        ["user_id", "type", "dedup_key"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_in_app_notifications_user_type_dedup", table_name="in_app_notifications")
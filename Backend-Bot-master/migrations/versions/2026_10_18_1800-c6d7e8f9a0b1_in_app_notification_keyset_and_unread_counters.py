@@ -0,0 +1,48 @@
+"""in-app notification keyset indexes and unread counters
+
+Revision ID: c6d7e8f9a0b1
+Revises: b5c6d7e8f9a0
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "c6d7e8f9a0b1"
+down_revision: Union[str, None] = "b5c6d7e8f9a0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("UPDATE in_app_notifications SET created_at = to_timestamp(0) WHERE created_at IS NULL")
+    op.alter_column("in_app_notifications", "created_at", nullable=False, server_default=sa.func.now())
+    op.create_index("ix_in_app_notifications_user_created", "in_app_notifications", ["user_id", "created_at", "id"])
+    op.create_index(
+        "ix_in_app_notifications_user_unread",
+        "in_app_notifications",
+        ["user_id", "created_at", "id"],
+        postgresql_where=sa.text("read_at IS NULL"),
+    )
+
+    op.create_table(
+        "in_app_notification_counters",
+        sa.Column("user_id", sa.BigInteger(), nullable=False),
+        sa.Column("unread", sa.Integer(), server_default="0", nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    op.execute(
+        """
+        INSERT INTO in_app_notification_counters (user_id, unread)
+        SELECT user_id, count(*) FROM in_app_notifications WHERE read_at IS NULL GROUP BY user_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("in_app_notification_counters")
+    op.drop_index("ix_in_app_notifications_user_unread", table_name="in_app_notifications")
+    op.drop_index("ix_in_app_notifications_user_created", table_name="in_app_notifications")
+    op.alter_column("in_app_notifications", "created_at", nullable=True, server_default=None)
@@ -0,0 +1,23 @@
+"""add deadline attempts
+
+Revision ID: d7e8f9a0b1c2
+Revises: c6d7e8f9a0b1
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "d7e8f9a0b1c2"
+down_revision: Union[str, None] = "c6d7e8f9a0b1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("deadlines", sa.Column("attempts", sa.Integer(), server_default="0", nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column("deadlines", "attempts")
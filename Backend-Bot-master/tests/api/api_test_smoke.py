@@ -6,15 +6,17 @@ def test_health_endpoint_is_public_and_alive(client):
     response = client.get("/api/v1/health")
 
     assert response.status_code == 200
-    assert response.json() == {"status": "ok"}
+    assert response.json()["status"] == "ok"
+    assert "driver_state_ready" in response.json()
 
 
 def test_route_inventory_contains_current_critical_http_endpoints(app_instance):
+    # newer FastAPI keeps included routers nested in app.routes, the OpenAPI paths are flat on every version
     routes = {
-        (method, route.path)
-        for route in app_instance.routes
-        for method in getattr(route, "methods", set())
-        if route.path.startswith("/api/v1")
+        (method.upper(), path)
+        for path, operations in app_instance.openapi()["paths"].items()
+        for method in operations
+        if path.startswith("/api/v1")
     }
 
     assert ("POST", "/api/v1/auth/send") in routes
@@ -22,7 +24,7 @@ def test_route_inventory_contains_current_critical_http_endpoints(app_instance):
     assert ("POST", "/api/v1/auth/logout") in routes
     assert ("POST", "/api/v1/commissions/payments/{id}/payment-link") in routes
     assert ("GET", "/api/v1/ride-requests/ride/{id}") in routes
-    assert ("GET", "/api/v1/documents/public/policy/{key:path}") in routes
+    assert ("GET", "/api/v1/documents/public/policy/{key}") in routes
     assert ("POST", "/api/v1/webhooks/tbank") in routes
     assert ("POST", "/api/v1/driver-profiles/me/resubmit") in routes
     assert ("POST", "/api/v1/internal/driver-profiles/{id}/moderation") in routes
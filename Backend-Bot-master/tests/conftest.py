@@ -1,4 +1,5 @@
 import importlib
+import os
 import sys
 import types
 from pathlib import Path
@@ -12,6 +13,10 @@ ROOT_DIR = Path(__file__).resolve().parents[1]
 if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
+# app.config is read at import time, so unit tests that import app modules directly need the DB settings in place
+for key, value in {"DB_HOST": "localhost", "DB_PORT": "5432", "DB_NAME": "test", "DB_USER": "test", "DB_PASS": "test"}.items():
+    os.environ.setdefault(key, value)
+
 
 class _DummyAsyncSession:
     async def commit(self) -> None:
@@ -45,6 +50,12 @@ class _DummyFCMService:
     async def send_to_user(self, session, user_id, payload):
         return SimpleNamespace(success_count=1, failure_count=0)
 
+    async def send_to_users(self, session, user_ids, payload, dry_run=False):
+        return {}
+
+    async def close(self):
+        return None
+
 
 class _DummyWebhookDispatcher:
     async def dispatch_webhook(self, session, payload):
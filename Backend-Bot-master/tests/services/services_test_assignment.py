@@ -0,0 +1,82 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import app.crud  # noqa: F401 - app.services must be imported after app.crud
+from app.services.assignment import solve_assignment
+
+UNMATCHED_COST = 6.0
+EPSILON = 0.01
+
+
+def _total(candidates, costs, driver_indices, ride_indices) -> float:
+    matched = dict(zip(driver_indices.tolist(), ride_indices.tolist()))
+    total = 0.0
+    for driver in range(len(candidates)):
+        if driver in matched:
+            total += float(costs[driver][candidates[driver] == matched[driver]][0])
+        else:
+            total += UNMATCHED_COST
+    return total
+
+
+def _brute_force(candidates, costs) -> float:
+    options = [[(-1, UNMATCHED_COST)] + [(int(ride), float(cost)) for ride, cost in zip(row, cost_row) if ride >= 0] for row, cost_row in zip(candidates, costs)]
+    best = float("inf")
+    for choice in itertools.product(*options):
+        rides = [ride for ride, _ in choice if ride >= 0]
+        if len(rides) == len(set(rides)):
+            best = min(best, sum(cost for _, cost in choice))
+    return best
+
+
+def _instance(rng, drivers: int, rides: int, k: int):
+    candidates = np.full((drivers, k), -1, dtype=np.int64)
+    costs = np.full((drivers, k), np.inf)
+    for driver in range(drivers):
+        count = rng.integers(0, min(k, rides) + 1)
+        chosen = np.sort(rng.choice(rides, size=count, replace=False))
+        candidates[driver, :count] = chosen
+        costs[driver, :count] = np.round(rng.uniform(0.1, 4.0, size=count), 3)
+    return candidates, costs
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_solve_assignment_is_within_epsilon_of_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    drivers, rides = int(rng.integers(1, 6)), int(rng.integers(1, 7))
+    candidates, costs = _instance(rng, drivers, rides, 3)
+
+    driver_indices, ride_indices = solve_assignment(candidates, costs, UNMATCHED_COST, EPSILON)
+
+    assert len(set(ride_indices.tolist())) == len(ride_indices)
+    assert len(set(driver_indices.tolist())) == len(driver_indices)
+    for driver, ride in zip(driver_indices.tolist(), ride_indices.tolist()):
+        assert ride in candidates[driver].tolist()
+    assert _total(candidates, costs, driver_indices, ride_indices) <= _brute_force(candidates, costs) + drivers * EPSILON + 1e-9
+
+
+def test_contested_ride_goes_to_the_cheaper_overall_assignment():
+    candidates = np.array([[0, 1], [0, -1]])
+    costs = np.array([[1.0, 1.5], [2.0, np.inf]])
+
+    driver_indices, ride_indices = solve_assignment(candidates, costs, UNMATCHED_COST, EPSILON)
+
+    assert dict(zip(driver_indices.tolist(), ride_indices.tolist())) == {0: 1, 1: 0}
+
+
+def test_driver_stays_unmatched_when_every_ride_costs_more_than_waiting():
+    candidates = np.array([[0]])
+    costs = np.array([[UNMATCHED_COST + 1]])
+
+    driver_indices, ride_indices = solve_assignment(candidates, costs, UNMATCHED_COST, EPSILON)
+
+    assert len(driver_indices) == len(ride_indices) == 0
+
+
+def test_no_candidates_returns_empty_arrays():
+    for candidates in (np.empty((0, 3), dtype=np.int64), np.full((2, 3), -1)):
+        driver_indices, ride_indices = solve_assignment(candidates, np.full(candidates.shape, np.inf), UNMATCHED_COST)
+        assert driver_indices.dtype == ride_indices.dtype == np.int64
+        assert len(driver_indices) == len(ride_indices) == 0
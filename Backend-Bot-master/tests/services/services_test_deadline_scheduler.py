@@ -0,0 +1,136 @@
+import sys
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+import app.config
+import app.crud  # noqa: F401 - app.services must be imported after app.crud
+from app.services.deadline_scheduler import RIDE_TIMEOUT, DeadlineScheduler
+
+scheduler_module = sys.modules["app.services.deadline_scheduler"]
+
+PAST = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+class _Savepoint:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class _FakeSession:
+    """Returns `claimed` for the DELETE ... RETURNING that claims the deadlines and records every later statement."""
+
+    def __init__(self, claimed) -> None:
+        self.claimed = claimed
+        self.executed = []
+        self.savepoints = 0
+        self.commits = 0
+        self.sync_session = SimpleNamespace(info={})
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute(self, stmt):
+        self.executed.append(stmt)
+        if len(self.executed) == 1:
+            return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: self.claimed))
+
+    def begin_nested(self) -> _Savepoint:
+        self.savepoints += 1
+        return _Savepoint()
+
+    async def commit(self) -> None:
+        self.commits += 1
+
+
+def _deadline(ride_id: int, attempts: int = 0):
+    return SimpleNamespace(id=ride_id, kind=RIDE_TIMEOUT, ride_id=ride_id, user_id=100 + ride_id, due_at=PAST, attempts=attempts)
+
+
+def _retried(session) -> dict:
+    """ride_id -> (attempts, due_at) of the rows put back by _retry_later."""
+    inserts = [stmt for stmt in session.executed[1:] if stmt.is_insert]
+    if not inserts:
+        return {}
+    (stmt,) = inserts
+    params = stmt.compile(dialect=postgresql.dialect()).params
+    rows = len([key for key in params if key.startswith("ride_id")])
+    return {params[f"ride_id_m{index}"]: (params[f"attempts_m{index}"], params[f"due_at_m{index}"]) for index in range(rows)}
+
+
+def _failing_handler(bad_ride_ids, calls):
+    async def handler(session, batch):
+        calls.append([deadline.ride_id for deadline in batch])
+        session.sync_session.info.setdefault("events", []).extend(deadline.ride_id for deadline in batch)
+        if any(deadline.ride_id in bad_ride_ids for deadline in batch):
+            raise RuntimeError("handler failed")
+    return handler
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    monkeypatch.setattr(app.config, "DEADLINE_RETRY_SECONDS", 30.0)
+    monkeypatch.setattr(app.config, "DEADLINE_MAX_ATTEMPTS", 5)
+    return DeadlineScheduler()
+
+
+def _use(monkeypatch, session) -> None:
+    monkeypatch.setattr(scheduler_module, "async_session_maker", lambda: session)
+
+
+@pytest.mark.asyncio
+async def test_failing_batch_falls_back_to_one_savepoint_per_row(scheduler, monkeypatch):
+    session = _FakeSession([_deadline(1), _deadline(2, attempts=2), _deadline(3)])
+    _use(monkeypatch, session)
+    calls = []
+    scheduler.register(RIDE_TIMEOUT, _failing_handler({2}, calls))
+
+    started = datetime.now(timezone.utc)
+    assert await scheduler.fire_due() == 3
+    finished = datetime.now(timezone.utc)
+
+    assert calls == [[1, 2, 3], [1], [2], [3]]
+    assert session.savepoints == 4
+    # the rolled back savepoints leave nothing queued behind
+    assert session.sync_session.info["events"] == [1, 3]
+    retried = _retried(session)
+    assert list(retried) == [2]
+    attempts, due_at = retried[2]
+    assert attempts == 3
+    delay = timedelta(seconds=30.0 * 2 ** 2)
+    assert started + delay <= due_at <= finished + delay
+    assert scheduler.get_stats()["scheduled"] == 1
+    assert session.commits == 1
+
+
+@pytest.mark.asyncio
+async def test_single_row_batch_is_not_run_twice(scheduler, monkeypatch):
+    session = _FakeSession([_deadline(1)])
+    _use(monkeypatch, session)
+    calls = []
+    scheduler.register(RIDE_TIMEOUT, _failing_handler({1}, calls))
+
+    await scheduler.fire_due()
+
+    assert calls == [[1]]
+    assert _retried(session)[1][0] == 1
+
+
+@pytest.mark.asyncio
+async def test_deadline_is_dropped_at_max_attempts(scheduler, monkeypatch):
+    session = _FakeSession([_deadline(1, attempts=3), _deadline(2, attempts=4)])
+    _use(monkeypatch, session)
+    scheduler.register(RIDE_TIMEOUT, _failing_handler({1, 2}, []))
+
+    await scheduler.fire_due()
+
+    assert {ride_id: attempts for ride_id, (attempts, _) in _retried(session).items()} == {1: 4}
+    assert list(scheduler._due) == [(RIDE_TIMEOUT, 1)]
@@ -0,0 +1,59 @@
+import pytest
+
+from app.dataclass import CLASS_BITS, DriverState, class_mask
+from app.enum import DriverStatus, RideClass
+
+
+def test_class_mask_sets_one_bit_per_known_class():
+    assert class_mask(()) == 0
+    assert class_mask((RideClass.LIGHT,)) == CLASS_BITS[RideClass.LIGHT]
+    assert class_mask((RideClass.PRO, RideClass.ELITE)) == CLASS_BITS[RideClass.PRO] | CLASS_BITS[RideClass.ELITE]
+    assert len(set(CLASS_BITS.values())) == len(CLASS_BITS)
+
+
+def test_class_mask_is_case_insensitive_and_ignores_unknown_classes():
+    assert class_mask(("VIP", "Pro")) == class_mask((RideClass.VIP, RideClass.PRO))
+    assert class_mask(("business", RideClass.LIGHT)) == CLASS_BITS[RideClass.LIGHT]
+
+
+def test_classes_allowed_round_trips_through_the_mask():
+    state = DriverState(driver_profile_id=1, user_id=10, classes_allowed=["pro", "LIGHT"])
+
+    assert state.classes_allowed == {RideClass.PRO, RideClass.LIGHT}
+    state.classes_allowed = None
+    assert state.class_mask == 0
+    assert state.classes_allowed == set()
+
+
+@pytest.mark.parametrize(
+    ("classes", "car_id", "ride_class", "ride_type", "expected"),
+    [
+        ([RideClass.PRO], None, RideClass.PRO, "without_car", True),
+        ([RideClass.PRO], None, RideClass.PRO, "with_car", False),
+        ([RideClass.PRO], 5, RideClass.PRO, "with_car", True),
+        ([RideClass.PRO], 5, RideClass.VIP, "with_car", False),
+        ([RideClass.LIGHT, RideClass.VIP], None, "VIP", "delivery", True),
+        ([], 5, RideClass.LIGHT, "without_car", False),
+    ],
+)
+def test_permits_matches_has_permit(classes, car_id, ride_class, ride_type, expected):
+    state = DriverState(driver_profile_id=1, user_id=10, classes_allowed=classes, car_id=car_id)
+
+    assert state.permits(class_mask((ride_class,)), ride_type == "with_car") is expected
+    assert state.has_permit(ride_class, ride_type) is expected
+
+
+def test_permits_accepts_any_class_of_a_combined_mask():
+    state = DriverState(driver_profile_id=1, user_id=10, classes_allowed=[RideClass.VIP])
+
+    assert state.permits(class_mask((RideClass.LIGHT, RideClass.VIP)), False)
+    assert not state.permits(class_mask((RideClass.LIGHT, RideClass.PRO)), False)
+
+
+def test_status_is_stored_as_a_code():
+    state = DriverState(driver_profile_id=1, user_id=10, status="online", latitude=55.75, longitude=37.61)
+
+    assert state.status is DriverStatus.ONLINE
+    assert state.is_available()
+    state.current_ride_id = 3
+    assert not state.is_available()
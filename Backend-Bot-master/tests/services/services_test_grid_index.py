@@ -0,0 +1,56 @@
+import random
+
+import app.crud  # noqa: F401 - app.services must be imported after app.crud
+from app.services.geo import GridIndex, haversine_km
+
+CELL_DEG = 0.01
+
+
+def test_keys_within_returns_every_key_inside_the_radius():
+    random.seed(3)
+    index = GridIndex(CELL_DEG)
+    points = {key: (55.75 + random.uniform(-0.2, 0.2), 37.62 + random.uniform(-0.3, 0.3)) for key in range(2_000)}
+    for key, (latitude, longitude) in points.items():
+        index.upsert(key, latitude, longitude)
+
+    for origin in ((55.75, 37.62), (55.9, 37.4), (55.6, 37.9)):
+        for radius_km in (0.5, 2.0, 5.0):
+            found = set(index.keys_within(origin[0], origin[1], radius_km))
+            inside = {key for key, (latitude, longitude) in points.items() if haversine_km(origin[0], origin[1], latitude, longitude) <= radius_km}
+            assert inside <= found
+
+
+def test_keys_within_only_scans_nearby_cells():
+    index = GridIndex(CELL_DEG)
+    index.upsert("near", 55.7501, 37.6201)
+    index.upsert("far", 56.75, 37.62)
+
+    assert set(index.keys_within(55.75, 37.62, 1.0)) == {"near"}
+    assert set(index.keys_within(0.0, 0.0, 1.0)) == set()
+
+
+def test_upsert_moves_a_key_and_remove_drops_empty_cells():
+    index = GridIndex(CELL_DEG)
+    first = index.upsert(1, 55.7501, 37.6201)
+    assert index.upsert(1, 55.7502, 37.6202) == first
+
+    moved = index.upsert(1, 55.80, 37.70)
+    assert moved != first
+    assert index.get_cell(1) == moved
+    assert list(index.cells_within(55.7501, 37.6201, 0.1)) == []
+    assert set(index.keys_within(55.80, 37.70, 0.5)) == {1}
+
+    assert index.remove(1) == moved
+    assert index.remove(1) is None
+    assert len(index) == 0
+    assert 1 not in index
+    assert list(index.cells_within(55.80, 37.70, 0.5)) == []
+
+
+def test_cells_are_floored_for_negative_coordinates():
+    index = GridIndex(CELL_DEG)
+
+    assert index.cell_of(-0.005, -0.005) == (-1, -1)
+    assert index.cell_of(0.005, 0.005) == (0, 0)
+    index.upsert("south_west", -33.8688, -70.6693)
+    assert set(index.keys_within(-33.8688, -70.6693, 0.2)) == {"south_west"}
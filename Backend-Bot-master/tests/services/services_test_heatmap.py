@@ -0,0 +1,74 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import app.crud  # noqa: F401 - app.services must be imported after app.crud
+from app.dataclass import DriverState
+from app.services.heatmap import SHORT_WINDOW_MINUTES, WINDOW_MINUTES, SupplyDemandHeatmap
+
+CELL_DEG = 0.01
+MINUTE = 29_333_333
+NOW = MINUTE * 60 + 10
+
+
+def _ride(ride_id: int, at: float, driver_profile_id=None) -> SimpleNamespace:
+    return SimpleNamespace(id=ride_id, pickup_lat=55.751, pickup_lng=37.621, created_at=datetime.fromtimestamp(at, timezone.utc), driver_profile_id=driver_profile_id)
+
+
+def _only_cell(heatmap: SupplyDemandHeatmap, now: float) -> dict:
+    cells = heatmap.snapshot(now=now)
+    assert len(cells) == 1
+    return cells[0]
+
+
+def test_requested_rides_roll_out_of_the_short_then_the_long_window():
+    heatmap = SupplyDemandHeatmap(CELL_DEG)
+    ride = _ride(1, NOW)
+    heatmap.add_ride(ride, now=NOW)
+    heatmap.remove_ride(_ride(1, NOW, driver_profile_id=7), now=NOW)
+
+    cell = _only_cell(heatmap, NOW)
+    assert (cell[f"requested_{SHORT_WINDOW_MINUTES}m"], cell[f"requested_{WINDOW_MINUTES}m"]) == (1, 1)
+    assert (cell[f"matched_{SHORT_WINDOW_MINUTES}m"], cell[f"matched_{WINDOW_MINUTES}m"]) == (1, 1)
+    assert cell["open_rides"] == 0
+
+    cell = _only_cell(heatmap, NOW + (SHORT_WINDOW_MINUTES - 1) * 60)
+    assert cell[f"requested_{SHORT_WINDOW_MINUTES}m"] == 1
+
+    cell = _only_cell(heatmap, NOW + SHORT_WINDOW_MINUTES * 60)
+    assert (cell[f"requested_{SHORT_WINDOW_MINUTES}m"], cell[f"requested_{WINDOW_MINUTES}m"]) == (0, 1)
+
+    cell = _only_cell(heatmap, NOW + (WINDOW_MINUTES - 1) * 60)
+    assert cell[f"requested_{WINDOW_MINUTES}m"] == 1
+
+    assert heatmap.snapshot(now=NOW + WINDOW_MINUTES * 60) == []
+    assert heatmap.get_stats()["cells"] == 0
+
+
+def test_reused_ring_slot_drops_the_counts_of_the_previous_lap():
+    heatmap = SupplyDemandHeatmap(CELL_DEG)
+    heatmap.add_ride(_ride(1, NOW), now=NOW)
+    later = NOW + WINDOW_MINUTES * 60
+    heatmap.add_ride(_ride(2, later), now=later)
+
+    cell = _only_cell(heatmap, later)
+    assert cell["open_rides"] == 2
+    assert (cell[f"requested_{SHORT_WINDOW_MINUTES}m"], cell[f"requested_{WINDOW_MINUTES}m"]) == (1, 1)
+
+
+def test_rides_created_before_the_window_are_not_counted_as_requested():
+    heatmap = SupplyDemandHeatmap(CELL_DEG)
+    heatmap.add_ride(_ride(1, NOW - WINDOW_MINUTES * 60 - 1), now=NOW)
+
+    cell = _only_cell(heatmap, NOW)
+    assert cell["open_rides"] == 1
+    assert cell[f"requested_{WINDOW_MINUTES}m"] == 0
+
+
+def test_live_supply_keeps_a_cell_after_its_events_expire():
+    heatmap = SupplyDemandHeatmap(CELL_DEG)
+    heatmap.update_driver(DriverState(driver_profile_id=3, user_id=30, status="online", latitude=55.752, longitude=37.622))
+    heatmap.add_ride(_ride(1, NOW), now=NOW)
+    heatmap.remove_ride(_ride(1, NOW), now=NOW)
+
+    cell = _only_cell(heatmap, NOW + WINDOW_MINUTES * 60)
+    assert (cell["online"], cell[f"canceled_{WINDOW_MINUTES}m"], cell["gap"]) == (1, 0, -1)
@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+import app.crud  # noqa: F401 - app.services must be imported after app.crud
+from app.crud.in_app_notification import in_app_notification_crud
+from app.models.in_app_notification import InAppNotification
+
+USER_ID = 1
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+class _SyncSession:
+    """Runs the crud's statements on a synchronous SQLite session; SQLite understands the row-value comparison."""
+
+    def __init__(self, session: Session) -> None:
+        self.session = session
+        self.statements = []
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+        return self.session.execute(stmt)
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE in_app_notifications (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, type VARCHAR NOT NULL, title VARCHAR NOT NULL, "
+            "message VARCHAR NOT NULL, data JSON, read_at TIMESTAMP, dedup_key VARCHAR, created_at TIMESTAMP NOT NULL)"
+        ))
+    with Session(engine) as sync_session:
+        # ids 1..12; 4-6 share one created_at so the id breaks the tie, 12 is older than 11, 7 belongs to someone else
+        created = {notification_id: START + timedelta(minutes=notification_id) for notification_id in range(1, 13)}
+        created[5] = created[6] = created[4]
+        created[12] = START + timedelta(seconds=30)
+        for notification_id, created_at in created.items():
+            sync_session.add(InAppNotification(
+                id=notification_id,
+                user_id=USER_ID if notification_id != 7 else 2,
+                type="new_ride",
+                title="title",
+                message="message",
+                read_at=created_at if notification_id % 3 == 0 else None,
+                created_at=created_at,
+            ))
+        sync_session.commit()
+        yield _SyncSession(sync_session)
+
+
+def _ids(page) -> list:
+    return [notification.id for notification in page]
+
+
+@pytest.mark.asyncio
+async def test_cursor_pages_walk_newest_first_without_gaps_or_repeats(session):
+    seen, cursor = [], None
+    while True:
+        page = await in_app_notification_crud.get_by_user_id(session, USER_ID, page_size=4, cursor=cursor)
+        if not page:
+            break
+        seen.extend(_ids(page))
+        cursor = page[-1].id
+
+    assert seen == [11, 10, 9, 8, 6, 5, 4, 3, 2, 1, 12]
+
+
+@pytest.mark.asyncio
+async def test_cursor_breaks_created_at_ties_by_id(session):
+    page = await in_app_notification_crud.get_by_user_id(session, USER_ID, page_size=2, cursor=6)
+
+    assert _ids(page) == [5, 4]
+
+
+@pytest.mark.asyncio
+async def test_unread_pages_keep_the_read_filter_with_a_cursor(session):
+    page = await in_app_notification_crud.get_unread_by_user_id(session, USER_ID, page_size=3, cursor=10)
+
+    assert _ids(page) == [8, 5, 4]
+
+
+@pytest.mark.asyncio
+async def test_offset_pages_still_work_without_a_cursor(session):
+    page = await in_app_notification_crud.get_by_user_id(session, USER_ID, page=2, page_size=4)
+
+    assert _ids(page) == [6, 5, 4, 3]
+
+
+@pytest.mark.asyncio
+async def test_cursor_query_has_no_offset(session):
+    await in_app_notification_crud.get_by_user_id(session, USER_ID, page=3, page_size=4, cursor=9)
+
+    sql = str(session.statements[-1].compile(dialect=postgresql.dialect()))
+    assert "OFFSET" not in sql
+    assert "(in_app_notifications.created_at, in_app_notifications.id) < ((SELECT in_app_notifications_1.created_at" in sql
+    assert "ORDER BY in_app_notifications.created_at DESC, in_app_notifications.id DESC" in sql
@@ -0,0 +1,119 @@
+import sys
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+import app.config
+import app.crud  # noqa: F401 - app.services must be imported after app.crud
+from app.services.fcm_service import UserPushResult
+from app.services.outbox import PUSH, NotificationOutbox
+
+outbox_module = sys.modules["app.services.outbox"]
+
+
+class _FakeSession:
+    def __init__(self) -> None:
+        self.executed = []
+        self.commits = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute(self, stmt, params=None):
+        self.executed.append((stmt, params))
+
+    async def commit(self) -> None:
+        self.commits += 1
+
+
+class _FakeFcm:
+    def __init__(self, failing=()) -> None:
+        self.failing = set(failing)
+        self.calls = []
+
+    async def send_to_users(self, session, user_ids, payloads):
+        self.calls.append({user_id: payloads[user_id].title for user_id in user_ids})
+        return {
+            user_id: UserPushResult(failure_count=1, errors=["unregistered"]) if payloads[user_id].title in self.failing else UserPushResult(success_count=1)
+            for user_id in user_ids
+        }
+
+
+@pytest.fixture
+def session(monkeypatch):
+    session = _FakeSession()
+    monkeypatch.setattr(outbox_module, "async_session_maker", lambda: session)
+    return session
+
+
+def _push(row_id: int, user_id: int, attempts: int = 1):
+    return SimpleNamespace(id=row_id, channel=PUSH, user_id=user_id, payload={"title": f"push {row_id}"}, attempts=attempts)
+
+
+@pytest.mark.asyncio
+async def test_pushes_to_one_user_go_out_in_rounds(session, monkeypatch):
+    fcm = _FakeFcm(failing={"push 3"})
+    monkeypatch.setattr(outbox_module, "fcm_service", fcm)
+
+    failed = await NotificationOutbox()._deliver([_push(1, 10), _push(2, 20), _push(3, 10), _push(4, 10)])
+
+    assert fcm.calls == [{10: "push 1", 20: "push 2"}, {10: "push 3"}, {10: "push 4"}]
+    assert failed == {3: "unregistered"}
+
+
+@pytest.mark.asyncio
+async def test_a_failing_send_fails_only_its_round(session, monkeypatch):
+    class _Broken(_FakeFcm):
+        async def send_to_users(self, session, user_ids, payloads):
+            if len(self.calls) == 1:
+                self.calls.append(None)
+                raise RuntimeError("fcm down")
+            return await super().send_to_users(session, user_ids, payloads)
+
+    monkeypatch.setattr(outbox_module, "fcm_service", _Broken())
+
+    failed = await NotificationOutbox()._deliver([_push(1, 10), _push(2, 10), _push(3, 20)])
+
+    assert failed == {2: "fcm down"}
+
+
+@pytest.mark.asyncio
+async def test_settle_backs_off_exponentially_up_to_the_cap(session, monkeypatch):
+    monkeypatch.setattr(app.config, "OUTBOX_RETRY_BASE_SECONDS", 2.0)
+    monkeypatch.setattr(app.config, "OUTBOX_RETRY_MAX_SECONDS", 20.0)
+    monkeypatch.setattr(app.config, "OUTBOX_MAX_ATTEMPTS", 8)
+    outbox = NotificationOutbox()
+    rows = [_push(row_id, row_id, attempts=row_id) for row_id in range(1, 6)]
+
+    started = datetime.now(timezone.utc)
+    await outbox._settle(rows, {row.id: "error" for row in rows})
+    finished = datetime.now(timezone.utc)
+
+    (_, retries), = [(stmt, params) for stmt, params in session.executed if params is not None]
+    delays = {1: 2.0, 2: 4.0, 3: 8.0, 4: 16.0, 5: 20.0}
+    assert sorted(retry["id"] for retry in retries) == [1, 2, 3, 4, 5]
+    for retry in retries:
+        delay = timedelta(seconds=delays[retry["id"]])
+        assert started + delay <= retry["available_at"] <= finished + delay
+        assert retry["last_error"] == "error"
+    assert session.commits == 1
+    assert outbox.get_stats() == {"delivered": 0, "retried": 5, "dropped": 0}
+
+
+@pytest.mark.asyncio
+async def test_settle_deletes_delivered_rows_and_drops_at_max_attempts(session, monkeypatch):
+    monkeypatch.setattr(app.config, "OUTBOX_MAX_ATTEMPTS", 3)
+    outbox = NotificationOutbox()
+    rows = [_push(1, 10, attempts=1), _push(2, 20, attempts=2), _push(3, 30, attempts=3)]
+
+    await outbox._settle(rows, {2: "error", 3: "error"})
+
+    (delete_stmt, _), (_, retries) = session.executed
+    deleted = delete_stmt.compile().params
+    assert sorted(next(value for value in deleted.values() if isinstance(value, list))) == [1, 3]
+    assert [retry["id"] for retry in retries] == [2]
+    assert outbox.get_stats() == {"delivered": 1, "retried": 1, "dropped": 1}
@@ -0,0 +1,71 @@
+import pytest
+
+import app.config
+import app.crud  # noqa: F401 - app.services must be imported after app.crud
+from app.enum import DriverStatus, RideClass
+from app.services.driver_state_storage import DriverStateStorage
+from app.services.pubsub import InMemoryBus, InMemoryPubSub, PubSub
+from app.services.websocket_manager import ConnectionManager
+
+
+class _FakeWebSocket:
+    def __init__(self) -> None:
+        self.sent = []
+
+    async def accept(self) -> None:
+        return None
+
+    async def send_json(self, data) -> None:
+        self.sent.append(data)
+
+
+def _workers():
+    bus = InMemoryBus()
+    return InMemoryPubSub(bus, worker_id="first"), InMemoryPubSub(bus, worker_id="second")
+
+
+def test_pubsub_requires_a_transport():
+    with pytest.raises(TypeError):
+        PubSub()
+
+
+@pytest.mark.asyncio
+async def test_driver_state_crosses_workers(monkeypatch):
+    monkeypatch.setattr(app.config, "STATE_SYNC_INTERVAL_SECONDS", 0)
+    first_bus, second_bus = _workers()
+    first, second = DriverStateStorage(first_bus), DriverStateStorage(second_bus)
+
+    first.hydrate_rows([(7, 70, [RideClass.PRO], None, DriverStatus.ONLINE.value, 55.75, 37.61, None)])
+    state = first.get_driver(7)
+    state.status = DriverStatus.BUSY
+    state.current_ride_id = 11
+    first.reindex(state)
+    await first._sync_task
+
+    remote = second.get_driver(7)
+    try:
+        assert remote is not None
+        assert second.get_driver_by_user(70) is remote
+        assert remote.status == DriverStatus.BUSY
+        assert remote.current_ride_id == 11
+        assert remote.classes_allowed == {RideClass.PRO}
+        assert (remote.latitude, remote.longitude) == (55.75, 37.61)
+    finally:
+        first.evict(7)
+        second.evict(7)
+
+
+@pytest.mark.asyncio
+async def test_personal_message_crosses_workers():
+    first_bus, second_bus = _workers()
+    first, second = ConnectionManager("test_pubsub", first_bus), ConnectionManager("test_pubsub", second_bus)
+    websocket = _FakeWebSocket()
+    await second.connect(websocket, 42)
+
+    delivered_locally = await first.send_personal_message(42, {"type": "ping"})
+
+    assert delivered_locally is False
+    assert [message["type"] for message in websocket.sent] == ["ping"]
+
+    await first.send_personal_message(43, {"type": "ping"})
+    assert len(websocket.sent) == 1
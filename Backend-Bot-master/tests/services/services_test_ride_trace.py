@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+import app.crud  # noqa: F401 - app.services must be imported after app.crud
+from app.services.ride_trace import COORD_SCALE, KM_PER_DEGREE, decode_points, encode_points, summarize
+
+START = (5_575_000, 3_762_000, 1_760_000_000)
+
+
+def _points(rows) -> np.ndarray:
+    return np.array(rows, dtype=np.int64).reshape(-1, 3)
+
+
+def _northbound(meters_per_step: float, steps: int, seconds_per_step: int = 1) -> np.ndarray:
+    units = meters_per_step / (KM_PER_DEGREE * 1000 / COORD_SCALE)
+    return _points([(START[0] + round(step * units), START[1], START[2] + step * seconds_per_step) for step in range(steps)])
+
+
+def test_encode_decode_round_trip_with_negative_and_large_deltas():
+    points = _points([START, (START[0] - 3, START[1] + 7, START[2] + 1), (START[0] + 2_000_000, -START[1], START[2] + 86_400), (0, 0, 0)])
+
+    assert np.array_equal(decode_points(encode_points(points)), points)
+
+
+def test_chunks_encoded_against_the_previous_point_concatenate():
+    points = _northbound(10, 50)
+    blob = b"".join(encode_points(points[start:start + 7], tuple(points[start - 1]) if start else (0, 0, 0)) for start in range(0, len(points), 7))
+
+    assert blob == encode_points(points)
+    assert np.array_equal(decode_points(blob), points)
+
+
+def test_small_deltas_take_one_byte_each():
+    points = _points([START, (START[0] + 5, START[1] - 5, START[2] + 1)])
+
+    assert len(encode_points(points[1:], tuple(points[0]))) == 3
+    assert decode_points(b"").shape == (0, 3)
+
+
+def test_summarize_straight_drive():
+    points = _northbound(20, 101)
+
+    summary = summarize(encode_points(points))
+
+    assert summary.fix_count == 101
+    assert summary.duration_seconds == 100
+    assert summary.distance_meters == pytest.approx(2_000, abs=5)
+
+
+def test_summarize_ignores_jitter_below_the_minimum_segment():
+    rng = np.random.default_rng(7)
+    jitter = np.round(rng.uniform(-3, 3, size=(300, 2))).astype(np.int64)
+    points = _points([(START[0] + dy, START[1] + dx, START[2] + second) for second, (dy, dx) in enumerate(jitter.tolist())])
+
+    assert summarize(encode_points(points)).distance_meters == 0
+
+
+def test_summarize_skips_impossible_jumps():
+    points = _northbound(20, 11)
+    points[5, 0] += 1_000_000
+
+    summary = summarize(encode_points(points))
+
+    assert summary.distance_meters == pytest.approx(200, abs=5)
+
+
+def test_summarize_needs_two_fixes():
+    assert summarize(b"") is None
+    assert summarize(encode_points(_points([START]))) is None